@@ -1,23 +1,31 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import desc, func
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
-from ...core.dependencies import get_database_session, get_settings_dependency
-from ...models.database import ResourceMetric, ResourceSummary
+from ...core.dependencies import (
+    db_thread,
+    get_database_session,
+    get_prometheus_service,
+    get_settings_dependency,
+)
+from ...models.database import Container, ResourceMetric, ResourceSummary
 from ...models.schemas import (
     ChartDataResponse,
     MetricsResponse,
     ResourceMetricResponse,
     ResourceSummaryResponse,
 )
+from ...services.collection_runs import snapshot_time
+from ...services.prometheus_service import PrometheusService
 
 router = APIRouter()
 
 
 @router.get("/metrics", response_model=MetricsResponse)
-async def get_metrics(
+@db_thread
+def get_metrics(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = Query(None),
@@ -29,8 +37,7 @@ async def get_metrics(
 
     # Build base query for latest metrics - exclude excluded namespaces
     query = db.query(ResourceMetric).filter(
-        ResourceMetric.timestamp
-        == db.query(func.max(ResourceMetric.timestamp)).scalar(),
+        ResourceMetric.timestamp == snapshot_time(db),
         ~ResourceMetric.namespace.in_(
             settings.excluded_namespaces_list
         ),  # Exclude excluded namespaces
@@ -66,7 +73,8 @@ async def get_metrics(
 
 
 @router.get("/chart-data", response_model=ChartDataResponse)
-async def get_chart_data(
+@db_thread
+def get_chart_data(
     hours: int = Query(24, ge=1, le=24), db: Session = Depends(get_database_session)
 ):
     """Get chart data for the last N hours"""
@@ -121,14 +129,15 @@ async def get_chart_data(
 
 
 @router.get("/namespaces")
-async def get_namespaces(db: Session = Depends(get_database_session)) -> List[str]:
+@db_thread
+def get_namespaces(db: Session = Depends(get_database_session)) -> List[str]:
     """Get all available namespaces (excluding excluded namespaces)"""
     settings = get_settings_dependency()
 
     namespaces = (
-        db.query(ResourceMetric.namespace)
+        db.query(Container.namespace)
         .filter(
-            ~ResourceMetric.namespace.in_(
+            ~Container.namespace.in_(
                 settings.excluded_namespaces_list
             )  # Exclude excluded namespaces
         )
@@ -139,13 +148,13 @@ async def get_namespaces(db: Session = Depends(get_database_session)) -> List[st
 
 
 @router.get("/summary", response_model=List[ResourceSummaryResponse])
-async def get_summary(
+@db_thread
+def get_summary(
     namespace: Optional[str] = Query(None), db: Session = Depends(get_database_session)
 ):
     """Get resource summary by namespace"""
     query = db.query(ResourceSummary).filter(
-        ResourceSummary.timestamp
-        == db.query(func.max(ResourceSummary.timestamp)).scalar()
+        ResourceSummary.timestamp == snapshot_time(db)
     )
 
     if namespace:
@@ -156,12 +165,14 @@ async def get_summary(
 
 
 @router.post("/collect")
-async def trigger_collection():
+async def trigger_collection(
+    prometheus_service: PrometheusService = Depends(get_prometheus_service),
+):
     """Manually trigger resource collection (for testing)"""
     from ...services.collector_service import ResourceCollectorService
 
     try:
-        collector = ResourceCollectorService()
+        collector = ResourceCollectorService(prometheus_service)
         await collector.initialize()
         await collector.collect_and_store_metrics()
         await collector.cleanup()
@@ -169,3 +180,19 @@ async def trigger_collection():
         return {"status": "success", "message": "Collection completed"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+@router.post("/backfill")
+async def trigger_backfill(
+    background_tasks: BackgroundTasks,
+    prometheus_service: PrometheusService = Depends(get_prometheus_service),
+):
+    """Start loading history from Prometheus in the background"""
+    from ...core.scheduler import run_backfill
+    from ...services.backfill_service import backfill_running
+
+    if backfill_running():
+        return {"status": "error", "message": "Backfill already running"}
+
+    background_tasks.add_task(run_backfill, prometheus_service)
+    return {"status": "success", "message": "Backfill started"}
@@ -1,3 +1,4 @@
+from types import SimpleNamespace
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query, Request
@@ -7,15 +8,21 @@ from sqlalchemy import desc, func
 from sqlalchemy.orm import Session
 
 from ...core.config import get_settings
-from ...core.dependencies import get_database_session
-from ...models.database import ResourceMetric
+from ...core.dependencies import db_thread, get_database_session
+from ...models.database import Container, ContainerStats, ResourceMetric
+from ...services.chart_service import chart_data
+from ...services.collection_runs import snapshot_time
+from ...services.container_stats import historical_stats, load_stats
+from ...services.rollup_service import select_tier
+from ...services.summary_service import aggregate_summary, snapshot_summary
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/static/templates")
 
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_home(
+@db_thread
+def dashboard_home(
     request: Request,
     page: int = Query(1, ge=1),
     search: Optional[str] = Query(None),
@@ -28,11 +35,11 @@ async def dashboard_home(
 ):
     """Main dashboard page."""
     settings = get_settings()
+    snapshot = snapshot_time(db)
 
     # Build query - exclude inactive pods and excluded namespaces
     query = db.query(ResourceMetric).filter(
-        ResourceMetric.timestamp
-        == db.query(func.max(ResourceMetric.timestamp)).scalar(),
+        ResourceMetric.timestamp == snapshot,
         ResourceMetric.pod_phase.in_(
             ["Running", "Pending", "Unknown"]
         ),  # Exclude Succeeded, Failed
@@ -107,8 +114,8 @@ async def dashboard_home(
 
     # Get available namespaces for filter (exclude excluded namespaces)
     namespaces = (
-        db.query(ResourceMetric.namespace)
-        .filter(~ResourceMetric.namespace.in_(settings.excluded_namespaces_list))
+        db.query(Container.namespace)
+        .filter(~Container.namespace.in_(settings.excluded_namespaces_list))
         .distinct()
         .all()
     )
@@ -120,32 +127,13 @@ async def dashboard_home(
     memory_requests_data = []
     memory_limits_data = []
 
-    # Get historical min/max data for all resources
-    historical_stats = {}
-    for resource in resources:
-        key = f"{resource.pod_name}:{resource.container_name}:{resource.namespace}"
-        if key not in historical_stats:
-            # Get historical data for this pod/container
-            hist_query = db.query(ResourceMetric).filter(
-                ResourceMetric.pod_name == resource.pod_name,
-                ResourceMetric.container_name == resource.container_name,
-                ResourceMetric.namespace == resource.namespace,
-            )
-            hist_data = hist_query.all()
-
-            cpu_values = [h.cpu_usage_cores or 0 for h in hist_data]
-            memory_values = [h.memory_usage_bytes or 0 for h in hist_data]
-
-            historical_stats[key] = {
-                "cpu_min": min(cpu_values) if cpu_values else 0,
-                "cpu_max": max(cpu_values) if cpu_values else 0,
-                "memory_min": min(memory_values) if memory_values else 0,
-                "memory_max": max(memory_values) if memory_values else 0,
-            }
+    # Historical usage of the page's containers, one query for the whole page
+    history = historical_stats(
+        db.connection(), [resource.container_id for resource in resources]
+    )
 
     for resource in resources:
-        key = f"{resource.pod_name}:{resource.container_name}:{resource.namespace}"
-        hist_stats = historical_stats.get(key, {})
+        hist_stats = history.get(resource.container_id, {})
 
         # Calculate utilization percentages for current, min, max
         def calc_cpu_req_pct(cpu_val):
@@ -340,49 +328,8 @@ async def dashboard_home(
         )
         memory_limits_data.append(mem_limit_row)
 
-    # Calculate summary statistics from ALL records (not just current page)
-    all_query = db.query(ResourceMetric).filter(
-        ResourceMetric.timestamp
-        == db.query(func.max(ResourceMetric.timestamp)).scalar(),
-        ~ResourceMetric.namespace.in_(
-            settings.excluded_namespaces_list
-        ),  # Exclude excluded namespaces
-    )
-    if search:
-        all_query = all_query.filter(ResourceMetric.pod_name.contains(search))
-    if namespace:
-        all_query = all_query.filter(ResourceMetric.namespace == namespace)
-
-    all_resources = all_query.all()
-
-    total_cpu_requests = sum(r.cpu_request_cores or 0 for r in all_resources)
-    total_cpu_limits = sum(r.cpu_limit_cores or 0 for r in all_resources)
-    total_memory_requests = sum(r.memory_request_bytes or 0 for r in all_resources)
-    total_memory_limits = sum(r.memory_limit_bytes or 0 for r in all_resources)
-    total_cpu_usage = sum(r.cpu_usage_cores or 0 for r in all_resources)
-    total_memory_usage = sum(r.memory_usage_bytes or 0 for r in all_resources)
-
-    cpu_requests_underutilization = max(0, total_cpu_requests - total_cpu_usage)
-    cpu_limits_underutilization = max(0, total_cpu_limits - total_cpu_usage)
-    memory_requests_underutilization = max(
-        0, total_memory_requests - total_memory_usage
-    )
-    memory_limits_underutilization = max(0, total_memory_limits - total_memory_usage)
-
-    summary_stats = {
-        "total_cpu_requests": total_cpu_requests,
-        "total_cpu_limits": total_cpu_limits,
-        "total_memory_requests_gb": total_memory_requests / (1024**3),
-        "total_memory_limits_gb": total_memory_limits / (1024**3),
-        "total_cpu_usage": total_cpu_usage,
-        "total_memory_usage_gb": total_memory_usage / (1024**3),
-        "cpu_requests_underutilization": cpu_requests_underutilization,
-        "cpu_limits_underutilization": cpu_limits_underutilization,
-        "memory_requests_underutilization_gb": memory_requests_underutilization
-        / (1024**3),
-        "memory_limits_underutilization_gb": memory_limits_underutilization / (1024**3),
-        "total_containers": len(all_resources),
-    }
+    # Summary statistics cover ALL records (not just current page)
+    summary_stats = get_summary(db, settings, search, namespace, snapshot)
 
     return templates.TemplateResponse(
         "dashboard.html",
@@ -409,38 +356,46 @@ async def dashboard_home(
 
 
 @router.get("/api/summary")
-async def get_summary_stats(
+@db_thread
+def get_summary_stats(
     search: Optional[str] = Query(None),
     namespace: Optional[str] = Query(None),
     db: Session = Depends(get_database_session),
 ):
     """API endpoint for summary statistics."""
-    settings = get_settings()
+    return get_summary(db, get_settings(), search, namespace)
 
-    # Get filtered data for summary stats - exclude inactive pods and excluded ns
-    all_query = db.query(ResourceMetric).filter(
-        ResourceMetric.timestamp
-        == db.query(func.max(ResourceMetric.timestamp)).scalar(),
-        ResourceMetric.pod_phase.in_(
-            ["Running", "Pending", "Unknown"]
-        ),  # Exclude Succeeded, Failed
-        ~ResourceMetric.namespace.in_(
-            settings.excluded_namespaces_list
-        ),  # Exclude excluded namespaces
-    )
-    if search:
-        all_query = all_query.filter(ResourceMetric.pod_name.contains(search))
-    if namespace:
-        all_query = all_query.filter(ResourceMetric.namespace == namespace)
 
-    all_resources = all_query.all()
+def get_summary(
+    db: Session, settings, search=None, namespace=None, snapshot=None
+) -> dict:
+    """Summary card totals of the active containers in the current snapshot.
+
+    Read from the summary rows written with each collection; a pod name
+    search cannot be precomputed and is summed over the snapshot's samples.
+    """
+    if snapshot is None:
+        snapshot = snapshot_time(db)
+
+    summary = None
+    if not search and namespace not in settings.excluded_namespaces_list:
+        summary = snapshot_summary(db, snapshot, namespace)
+    if summary is None:
+        summary = aggregate_summary(
+            db,
+            snapshot,
+            settings.excluded_namespaces_list,
+            search=search,
+            namespace=namespace,
+        )
 
-    total_cpu_requests = sum(r.cpu_request_cores or 0 for r in all_resources)
-    total_cpu_limits = sum(r.cpu_limit_cores or 0 for r in all_resources)
-    total_memory_requests = sum(r.memory_request_bytes or 0 for r in all_resources)
-    total_memory_limits = sum(r.memory_limit_bytes or 0 for r in all_resources)
-    total_cpu_usage = sum(r.cpu_usage_cores or 0 for r in all_resources)
-    total_memory_usage = sum(r.memory_usage_bytes or 0 for r in all_resources)
+    total_cpu_requests = summary.total_cpu_requests or 0
+    total_cpu_limits = summary.total_cpu_limits or 0
+    total_memory_requests = summary.total_memory_requests or 0
+    total_memory_limits = summary.total_memory_limits or 0
+    total_cpu_usage = summary.total_cpu_usage or 0
+    total_memory_usage = summary.total_memory_usage or 0
+    total_containers = summary.total_containers or 0
 
     cpu_requests_underutilization = max(0, total_cpu_requests - total_cpu_usage)
     cpu_limits_underutilization = max(0, total_cpu_limits - total_cpu_usage)
@@ -461,107 +416,41 @@ async def get_summary_stats(
         "memory_requests_underutilization_gb": memory_requests_underutilization
         / (1024**3),
         "memory_limits_underutilization_gb": memory_limits_underutilization / (1024**3),
-        "total_containers": len(all_resources),
+        "total_containers": total_containers,
     }
 
 
 @router.get("/api/chart-data")
-async def get_chart_data(
-    hours: int = Query(24, ge=1, le=168),  # Max 1 week
+@db_thread
+def get_chart_data(
+    hours: int = Query(24, ge=1, le=2160),  # Max 90 days
+    step: Optional[int] = Query(None, ge=60),  # Seconds; default from the range
+    max_points: Optional[int] = Query(None, ge=3, le=10000),  # e.g. canvas width
+    downsample: str = Query("lttb", pattern="^(lttb|minmax)$"),
     db: Session = Depends(get_database_session),
 ):
     """API endpoint for chart data with historical data."""
-    from collections import defaultdict
     from datetime import datetime, timedelta
 
     settings = get_settings()
 
-    # Get metrics from the last N hours - exclude inactive pods and excluded namespaces
-    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-    recent_metrics = (
-        db.query(ResourceMetric)
-        .filter(
-            ResourceMetric.timestamp >= cutoff_time,
-            ResourceMetric.pod_phase.in_(
-                ["Running", "Pending", "Unknown"]
-            ),  # Exclude Succeeded, Failed
-            ~ResourceMetric.namespace.in_(
-                settings.excluded_namespaces_list
-            ),  # Exclude excluded namespaces
-        )
-        .order_by(ResourceMetric.timestamp)
-        .all()
+    # Long ranges are read from the coarsest rollup tier with enough points
+    tier = select_tier(timedelta(hours=hours), settings)
+    data = chart_data(
+        db,
+        tier,
+        datetime.utcnow() - timedelta(hours=hours),
+        timedelta(seconds=step) if step else None,
+        settings.excluded_namespaces_list,
+        max_points,
+        downsample,
     )
-
-    # Group by timestamp (5-minute intervals)
-    time_groups = defaultdict(list)
-
-    for metric in recent_metrics:
-        # Round to 5-minute intervals
-        minute = (metric.timestamp.minute // 5) * 5
-        time_key = metric.timestamp.replace(minute=minute, second=0, microsecond=0)
-        time_groups[time_key].append(metric)
-
-    timestamps = []
-    cpu_usage_absolute = []
-    cpu_usage_percentage_requests = []
-    cpu_usage_percentage_limits = []
-    memory_usage_absolute = []
-    memory_usage_percentage_requests = []
-    memory_usage_percentage_limits = []
-
-    for time_key in sorted(time_groups.keys()):
-        metrics = time_groups[time_key]
-        total_cpu_usage = sum(m.cpu_usage_cores or 0 for m in metrics)
-        total_memory_usage = sum(m.memory_usage_bytes or 0 for m in metrics)
-
-        # Calculate totals for this timestamp (use actual historical values)
-        total_cpu_requests = sum(m.cpu_request_cores or 0 for m in metrics)
-        total_cpu_limits = sum(m.cpu_limit_cores or 0 for m in metrics)
-        total_memory_requests = sum(m.memory_request_bytes or 0 for m in metrics)
-        total_memory_limits = sum(m.memory_limit_bytes or 0 for m in metrics)
-
-        # Calculate percentages based on historical requests/limits
-        cpu_pct_requests = (
-            (total_cpu_usage / total_cpu_requests * 100)
-            if total_cpu_requests > 0
-            else 0
-        )
-        cpu_pct_limits = (
-            (total_cpu_usage / total_cpu_limits * 100) if total_cpu_limits > 0 else 0
-        )
-        memory_pct_requests = (
-            (total_memory_usage / total_memory_requests * 100)
-            if total_memory_requests > 0
-            else 0
-        )
-        memory_pct_limits = (
-            (total_memory_usage / total_memory_limits * 100)
-            if total_memory_limits > 0
-            else 0
-        )
-
-        timestamps.append(time_key.strftime("%H:%M"))
-        cpu_usage_absolute.append(round(total_cpu_usage, 3))
-        cpu_usage_percentage_requests.append(round(cpu_pct_requests, 1))
-        cpu_usage_percentage_limits.append(round(cpu_pct_limits, 1))
-        memory_usage_absolute.append(round(total_memory_usage / (1024**3), 2))  # GB
-        memory_usage_percentage_requests.append(round(memory_pct_requests, 1))
-        memory_usage_percentage_limits.append(round(memory_pct_limits, 1))
-
-    return {
-        "timestamps": timestamps,
-        "cpu_usage_absolute": cpu_usage_absolute,
-        "cpu_usage_percentage_requests": cpu_usage_percentage_requests,
-        "cpu_usage_percentage_limits": cpu_usage_percentage_limits,
-        "memory_usage_absolute": memory_usage_absolute,
-        "memory_usage_percentage_requests": memory_usage_percentage_requests,
-        "memory_usage_percentage_limits": memory_usage_percentage_limits,
-    }
+    return {"resolution": tier.name, **data}
 
 
 @router.get("/api/table/cpu-requests")
-async def get_cpu_requests_table(
+@db_thread
+def get_cpu_requests_table(
     page: int = Query(1, ge=1),
     search: Optional[str] = Query(None),
     namespace: Optional[str] = Query(None),
@@ -574,8 +463,7 @@ async def get_cpu_requests_table(
 
     # Build query - exclude excluded namespaces
     query = db.query(ResourceMetric).filter(
-        ResourceMetric.timestamp
-        == db.query(func.max(ResourceMetric.timestamp)).scalar(),
+        ResourceMetric.timestamp == snapshot_time(db),
         ~ResourceMetric.namespace.in_(
             settings.excluded_namespaces_list
         ),  # Exclude excluded namespaces
@@ -600,6 +488,9 @@ async def get_cpu_requests_table(
     total_pages = (total_count + settings.page_size - 1) // settings.page_size
     offset = (page - 1) * settings.page_size
     resources = query.offset(offset).limit(settings.page_size).all()
+    history = historical_stats(
+        db.connection(), [resource.container_id for resource in resources]
+    )
 
     # Prepare table data
     table_data = []
@@ -609,6 +500,12 @@ async def get_cpu_requests_table(
             if resource.cpu_request_cores
             else 0
         )
+        cpu_max = history.get(resource.container_id, {}).get("cpu_max") or 0
+        cpu_req_pct_max = (
+            (cpu_max / resource.cpu_request_cores * 100)
+            if resource.cpu_request_cores
+            else 0
+        )
 
         table_data.append(
             {
@@ -627,7 +524,11 @@ async def get_cpu_requests_table(
                     if resource.cpu_usage_cores
                     else "0m"
                 ),
+                "actual_max": f"{cpu_max * 1000:.0f}m",
                 "utilization_pct": f"{cpu_req_pct:.1f}%" if cpu_req_pct else "N/A",
+                "utilization_pct_max": (
+                    f"{cpu_req_pct_max:.1f}%" if cpu_req_pct_max else "N/A"
+                ),
             }
         )
 
@@ -640,55 +541,57 @@ async def get_cpu_requests_table(
 
 
 @router.get("/api/recommendations/{pod_name}/{container_name}")
-async def get_resource_recommendations(
+@db_thread
+def get_resource_recommendations(
     pod_name: str,
     container_name: str,
     namespace: Optional[str] = Query(None),
+    hours: Optional[int] = Query(None, ge=1, le=2160),  # Default: all history
     db: Session = Depends(get_database_session),
 ):
     """API endpoint for resource recommendations based on historical data."""
+    from datetime import datetime, timedelta
 
     settings = get_settings()
 
-    # Build query for this specific pod/container
-    query = db.query(ResourceMetric).filter(
-        ResourceMetric.pod_name == pod_name,
-        ResourceMetric.container_name == container_name,
-        ~ResourceMetric.namespace.in_(
-            settings.excluded_namespaces_list
-        ),  # Exclude excluded namespaces
-    )
-
-    if namespace:
-        query = query.filter(ResourceMetric.namespace == namespace)
-
-    # Get all historical data for this pod/container
-    historical_data = query.all()
+    if hours is None:
+        # All history comes from the container's running statistics
+        resolution = "all"
+        history = stats_history(db, pod_name, container_name, namespace, settings)
+    else:
+        # Long ranges are read from the coarsest rollup tier with enough points
+        tier = select_tier(timedelta(hours=hours), settings)
+        resolution = tier.name
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        if tier.model is None:
+            history = sample_history(
+                db, pod_name, container_name, namespace, cutoff_time, settings
+            )
+        else:
+            history = rollup_history(
+                db,
+                tier.model,
+                pod_name,
+                container_name,
+                namespace,
+                cutoff_time,
+                settings,
+            )
 
-    if not historical_data:
+    if history is None:
         return {"error": "No historical data found for this pod/container"}
 
-    # Calculate min, max, current values
-    cpu_values = [m.cpu_usage_cores or 0 for m in historical_data]
-    memory_values = [m.memory_usage_bytes or 0 for m in historical_data]
-
-    # Get latest record for current values and settings
-    latest_record = max(historical_data, key=lambda x: x.timestamp)
-
-    sample_count = len(cpu_values)
-    cpu_trimmed_mean = calculate_trimmed_mean(cpu_values)
-    memory_trimmed_mean = calculate_trimmed_mean(memory_values)
-
+    latest_record = history["latest"]
     stats = {
-        "cpu_min": min(cpu_values) if cpu_values else 0,
-        "cpu_max": max(cpu_values) if cpu_values else 0,
-        "cpu_current": latest_record.cpu_usage_cores or 0,
-        "cpu_trimmed_mean": cpu_trimmed_mean,
-        "memory_min": min(memory_values) if memory_values else 0,
-        "memory_max": max(memory_values) if memory_values else 0,
-        "memory_current": latest_record.memory_usage_bytes or 0,
-        "memory_trimmed_mean": memory_trimmed_mean,
-        "sample_count": sample_count,
+        "cpu_min": history["cpu_min"],
+        "cpu_max": history["cpu_max"],
+        "cpu_current": history["cpu_current"],
+        "cpu_trimmed_mean": history["cpu_trimmed_mean"],
+        "memory_min": history["memory_min"],
+        "memory_max": history["memory_max"],
+        "memory_current": history["memory_current"],
+        "memory_trimmed_mean": history["memory_trimmed_mean"],
+        "sample_count": history["sample_count"],
         "cpu_request": latest_record.cpu_request_cores or 0,
         "cpu_limit": latest_record.cpu_limit_cores or 0,
         "memory_request": latest_record.memory_request_bytes or 0,
@@ -707,6 +610,7 @@ async def get_resource_recommendations(
     return {
         "pod_name": pod_name,
         "container_name": container_name,
+        "resolution": resolution,
         "namespace": latest_record.namespace,
         "node_name": latest_record.node_name,
         "status": latest_record.pod_phase,
@@ -741,6 +645,167 @@ async def get_resource_recommendations(
     }
 
 
+def stats_history(db: Session, pod_name, container_name, namespace, settings):
+    """Usage history of a container from its statistics, or None without any.
+
+    Trimmed means come from the quantile sketches; current values and
+    settings from the container's latest sample.
+    """
+    query = (
+        db.query(ContainerStats.container_id)
+        .join(Container, ContainerStats.container_id == Container.id)
+        .filter(
+            Container.pod_name == pod_name,
+            Container.container_name == container_name,
+            ~Container.namespace.in_(settings.excluded_namespaces_list),
+        )
+    )
+
+    if namespace:
+        query = query.filter(Container.namespace == namespace)
+
+    container_id = query.order_by(ContainerStats.last_sample.desc()).limit(1).scalar()
+    if container_id is None:
+        return None
+
+    stats = load_stats(db.connection(), [container_id])[container_id]
+    latest_record = (
+        db.query(ResourceMetric)
+        .filter(
+            ResourceMetric.container_id == container_id,
+            ResourceMetric.timestamp == stats.last_sample,
+        )
+        .first()
+    )
+    if latest_record is None:
+        return None
+
+    return {
+        "latest": latest_record,
+        "cpu_trimmed_mean": stats.cpu_trimmed_mean(),
+        "cpu_min": stats.cpu_usage_min_cores,
+        "cpu_max": stats.cpu_usage_max_cores,
+        "cpu_current": latest_record.cpu_usage_cores or 0,
+        "memory_trimmed_mean": stats.memory_trimmed_mean(),
+        "memory_min": stats.memory_usage_min_bytes,
+        "memory_max": stats.memory_usage_max_bytes,
+        "memory_current": latest_record.memory_usage_bytes or 0,
+        "sample_count": stats.sample_count,
+    }
+
+
+def sample_history(
+    db: Session, pod_name, container_name, namespace, cutoff_time, settings
+):
+    """Usage history of a container from raw samples, or None without samples."""
+    query = db.query(ResourceMetric).filter(
+        ResourceMetric.pod_name == pod_name,
+        ResourceMetric.container_name == container_name,
+        ResourceMetric.timestamp >= cutoff_time,
+        ~ResourceMetric.namespace.in_(
+            settings.excluded_namespaces_list
+        ),  # Exclude excluded namespaces
+    )
+
+    if namespace:
+        query = query.filter(ResourceMetric.namespace == namespace)
+
+    historical_data = query.all()
+
+    if not historical_data:
+        return None
+
+    cpu_values = [m.cpu_usage_cores or 0 for m in historical_data]
+    memory_values = [m.memory_usage_bytes or 0 for m in historical_data]
+
+    # Limits are sized from interval peaks, which catch bursts between samples
+    cpu_peaks = [
+        peak_value(m.cpu_usage_max_cores, m.cpu_usage_cores) for m in historical_data
+    ]
+    memory_peaks = [
+        peak_value(m.memory_usage_max_bytes, m.memory_usage_bytes)
+        for m in historical_data
+    ]
+
+    # Get latest record for current values and settings
+    latest_record = max(historical_data, key=lambda x: x.timestamp)
+
+    return {
+        "latest": latest_record,
+        "cpu_trimmed_mean": calculate_trimmed_mean(cpu_values),
+        "cpu_min": min(cpu_values),
+        "cpu_max": max(cpu_peaks),
+        "cpu_current": latest_record.cpu_usage_cores or 0,
+        "memory_trimmed_mean": calculate_trimmed_mean(memory_values),
+        "memory_min": min(memory_values),
+        "memory_max": max(memory_peaks),
+        "memory_current": latest_record.memory_usage_bytes or 0,
+        "sample_count": len(cpu_values),
+    }
+
+
+def rollup_history(
+    db: Session, model, pod_name, container_name, namespace, cutoff_time, settings
+):
+    """Usage history of a container from a rollup tier, or None without buckets.
+
+    Trimmed means are taken over bucket averages and current usage is the
+    latest bucket's average.
+    """
+    query = (
+        db.query(model, Container.namespace, Container.node_name)
+        .join(Container, model.container_id == Container.id)
+        .filter(
+            Container.pod_name == pod_name,
+            Container.container_name == container_name,
+            model.bucket >= cutoff_time,
+            ~Container.namespace.in_(settings.excluded_namespaces_list),
+        )
+    )
+
+    if namespace:
+        query = query.filter(Container.namespace == namespace)
+
+    buckets = query.order_by(model.bucket).all()
+
+    if not buckets:
+        return None
+
+    rollups = [row[0] for row in buckets]
+    latest_bucket, latest_namespace, latest_node = buckets[-1]
+    latest_record = SimpleNamespace(
+        namespace=latest_namespace,
+        node_name=latest_node,
+        pod_phase=latest_bucket.pod_phase,
+        cpu_request_cores=latest_bucket.cpu_request_cores,
+        cpu_limit_cores=latest_bucket.cpu_limit_cores,
+        memory_request_bytes=latest_bucket.memory_request_bytes,
+        memory_limit_bytes=latest_bucket.memory_limit_bytes,
+    )
+
+    return {
+        "latest": latest_record,
+        "cpu_trimmed_mean": calculate_trimmed_mean(
+            [r.cpu_usage_avg_cores for r in rollups]
+        ),
+        "cpu_min": min(r.cpu_usage_min_cores for r in rollups),
+        "cpu_max": max(r.cpu_usage_max_cores for r in rollups),
+        "cpu_current": latest_bucket.cpu_usage_avg_cores,
+        "memory_trimmed_mean": calculate_trimmed_mean(
+            [r.memory_usage_avg_bytes for r in rollups]
+        ),
+        "memory_min": min(r.memory_usage_min_bytes for r in rollups),
+        "memory_max": max(r.memory_usage_max_bytes for r in rollups),
+        "memory_current": latest_bucket.memory_usage_avg_bytes,
+        "sample_count": sum(r.sample_count for r in rollups),
+    }
+
+
+def peak_value(peak, instant):
+    """Peak usage over an interval, falling back to the instant sample."""
+    return peak if peak is not None else (instant or 0)
+
+
 def calculate_trimmed_mean(values: list, trim_fraction: float = 0.20) -> float:
     """Return mean of the bottom (1 - trim_fraction) of values.
 
@@ -1,11 +1,14 @@
 import logging
 from datetime import datetime
 
+from anyio import to_thread
 from fastapi import APIRouter, Depends
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from ...core.dependencies import get_database_session
+from ...core.database import engine, run_db
+from ...core.dependencies import get_database_session, get_prometheus_service
+from ...core.response_cache import response_cache
 from ...models.schemas import HealthCheckResponse
 from ...services.kubernetes_service import KubernetesService
 from ...services.prometheus_service import PrometheusService
@@ -15,13 +18,16 @@ logger = logging.getLogger(__name__)
 
 
 @router.get("/", response_model=HealthCheckResponse)
-async def health_check(db: Session = Depends(get_database_session)):
+async def health_check(
+    db: Session = Depends(get_database_session),
+    prometheus_service: PrometheusService = Depends(get_prometheus_service),
+):
     """Health check endpoint for Kubernetes probes"""
 
     # Check database connectivity
     database_status = "healthy"
     try:
-        db.execute(text("SELECT 1"))
+        await run_db(db.execute, text("SELECT 1"))
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
         database_status = "unhealthy"
@@ -41,7 +47,7 @@ async def health_check(db: Session = Depends(get_database_session)):
     # Check Prometheus connectivity
     prometheus_status = "healthy"
     try:
-        async with PrometheusService() as prom_service:
+        async with prometheus_service as prom_service:
             # Simple query to check connectivity
             await prom_service.query_prometheus("up")
     except Exception as e:
@@ -76,13 +82,27 @@ async def liveness_probe():
     return {"status": "alive", "timestamp": datetime.utcnow()}
 
 
+@router.get("/cache")
+async def cache_stats():
+    """Response cache size and hit, miss and 304 counters"""
+    return response_cache.stats()
+
+
 @router.get("/readiness")
-async def readiness_probe(db: Session = Depends(get_database_session)):
+async def readiness_probe():
     """Readiness probe - checks if service is ready to handle requests"""
     try:
-        # Check if database is accessible
-        db.execute(text("SELECT 1"))
+        # Check if database is accessible. Runs on anyio's default threads
+        # with a write-engine connection, so busy database threads and read
+        # connections never hold it up
+        await to_thread.run_sync(ping_database)
         return {"status": "ready", "timestamp": datetime.utcnow()}
     except Exception as e:
         logger.error(f"Readiness check failed: {e}")
         return {"status": "not ready", "error": str(e), "timestamp": datetime.utcnow()}
+
+
+def ping_database():
+    """Run SELECT 1 on a write-engine connection; blocking, so run in a thread"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
@@ -15,14 +15,53 @@ class Settings(BaseSettings):
     k8s_config_path: Optional[str] = None
     k8s_context: Optional[str] = None  # Specific context to use
     excluded_namespaces: str = "kube-system,kube-public,kube-node-lease"
+    k8s_watch_enabled: bool = False  # Keep pods in memory via watch, no relists
+    k8s_watch_timeout_seconds: int = 300
+    k8s_list_page_size: int = 0  # Pods per list page (0 = single request)
+    k8s_raw_decode: bool = True  # Decode pod lists from raw JSON, skip models
 
     # Prometheus settings
     prometheus_url: str = "http://localhost:9090"  # More generic default
     prometheus_timeout: int = 30
+    prometheus_pool_size: int = 20  # Max pooled connections to Prometheus
+    prometheus_keepalive_seconds: int = 120
+    prometheus_dns_cache_seconds: int = 300
+    prometheus_shard_size: int = 0  # Namespaces per usage query (0 = no sharding)
+    prometheus_shard_concurrency: int = 4
+    prometheus_shard_retries: int = 2
+    prometheus_peak_sampling: bool = True  # Max/p95 usage over each interval
+    prometheus_peak_resolution: str = "30s"
+    prometheus_peak_rate_window: str = "1m"
 
     # Database settings
     database_url: str = "sqlite:///./data/k8s_metrics.db"
     retention_days: int = 7  # More reasonable default for production
+    sample_partition_days: int = 1  # Samples are stored and expired per period
+    metric_write_mode: str = "bulk"  # "bulk" (Core executemany) or "orm"
+    metric_write_batch_size: int = 5000
+    db_threadpool_size: int = 15  # Threads serving DB requests, one reader each
+
+    # SQLite settings, applied to every new connection
+    sqlite_journal_mode: str = "wal"  # Readers never block on the writer
+    sqlite_synchronous: str = "normal"  # Durable in WAL mode except on power loss
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_mb: int = 64  # Page cache per connection
+    sqlite_mmap_size_mb: int = 256
+    sqlite_temp_store: str = "memory"
+    sqlite_wal_autocheckpoint_pages: int = 1000  # 0 = only background checkpoints
+    sqlite_checkpoint_interval_seconds: int = 60  # 0 = no background checkpoints
+    sqlite_wal_truncate_mb: int = 64  # Truncate the WAL once it grows past this
+
+    # Backfill settings
+    backfill_on_startup: bool = False  # Load history from Prometheus at start
+    backfill_chunk_hours: int = 2  # Time span of each range query
+    backfill_concurrency: int = 4
+
+    # Rollup settings
+    rollup_enabled: bool = True  # Aggregate samples into hourly and daily tiers
+    rollup_hourly_retention_days: int = 30
+    rollup_daily_retention_days: int = 90
+    rollup_min_points: int = 100  # Reads use the coarsest tier with this many
 
     # Scheduler settings
     collection_interval_minutes: int = 5
@@ -31,6 +70,9 @@ class Settings(BaseSettings):
     # API settings
     cors_origins: str = "*"
     page_size: int = 20
+    response_cache_enabled: bool = True  # Reuse reads until new data is committed
+    response_cache_max_entries: int = 256
+    response_cache_max_mb: int = 64
 
     @property
     def excluded_namespaces_list(self):
@@ -1,11 +1,42 @@
+import logging
 import os
+from functools import partial
 from pathlib import Path
+from typing import Callable, List, Sequence, TypeVar
 
-from sqlalchemy import create_engine
+from anyio import CapacityLimiter, Lock, to_thread
+from anyio.lowlevel import RunVar
+from sqlalchemy import (
+    Engine,
+    and_,
+    create_engine,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, sessionmaker
 
-from ..models.database import Base
-from .config import get_settings
+from ..models.database import (
+    Base,
+    Container,
+    ContainerSpec,
+    LegacyResourceMetric,
+    ResourceSample,
+)
+from .config import Settings, get_settings
+from .partitions import (
+    SamplePartitions,
+    partition_names,
+    partition_table,
+    refresh_view,
+)
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
@@ -29,22 +60,167 @@ if "sqlite" in settings.database_url:
             db_path = os.path.join(tempfile.gettempdir(), "k8s_metrics.db")
             settings.database_url = f"sqlite:///{db_path}"
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.database_url,
-    connect_args=(
-        {"check_same_thread": False} if "sqlite" in settings.database_url else {}
-    ),
-    echo=settings.debug,
-)
 
-# Create SessionLocal class
+def sqlite_pragmas(settings: Settings, read_only: bool = False) -> List[str]:
+    """PRAGMA statements run on every new SQLite connection.
+
+    The journal mode is stored in the database file, so only writers set it;
+    readers are made read-only instead.
+    """
+    pragmas = [
+        f"busy_timeout = {settings.sqlite_busy_timeout_ms}",
+        f"cache_size = {-settings.sqlite_cache_size_mb * 1024}",  # In KiB
+        f"mmap_size = {settings.sqlite_mmap_size_mb * 1024**2}",
+        f"temp_store = {settings.sqlite_temp_store}",
+    ]
+    if read_only:
+        pragmas.append("query_only = ON")
+    else:
+        pragmas += [
+            f"journal_mode = {settings.sqlite_journal_mode}",
+            f"synchronous = {settings.sqlite_synchronous}",
+            f"wal_autocheckpoint = {settings.sqlite_wal_autocheckpoint_pages}",
+        ]
+    return pragmas
+
+
+def create_database_engine(
+    url: str, settings: Settings, read_only: bool = False, **kwargs
+) -> Engine:
+    """Engine for url, with the SQLite profile applied to its connections."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, echo=settings.debug, **kwargs)
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        echo=settings.debug,
+        **kwargs,
+    )
+    pragmas = sqlite_pragmas(settings, read_only)
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    return engine
+
+
+def is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and url not in ("sqlite://", "sqlite:///:memory:")
+
+
+# Create SQLAlchemy engines: writes go through engine, request handlers read
+# through read_engine, one pooled read-only connection per handler thread
+engine = create_database_engine(settings.database_url, settings)
+if is_sqlite_file(settings.database_url):
+    read_engine = create_database_engine(
+        settings.database_url,
+        settings,
+        read_only=True,
+        pool_size=settings.db_threadpool_size,
+        max_overflow=0,
+    )
+else:
+    read_engine = engine
+
+# Worker threads for database work, apart from anyio's default pool so other
+# sync work never competes with queries; one per pooled read connection
+_db_limiter: RunVar[CapacityLimiter] = RunVar("db_limiter")
+
+T = TypeVar("T")
+
+
+def db_limiter() -> CapacityLimiter:
+    """The running event loop's limiter for database worker threads."""
+    try:
+        return _db_limiter.get()
+    except LookupError:
+        limiter = CapacityLimiter(settings.db_threadpool_size)
+        _db_limiter.set(limiter)
+        return limiter
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking database work in a worker thread bounded by db_limiter."""
+    return await to_thread.run_sync(
+        partial(func, *args, **kwargs), limiter=db_limiter()
+    )
+
+
+_write_lock: RunVar[Lock] = RunVar("write_lock")
+
+
+def write_lock() -> Lock:
+    """The running event loop's lock for writes of samples.
+
+    SQLite has one writer at a time, and a collection keeps its transaction
+    open while it lists pod pages. Collections and backfill chunks take turns
+    here, instead of waiting on each other past the busy timeout.
+    """
+    try:
+        return _write_lock.get()
+    except LookupError:
+        lock = Lock()
+        _write_lock.set(lock)
+        return lock
+
+
+# Create SessionLocal classes
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
+SPEC_COLUMNS = [
+    column.name
+    for column in ContainerSpec.__table__.columns
+    if column.name not in ("id", "container_id", "valid_from", "valid_to")
+]
 
-def init_database():
+
+def init_database(bind=engine):
     """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=bind, tables=stored_tables())
+    add_missing_columns(bind)
+    with bind.begin() as connection:
+        refresh_view(connection)
+    migrate_legacy_metrics(bind)
+
+
+def stored_tables():
+    """Tables created up front.
+
+    Sample partitions are created as rows arrive and the samples table
+    itself is a view over them.
+    """
+    return [
+        table
+        for table in Base.metadata.sorted_tables
+        if not (table.info.get("partitioned") or table.info.get("partition"))
+    ]
+
+
+def add_missing_columns(bind=engine):
+    """Add nullable columns introduced after a table was first created."""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        partitions = [partition_table(name) for name in partition_names(connection)]
+        for table in [*stored_tables(), *partitions]:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
 
 
 def get_db() -> Session:
@@ -54,3 +230,161 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Session:
+    """Dependency to get a read-only database session"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def checkpoint_wal(bind=engine, truncate_mb: int = settings.sqlite_wal_truncate_mb):
+    """Copy the SQLite WAL into the database file.
+
+    Checkpoints without waiting on readers, and truncates the WAL file once
+    it has grown past truncate_mb. Returns the WAL size in bytes before the
+    checkpoint, or None when the database is not in WAL mode.
+    """
+    with bind.connect() as connection:
+        _, wal_pages, _ = connection.exec_driver_sql(
+            "PRAGMA wal_checkpoint(PASSIVE)"
+        ).one()
+        if wal_pages < 0:
+            return None
+
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        wal_bytes = wal_pages * page_size
+        if wal_bytes >= truncate_mb * 1024**2:
+            busy, _, _ = connection.exec_driver_sql(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).one()
+            if busy:
+                logger.warning(f"WAL of {wal_bytes} bytes not truncated, readers busy")
+            else:
+                logger.info(f"Checkpointed and truncated WAL of {wal_bytes} bytes")
+    return wal_bytes
+
+
+def dialect_insert(connection):
+    """INSERT construct with ON CONFLICT support for the connection's database."""
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def executemany(connection, statement, columns: Sequence[str], rows: List):
+    """Execute a statement once per tuple of columns' values.
+
+    SQLAlchemy sends the rows as one executemany call, batched into
+    multi-row INSERTs where the driver supports it.
+    """
+    if rows:
+        connection.execute(statement, [dict(zip(columns, row)) for row in rows])
+
+
+def migrate_legacy_metrics(bind=engine):
+    """Copy rows of the old wide resource_metrics table into samples, once.
+
+    The legacy table is left in place afterwards and no longer written.
+    """
+    legacy = LegacyResourceMetric.__table__
+    containers = Container.__table__
+    samples = ResourceSample.__table__
+
+    inspector = inspect(bind)
+    if not inspector.has_table(legacy.name):
+        return
+
+    # Older databases may predate some columns; copy what exists
+    existing = {column["name"] for column in inspector.get_columns(legacy.name)}
+    columns = [
+        column.name
+        for column in samples.columns
+        if column.name not in ("id", "container_id") and column.name in existing
+    ]
+    spec_columns = [name for name in SPEC_COLUMNS if name in existing]
+
+    with bind.begin() as connection:
+        if connection.execute(select(samples.c.id).limit(1)).first():
+            return
+        if not connection.execute(select(legacy.c.id).limit(1)).first():
+            return
+
+        identity = ["namespace", "pod_name", "container_name", "node_name"]
+        connection.execute(
+            insert(containers).from_select(
+                identity,
+                select(*(legacy.c[name] for name in identity)).distinct(),
+            )
+        )
+
+        matches_container = [
+            containers.c[name].is_not_distinct_from(legacy.c[name]) for name in identity
+        ]
+        legacy_rows = (
+            select(
+                containers.c.id.label("container_id"),
+                *(legacy.c[name] for name in columns + spec_columns),
+            )
+            .select_from(legacy)
+            .join(containers, and_(*matches_container))
+            .subquery()
+        )
+        rows = SamplePartitions().insert_from_select(
+            connection, legacy_rows, ["container_id", *columns]
+        )
+        spec_changes = insert_spec_history(connection, legacy_rows)
+
+    logger.info(
+        f"Migrated {rows} rows from {legacy.name} to samples "
+        f"and {spec_changes} spec changes"
+    )
+
+
+def insert_spec_history(connection, source) -> int:
+    """Insert a spec row wherever a container's requests/limits change.
+
+    source has container_id, timestamp and the spec columns, one row per
+    sample; each change is valid until the container's next change.
+    """
+    specs = ContainerSpec.__table__
+    spec_columns = [name for name in SPEC_COLUMNS if name in source.c]
+    by_container = {
+        "partition_by": source.c.container_id,
+        "order_by": source.c.timestamp,
+    }
+
+    changes = select(
+        source.c.container_id,
+        source.c.timestamp,
+        *(source.c[name] for name in spec_columns),
+        or_(
+            func.row_number().over(**by_container) == 1,
+            *(
+                func.lag(source.c[name])
+                .over(**by_container)
+                .is_distinct_from(source.c[name])
+                for name in spec_columns
+            ),
+        ).label("changed"),
+    ).subquery()
+
+    # Window functions apply after WHERE, so lead() finds the next change
+    result = connection.execute(
+        insert(specs).from_select(
+            ["container_id", "valid_from", "valid_to", *spec_columns],
+            select(
+                changes.c.container_id,
+                changes.c.timestamp,
+                func.lead(changes.c.timestamp).over(
+                    partition_by=changes.c.container_id,
+                    order_by=changes.c.timestamp,
+                ),
+                *(changes.c[name] for name in spec_columns),
+            ).where(changes.c.changed),
+        )
+    )
+    return result.rowcount
@@ -1,8 +1,11 @@
-from fastapi import Depends
+from functools import wraps
+
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
 
+from ..services.prometheus_service import PrometheusService
 from .config import Settings, get_settings
-from .database import get_db
+from .database import get_read_db, run_db
 
 
 def get_settings_dependency() -> Settings:
@@ -10,6 +13,27 @@ def get_settings_dependency() -> Settings:
     return get_settings()
 
 
-def get_database_session(db: Session = Depends(get_db)) -> Session:
-    """Dependency to get database session"""
+def get_database_session(db: Session = Depends(get_read_db)) -> Session:
+    """Dependency to get a read-only database session"""
     return db
+
+
+def get_prometheus_service(request: Request) -> PrometheusService:
+    """Dependency to get the application-scoped Prometheus client"""
+    prometheus_service = getattr(request.app.state, "prometheus_service", None)
+    # Outside the lifespan (e.g. tests) fall back to a per-request session
+    return prometheus_service or PrometheusService()
+
+
+def db_thread(handler):
+    """Run a sync route handler on the database worker threads.
+
+    FastAPI would run it on anyio's default pool; the wrapper keeps the
+    handler's signature, so its parameters and dependencies are unchanged.
+    """
+
+    @wraps(handler)
+    async def endpoint(*args, **kwargs):
+        return await run_db(handler, *args, **kwargs)
+
+    return endpoint
@@ -0,0 +1,248 @@
+"""Time partitions of resource samples.
+
+Samples are stored in one table per period, named after the period's first
+day (``resource_samples_20240101``). ``resource_samples`` is a view unioning
+the partitions, so reads through ``ResourceSample`` and ``ResourceMetric``
+are unchanged; writes go to the partition of each row's timestamp and
+retention drops whole partitions instead of deleting rows.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import (
+    Index,
+    Table,
+    false,
+    func,
+    insert,
+    inspect,
+    null,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.orm import Session, registry
+
+from ..models.database import Base, ResourceSample
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+VIEW = ResourceSample.__tablename__
+
+_PARTITION_NAME = re.compile(rf"^{VIEW}_(\d{{8}})$")
+
+# View ids are a partition's own ids offset by its start day, which keeps
+# them unique across partitions
+_ID_BITS = 32
+
+_mapper_registry = registry()
+_sample_classes: Dict[str, type] = {}
+
+T = TypeVar("T")
+
+
+def partition_name(start: datetime) -> str:
+    return f"{VIEW}_{start:%Y%m%d}"
+
+
+def partition_start(name: str) -> datetime:
+    return datetime.strptime(_PARTITION_NAME.match(name).group(1), "%Y%m%d")
+
+
+def partition_names(connection) -> List[str]:
+    """Names of the partitions in the database, oldest first."""
+    return sorted(
+        name
+        for name in inspect(connection).get_table_names()
+        if _PARTITION_NAME.match(name)
+    )
+
+
+def partition_table(name: str) -> Table:
+    """Table of a partition, shaped like ``ResourceSample`` with its own indexes."""
+    table = Base.metadata.tables.get(name)
+    if table is not None:
+        return table
+
+    template = ResourceSample.__table__
+    table = Table(
+        name,
+        Base.metadata,
+        *(column._copy() for column in template.columns),
+        info={"partition": True},
+    )
+    for index in template.indexes:
+        Index(
+            index.name.replace("idx_samples", f"idx_{name}"),
+            *(table.c[column.name] for column in index.columns),
+        )
+    return table
+
+
+def sample_class(table: Table) -> type:
+    """ORM class for writing samples into one partition."""
+    cls = _sample_classes.get(table.name)
+    if cls is None:
+        cls = type(f"Sample_{table.name}", (), {})
+        _mapper_registry.map_imperatively(cls, table)
+        _sample_classes[table.name] = cls
+    return cls
+
+
+def refresh_view(connection):
+    """Recreate the view over the partitions that currently exist."""
+    template = ResourceSample.__table__
+    selects = []
+    for name in partition_names(connection):
+        table = partition_table(name)
+        offset = (partition_start(name) - EPOCH).days << _ID_BITS
+        selects.append(
+            select(
+                (table.c.id + offset).label("id"),
+                *(table.c[column.name] for column in template.columns[1:]),
+            )
+        )
+    if not selects:
+        selects.append(
+            select(*(null().label(column.name) for column in template.columns)).where(
+                false()
+            )
+        )
+
+    query = union_all(*selects) if len(selects) > 1 else selects[0]
+    compiled = query.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    connection.execute(text(f"DROP VIEW IF EXISTS {VIEW}"))
+    connection.execute(text(f"CREATE VIEW {VIEW} AS {compiled}"))
+
+
+def latest_sample_time(db: Session) -> Optional[datetime]:
+    """Newest sample timestamp, looking at the newest partitions first."""
+    connection = db.connection()
+    for name in reversed(partition_names(connection)):
+        table = partition_table(name)
+        latest = connection.execute(select(func.max(table.c.timestamp))).scalar()
+        if latest is not None:
+            return latest
+    return None
+
+
+def earliest_sample_time(db: Session) -> Optional[datetime]:
+    """Oldest sample timestamp, looking at the oldest partitions first."""
+    connection = db.connection()
+    for name in partition_names(connection):
+        table = partition_table(name)
+        earliest = connection.execute(select(func.min(table.c.timestamp))).scalar()
+        if earliest is not None:
+            return earliest
+    return None
+
+
+class SamplePartitions:
+    """Sample partitions known to exist, created as rows for new periods arrive.
+
+    Partitions hold sample_partition_days each. Keep one instance across
+    writes so existing partitions are not looked up again; clear it after
+    a rollback.
+    """
+
+    def __init__(self, days: Optional[int] = None):
+        self.period = timedelta(days=days or get_settings().sample_partition_days)
+        self._names: Optional[set] = None
+
+    def clear(self):
+        self._names = None
+
+    def start_of(self, timestamp: datetime) -> datetime:
+        return timestamp - (timestamp - EPOCH) % self.period
+
+    def table_for(self, connection, start: datetime) -> Table:
+        """Partition table starting at start, created if needed."""
+        if self._names is None:
+            self._names = set(partition_names(connection))
+
+        name = partition_name(start)
+        table = partition_table(name)
+        if name not in self._names:
+            table.create(connection, checkfirst=True)
+            refresh_view(connection)
+            self._names.add(name)
+            logger.info(f"Created sample partition {name}")
+        return table
+
+    def route(
+        self,
+        connection,
+        items: Iterable[T],
+        timestamp: Callable[[T], datetime],
+    ) -> Dict[Table, List[T]]:
+        """Group items by the partition of their timestamp."""
+        starts: Dict[datetime, datetime] = {}
+        groups: Dict[datetime, List[T]] = {}
+        for item in items:
+            moment = timestamp(item)
+            start = starts.get(moment)
+            if start is None:
+                start = starts[moment] = self.start_of(moment)
+            groups.setdefault(start, []).append(item)
+
+        return {
+            self.table_for(connection, start): group
+            for start, group in sorted(groups.items())
+        }
+
+    def insert_from_select(self, connection, source, columns: Sequence[str]) -> int:
+        """Copy a selectable's rows into partitions, one period at a time.
+
+        source must have a timestamp column and the named columns.
+        """
+        first, last = connection.execute(
+            select(func.min(source.c.timestamp), func.max(source.c.timestamp))
+        ).one()
+        if first is None:
+            return 0
+
+        inserted = 0
+        start = self.start_of(first)
+        while start <= last:
+            end = start + self.period
+            result = connection.execute(
+                insert(self.table_for(connection, start)).from_select(
+                    list(columns),
+                    select(*(source.c[name] for name in columns)).where(
+                        source.c.timestamp >= start, source.c.timestamp < end
+                    ),
+                )
+            )
+            inserted += result.rowcount
+            start = end
+        return inserted
+
+    def drop_before(self, connection, cutoff: datetime) -> List[str]:
+        """Drop partitions holding only rows older than cutoff.
+
+        Each partition costs one indexed max() and a DROP TABLE, whatever
+        its row count, and the freed pages are reused by new partitions.
+        """
+        dropped = []
+        for name in partition_names(connection):
+            if partition_start(name) >= cutoff:
+                break
+            table = partition_table(name)
+            latest = connection.execute(select(func.max(table.c.timestamp))).scalar()
+            if latest is None or latest < cutoff:
+                dropped.append(name)
+
+        if dropped:
+            for name in dropped:
+                partition_table(name).drop(connection)
+            refresh_view(connection)
+            if self._names is not None:
+                self._names.difference_update(dropped)
+        return dropped
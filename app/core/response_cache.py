@@ -0,0 +1,183 @@
+"""Response cache for reads of collected data.
+
+Dashboard and API reads only change when collected data is committed, so
+their responses are kept per data version, scheme and host, route and
+normalised query string until the collector or backfill moves the version
+on. Cached responses carry a strong ETag, and requests whose If-None-Match
+already names it are answered with 304 Not Modified.
+
+The cache is only touched from the event loop, so it takes no locks.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from .config import get_settings
+
+CACHED_PATHS = ("/dashboard", "/api/")  # GET requests under these prefixes
+
+
+class CachedResponse(NamedTuple):
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: bytes
+
+
+class ResponseCache:
+    """LRU of response bodies, bounded by entry count and total size."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self.size = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def key(self, scope: Dict) -> Tuple:
+        """Data version, origin, path, and query parameters in a canonical order.
+
+        Pages link their assets by absolute URLs built from the request's
+        scheme and Host, so each origin the app is reached through gets its
+        own entries.
+        """
+        query = parse_qsl(scope["query_string"].decode("latin-1"), True)
+        host = next((value for name, value in scope["headers"] if name == b"host"), b"")
+        return (
+            self.version,
+            scope["scheme"],
+            host.decode("latin-1").lower(),
+            scope["path"],
+            urlencode(sorted(query)),
+        )
+
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        response = self.entries.get(key)
+        if response is not None:
+            self.entries.move_to_end(key)
+        return response
+
+    def put(
+        self, key: Tuple, headers: List[Tuple[bytes, bytes]], body: bytes
+    ) -> CachedResponse:
+        """Tag a response with its ETag and keep it while its version is current."""
+        etag = b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+        response = CachedResponse(
+            [*headers, (b"etag", etag), (b"cache-control", b"no-cache")], body, etag
+        )
+
+        # Responses computed before an invalidation, or varying with request
+        # headers the key leaves out, are never stored
+        if (
+            key[0] != self.version
+            or len(body) > self.max_bytes
+            or any(name == b"vary" for name, _ in headers)
+        ):
+            return response
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key).body)
+        self.entries[key] = response
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.body)
+            self.evictions += 1
+        return response
+
+    def invalidate(self):
+        """Start a new data version after collected data is committed."""
+        self.version += 1
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+class ResponseCacheMiddleware:
+    """Serve cached GET responses, and 304s to clients holding the ETag."""
+
+    def __init__(self, app, cache: "ResponseCache"):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(CACHED_PATHS)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = self.cache.key(scope)
+        response = self.cache.get(key)
+        if response is not None:
+            self.cache.hits += 1
+        else:
+            self.cache.misses += 1
+            start: Dict = {}
+            chunks: List[bytes] = []
+
+            async def capture(message):
+                # Only complete 200 responses are buffered; others pass through
+                if message["type"] == "http.response.start":
+                    start.update(message)
+                    if message["status"] != 200:
+                        await send(message)
+                elif message["type"] != "http.response.body" or start["status"] != 200:
+                    await send(message)
+                else:
+                    chunks.append(message.get("body", b""))
+
+            await self.app(scope, receive, capture)
+            if start.get("status") != 200:
+                return
+            response = self.cache.put(key, start["headers"], b"".join(chunks))
+
+        tags = _if_none_match(scope)
+        if response.etag in tags or b"*" in tags:
+            self.cache.not_modified += 1
+            headers = [
+                (name, value)
+                for name, value in response.headers
+                if name in (b"etag", b"cache-control")
+            ]
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send(
+            {"type": "http.response.start", "status": 200, "headers": response.headers}
+        )
+        await send({"type": "http.response.body", "body": response.body})
+
+
+def _if_none_match(scope: Dict) -> List[bytes]:
+    """ETags named by If-None-Match, compared weakly as RFC 9110 requires."""
+    for name, value in scope["headers"]:
+        if name == b"if-none-match":
+            return [tag.strip().removeprefix(b"W/") for tag in value.split(b",")]
+    return []
+
+
+settings = get_settings()
+response_cache = ResponseCache(
+    settings.response_cache_max_entries,
+    settings.response_cache_max_mb * 1024 * 1024,
+)
@@ -1,11 +1,16 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
+from ..services.backfill_service import BackfillService
 from ..services.collector_service import ResourceCollectorService
+from ..services.container_stats import ensure_stats
+from ..services.prometheus_service import PrometheusService
 from .config import get_settings
+from .database import checkpoint_wal, engine, run_db
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +21,9 @@ class TaskScheduler:
         self.collector_service = None
         self.settings = get_settings()
 
-    async def initialize(self):
+    async def initialize(self, prometheus_service: PrometheusService = None):
         """Initialize the collector service."""
-        self.collector_service = ResourceCollectorService()
+        self.collector_service = ResourceCollectorService(prometheus_service)
         await self.collector_service.initialize()
 
     def start(self):
@@ -37,6 +42,19 @@ class TaskScheduler:
             coalesce=True,
         )
 
+        # Keep the SQLite WAL from growing while readers hold old snapshots
+        checkpoint_seconds = self.settings.sqlite_checkpoint_interval_seconds
+        if checkpoint_seconds and engine.dialect.name == "sqlite":
+            self.scheduler.add_job(
+                func=self._checkpoint_wal,
+                trigger=IntervalTrigger(seconds=checkpoint_seconds),
+                id="wal_checkpoint",
+                name="SQLite WAL Checkpoint",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+
         self.scheduler.start()
         interval = self.settings.collection_interval_minutes
         logger.info(f"Scheduler started with {interval} minute intervals")
@@ -59,6 +77,26 @@ class TaskScheduler:
         except Exception as e:
             logger.error(f"Resource collection failed: {e}")
 
+    def _checkpoint_wal(self):
+        """Background task to checkpoint the WAL, run in a worker thread."""
+        try:
+            checkpoint_wal()
+        except Exception as e:
+            logger.error(f"WAL checkpoint failed: {e}")
+
+
+async def run_backfill(prometheus_service: PrometheusService):
+    """Background task to backfill history from Prometheus."""
+    k8s_service = (
+        task_scheduler.collector_service.k8s_service
+        if task_scheduler.collector_service
+        else None
+    )
+    try:
+        await BackfillService(prometheus_service, k8s_service).run()
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}")
+
 
 # Global scheduler instance
 task_scheduler = TaskScheduler()
@@ -70,12 +108,27 @@ async def lifespan(app):
     # Startup
     settings = get_settings()
 
+    # History written before statistics were maintained gets them built once
+    await run_db(ensure_stats)
+
+    # Shared Prometheus client with a keep-alive connection pool
+    prometheus_service = PrometheusService()
+    await prometheus_service.start()
+    app.state.prometheus_service = prometheus_service
+
     if settings.enable_scheduler:
-        await task_scheduler.initialize()
+        await task_scheduler.initialize(prometheus_service)
         task_scheduler.start()
 
+    backfill_task = None
+    if settings.backfill_on_startup:
+        backfill_task = asyncio.create_task(run_backfill(prometheus_service))
+
     yield
 
     # Shutdown
+    if backfill_task:
+        backfill_task.cancel()
     task_scheduler.stop()
     await task_scheduler.cleanup()
+    await prometheus_service.close()
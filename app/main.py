@@ -7,6 +7,7 @@ from fastapi.staticfiles import StaticFiles
 from .api.routes import api, dashboard, health
 from .core.config import get_settings
 from .core.database import init_database
+from .core.response_cache import ResponseCacheMiddleware, response_cache
 from .core.scheduler import lifespan
 
 # Configure logging
@@ -29,6 +30,11 @@ app = FastAPI(
     redoc_url=None,  # Disable ReDoc
 )
 
+# Serve repeated reads from memory until new data is committed. Added first so
+# it sits inside CORS, which then sets per-origin headers on cached responses
+if settings.response_cache_enabled:
+    app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
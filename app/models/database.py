@@ -1,12 +1,192 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, Index, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    and_,
+    join,
+    or_,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import column_property, declared_attr
 
 Base = declarative_base()
 
 
+class Container(Base):
+    """Container identity, stored once and referenced by its samples."""
+
+    __tablename__ = "containers"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    namespace = Column(String(63), nullable=False)
+    pod_name = Column(String(253), nullable=False)
+    container_name = Column(String(253), nullable=True)
+    node_name = Column(String(253), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "idx_container_identity",
+            "namespace",
+            "pod_name",
+            "container_name",
+            "node_name",
+            unique=True,
+        ),
+        Index("idx_container_pod", "pod_name"),
+    )
+
+
+class ResourceSample(Base):
+    """One narrow row per container per collection.
+
+    Rows are stored in time partitions (see ``app.core.partitions``); this
+    table is the view that unions them and is not written directly.
+    """
+
+    __tablename__ = "resource_samples"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    container_id = Column(Integer, ForeignKey("containers.id"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+
+    # Actual usage from Prometheus
+    cpu_usage_cores = Column(Float, nullable=True)
+    memory_usage_bytes = Column(Integer, nullable=True)
+
+    # Peak usage over the collection interval (Prometheus subqueries)
+    cpu_usage_max_cores = Column(Float, nullable=True)
+    cpu_usage_p95_cores = Column(Float, nullable=True)
+    memory_usage_max_bytes = Column(Integer, nullable=True)
+    memory_usage_p95_bytes = Column(Integer, nullable=True)
+
+    # Status information
+    pod_phase = Column(String(20), nullable=True)
+
+    __table_args__ = (
+        Index("idx_samples_time_container", "timestamp", "container_id"),
+        Index("idx_samples_container_time", "container_id", "timestamp"),
+        {"info": {"partitioned": True}},
+    )
+
+
+class ContainerSpec(Base):
+    """Requests and limits of a container over [valid_from, valid_to).
+
+    A row is added only when the spec changes; valid_to is NULL while the
+    spec is current.
+    """
+
+    __tablename__ = "container_specs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    container_id = Column(Integer, ForeignKey("containers.id"), nullable=False)
+    valid_from = Column(DateTime, nullable=False)
+    valid_to = Column(DateTime, nullable=True)
+
+    # Resource requests and limits
+    cpu_request_cores = Column(Float, nullable=True)
+    memory_request_bytes = Column(Integer, nullable=True)
+    cpu_limit_cores = Column(Float, nullable=True)
+    memory_limit_bytes = Column(Integer, nullable=True)
+
+    __table_args__ = (Index("idx_specs_container_from", "container_id", "valid_from"),)
+
+
+def spec_valid_at(container_id, timestamp):
+    """Join condition matching the spec in effect for a container at a time."""
+    specs = ContainerSpec.__table__.c
+    return and_(
+        specs.container_id == container_id,
+        specs.valid_from <= timestamp,
+        or_(specs.valid_to.is_(None), specs.valid_to > timestamp),
+    )
+
+
+_samples = ResourceSample.__table__
+_containers = Container.__table__
+_specs = ContainerSpec.__table__
+
+
 class ResourceMetric(Base):
+    """Samples with their container identity and spec as of the sample, for reads.
+
+    Exposes the wide per-container columns that queries filter and sort on,
+    while storage stays normalized. Rows are written through the tables.
+    """
+
+    __table__ = join(
+        _samples, _containers, _samples.c.container_id == _containers.c.id
+    ).outerjoin(_specs, spec_valid_at(_samples.c.container_id, _samples.c.timestamp))
+    __mapper_args__ = {"primary_key": [_samples.c.id]}
+
+    id = _samples.c.id
+    container_id = column_property(_samples.c.container_id, _containers.c.id)
+    spec_id = column_property(_specs.c.id)
+    spec_container_id = column_property(_specs.c.container_id)
+
+
+class RollupMixin:
+    """Usage of one container aggregated over a time bucket.
+
+    min, avg and p95 are over the instant samples, max over the interval
+    peaks; requests, limits and phase are those of the bucket's last sample.
+    """
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket = Column(DateTime, nullable=False)
+    sample_count = Column(Integer, nullable=False, default=0)
+
+    cpu_usage_min_cores = Column(Float, nullable=True)
+    cpu_usage_avg_cores = Column(Float, nullable=True)
+    cpu_usage_p95_cores = Column(Float, nullable=True)
+    cpu_usage_max_cores = Column(Float, nullable=True)
+    memory_usage_min_bytes = Column(Integer, nullable=True)
+    memory_usage_avg_bytes = Column(Integer, nullable=True)
+    memory_usage_p95_bytes = Column(Integer, nullable=True)
+    memory_usage_max_bytes = Column(Integer, nullable=True)
+
+    cpu_request_cores = Column(Float, nullable=True)
+    memory_request_bytes = Column(Integer, nullable=True)
+    cpu_limit_cores = Column(Float, nullable=True)
+    memory_limit_bytes = Column(Integer, nullable=True)
+    pod_phase = Column(String(20), nullable=True)
+
+    @declared_attr
+    def container_id(cls):
+        return Column(Integer, ForeignKey("containers.id"), nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            Index(
+                f"idx_{cls.__tablename__}_container_bucket",
+                "container_id",
+                "bucket",
+                unique=True,
+            ),
+            Index(f"idx_{cls.__tablename__}_bucket", "bucket"),
+        )
+
+
+class HourlyRollup(RollupMixin, Base):
+    __tablename__ = "rollups_hourly"
+
+
+class DailyRollup(RollupMixin, Base):
+    __tablename__ = "rollups_daily"
+
+
+# Wide table used before samples were normalized; only read to migrate it
+LegacyBase = declarative_base()
+
+
+class LegacyResourceMetric(LegacyBase):
     __tablename__ = "resource_metrics"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -16,20 +196,21 @@ class ResourceMetric(Base):
     container_name = Column(String(253), nullable=True)
     node_name = Column(String(253), nullable=True)
 
-    # Resource requests and limits
     cpu_request_cores = Column(Float, nullable=True)
     memory_request_bytes = Column(Integer, nullable=True)
     cpu_limit_cores = Column(Float, nullable=True)
     memory_limit_bytes = Column(Integer, nullable=True)
 
-    # Actual usage from Prometheus
     cpu_usage_cores = Column(Float, nullable=True)
     memory_usage_bytes = Column(Integer, nullable=True)
 
-    # Status information
+    cpu_usage_max_cores = Column(Float, nullable=True)
+    cpu_usage_p95_cores = Column(Float, nullable=True)
+    memory_usage_max_bytes = Column(Integer, nullable=True)
+    memory_usage_p95_bytes = Column(Integer, nullable=True)
+
     pod_phase = Column(String(20), nullable=True)
 
-    # Composite indexes for optimal query performance
     __table_args__ = (
         Index("idx_time_pod", "timestamp", "pod_name"),
         Index("idx_time_namespace", "timestamp", "namespace"),
@@ -38,6 +219,39 @@ class ResourceMetric(Base):
 
 
 # Separate table for summary data
+# Usage statistics of a container's samples in one sample partition period,
+# added to as samples are written and dropped with the partition
+class ContainerStats(Base):
+    __tablename__ = "container_stats"
+
+    container_id = Column(Integer, ForeignKey("containers.id"), primary_key=True)
+    period_start = Column(DateTime, primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
+    first_sample = Column(DateTime)
+    last_sample = Column(DateTime)
+
+    cpu_usage_sum_cores = Column(Float, default=0.0)
+    cpu_usage_min_cores = Column(Float)
+    cpu_usage_max_cores = Column(Float)
+
+    memory_usage_sum_bytes = Column(Integer, default=0)
+    memory_usage_min_bytes = Column(Integer)
+    memory_usage_max_bytes = Column(Integer)
+
+
+# Bins of the per-container usage quantile sketches (QuantileSketch)
+class ContainerStatsBin(Base):
+    __tablename__ = "container_stats_bins"
+
+    container_id = Column(Integer, ForeignKey("containers.id"), primary_key=True)
+    period_start = Column(DateTime, primary_key=True)
+    metric = Column(String(8), primary_key=True)
+    bin = Column(Integer, primary_key=True, autoincrement=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Totals of active containers per collection and namespace, written with the
+# samples; the CLUSTER_SUMMARY row covers all namespaces that are not excluded
 class ResourceSummary(Base):
     __tablename__ = "resource_summaries"
 
@@ -46,9 +260,45 @@ class ResourceSummary(Base):
     namespace = Column(String(63), nullable=False)
 
     total_pods = Column(Integer, default=0)
+    total_containers = Column(Integer, default=0)
     total_cpu_requests = Column(Float, default=0.0)
     total_memory_requests = Column(Integer, default=0)
     total_cpu_limits = Column(Float, default=0.0)
     total_memory_limits = Column(Integer, default=0)
     total_cpu_usage = Column(Float, default=0.0)
     total_memory_usage = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("idx_summaries_timestamp_namespace", "timestamp", "namespace"),
+    )
+
+
+CLUSTER_SUMMARY = "_cluster"
+
+
+# One row per collection cycle; a run is marked completed in the transaction
+# that commits its samples, so reads pinned to it see whole snapshots
+class CollectionRun(Base):
+    __tablename__ = "collection_runs"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_time = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    status = Column(String(16), nullable=False, default="running")
+    pods = Column(Integer, default=0)
+    rows_written = Column(Integer, default=0)
+    specs_written = Column(Integer, default=0)
+
+    __table_args__ = (Index("idx_runs_status", "status", "id"),)
+
+
+# Backfill progress, one row per completed time chunk
+class BackfillChunk(Base):
+    __tablename__ = "backfill_chunks"
+
+    id = Column(Integer, primary_key=True)
+    chunk_start = Column(DateTime, nullable=False, unique=True)
+    chunk_end = Column(DateTime, nullable=False)
+    rows = Column(Integer, default=0)
+    completed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -17,6 +17,10 @@ class ResourceMetricBase(BaseModel):
     memory_limit_bytes: Optional[int] = None
     cpu_usage_cores: Optional[float] = None
     memory_usage_bytes: Optional[int] = None
+    cpu_usage_max_cores: Optional[float] = None
+    cpu_usage_p95_cores: Optional[float] = None
+    memory_usage_max_bytes: Optional[int] = None
+    memory_usage_p95_bytes: Optional[int] = None
 
 
 class ResourceMetricResponse(ResourceMetricBase):
@@ -30,6 +34,7 @@ class ResourceSummaryBase(BaseModel):
     timestamp: datetime
     namespace: str
     total_pods: int = 0
+    total_containers: int = 0
     total_cpu_requests: float = 0.0
     total_memory_requests: int = 0
     total_cpu_limits: float = 0.0
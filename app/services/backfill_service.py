@@ -0,0 +1,306 @@
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.database import SessionLocal, engine, run_db, write_lock
+from ..core.response_cache import response_cache
+from ..models.database import BackfillChunk, ResourceMetric
+from .kubernetes_service import KubernetesService
+from .metric_writer import MetricRow, MetricWriter
+from .prometheus_service import (
+    ContainerKey,
+    PrometheusService,
+    cpu_usage_query,
+    memory_usage_query,
+)
+from .rollup_service import RollupService
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Samples of one chunk: container -> {unix timestamp: value}
+ChunkSamples = Dict[ContainerKey, Dict[int, float]]
+
+_backfill_lock = asyncio.Lock()
+
+
+def backfill_running() -> bool:
+    """Whether a backfill is in progress in this process."""
+    return _backfill_lock.locked()
+
+
+def align(moment: datetime, period: timedelta) -> datetime:
+    """Round a naive UTC datetime down to a multiple of period since the epoch."""
+    return moment - (moment - EPOCH) % period
+
+
+def plan_chunks(
+    start: datetime, end: datetime, chunk: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """Split [start, end) into epoch-aligned chunks that are stable across runs."""
+    chunks = []
+    chunk_start = align(start, chunk)
+    while chunk_start < end:
+        chunks.append((chunk_start, chunk_start + chunk))
+        chunk_start += chunk
+    return chunks
+
+
+class BackfillService:
+    """Load the retention window from Prometheus range queries.
+
+    History is fetched in epoch-aligned time chunks, several at a time, and
+    joined with the current pod specs. Completed chunks are recorded so an
+    interrupted run resumes where it stopped, and sample slots that already
+    hold a row (collected or backfilled) are skipped.
+    """
+
+    def __init__(
+        self,
+        prometheus_service: Optional[PrometheusService] = None,
+        kubernetes_service: Optional[KubernetesService] = None,
+        bind=engine,
+    ):
+        self.settings = get_settings()
+        self.bind = bind
+        self.prometheus_service = prometheus_service or PrometheusService()
+        self.k8s_service = kubernetes_service
+        self.step = timedelta(minutes=self.settings.collection_interval_minutes)
+        self.writer = MetricWriter(self.settings.metric_write_batch_size)
+
+    async def run(self) -> Dict[str, int]:
+        """Backfill missing history and return chunk and row counts."""
+        async with _backfill_lock:
+            owns_k8s = self.k8s_service is None
+            if owns_k8s:
+                self.k8s_service = KubernetesService()
+                await self.k8s_service.initialize()
+
+            try:
+                return await self._run()
+            except Exception as e:
+                logger.error(f"Backfill failed: {e}")
+                raise
+            finally:
+                if owns_k8s:
+                    await self.k8s_service.close()
+                    self.k8s_service = None
+
+    async def _run(self) -> Dict[str, int]:
+        started = time.perf_counter()
+        end = datetime.utcnow().replace(microsecond=0)
+        start = end - timedelta(days=self.settings.retention_days)
+
+        chunks = plan_chunks(
+            start, end, timedelta(hours=self.settings.backfill_chunk_hours)
+        )
+        completed = await run_db(self._completed_chunks, start)
+        pending = [chunk for chunk in chunks if chunk[0] not in completed]
+        logger.info(
+            f"Backfill: {len(pending)} of {len(chunks)} chunks to load "
+            f"from {start} to {end}"
+        )
+
+        if not pending:
+            return {"chunks": 0, "skipped": len(chunks), "failed": 0, "rows": 0}
+
+        specs = {
+            (pod["namespace"], pod["name"], container["name"]): (pod, container)
+            for pod in await self.k8s_service.get_all_pods()
+            for container in pod["containers"]
+        }
+
+        # Held until a chunk is written, so at most this many chunks' samples
+        # are in memory however far writes fall behind fetches
+        semaphore = asyncio.Semaphore(self.settings.backfill_concurrency)
+
+        async def run_chunk(chunk_start: datetime, chunk_end: datetime) -> int:
+            window_start = max(chunk_start, start)
+            window_end = min(chunk_end, end)
+            async with semaphore:
+                samples = await self._fetch_chunk(window_start, window_end, specs)
+                # Chunks share the writer's id and spec caches, so one writes
+                # at a time, and never during a collection
+                async with write_lock():
+                    rows = await run_db(
+                        self._write_chunk,
+                        chunk_start,
+                        chunk_end,
+                        window_start,
+                        window_end,
+                        samples,
+                        specs,
+                        complete=chunk_end <= end,
+                    )
+            response_cache.invalidate()
+            return rows
+
+        async with self.prometheus_service:
+            results = await asyncio.gather(
+                *(run_chunk(*chunk) for chunk in pending), return_exceptions=True
+            )
+
+        failed = [result for result in results if isinstance(result, Exception)]
+        rows = sum(result for result in results if not isinstance(result, Exception))
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Backfill loaded {rows} rows from {len(pending) - len(failed)} chunks "
+            f"in {elapsed:.1f}s"
+        )
+        self.writer.log_stats("Backfill wrote")
+        if failed:
+            logger.error(f"Backfill: {len(failed)} chunks failed: {failed[0]}")
+
+        # Rollups computed before the history arrived are recomputed with it
+        if rows and self.settings.rollup_enabled:
+            await run_db(
+                RollupService(self.bind).update, since=max(pending[0][0], start)
+            )
+            response_cache.invalidate()
+
+        return {
+            "chunks": len(pending) - len(failed),
+            "skipped": len(chunks) - len(pending),
+            "failed": len(failed),
+            "rows": rows,
+        }
+
+    async def _fetch_chunk(
+        self,
+        window_start: datetime,
+        window_end: datetime,
+        specs: Dict[ContainerKey, Tuple[Dict, Dict]],
+    ) -> Tuple[ChunkSamples, ChunkSamples]:
+        """Range-query CPU and memory usage for the containers in specs."""
+        # Evaluate on epoch-aligned steps; the end is exclusive
+        first = align(window_start, self.step)
+        if first < window_start:
+            first += self.step
+        last = window_end - timedelta(seconds=1)
+
+        async def fetch(query: str) -> ChunkSamples:
+            samples = {}
+            series = self.prometheus_service.stream_matrix(
+                query, first, last, self.step
+            )
+            async for namespace, pod, container, values in series:
+                key = (namespace, pod, container)
+                if key in specs:
+                    samples[key] = {
+                        int(float(ts)): float(value) for ts, value in values
+                    }
+            return samples
+
+        return await asyncio.gather(
+            fetch(cpu_usage_query()), fetch(memory_usage_query())
+        )
+
+    def _write_chunk(
+        self,
+        chunk_start: datetime,
+        chunk_end: datetime,
+        window_start: datetime,
+        window_end: datetime,
+        samples: Tuple[ChunkSamples, ChunkSamples],
+        specs: Dict[ContainerKey, Tuple[Dict, Dict]],
+        complete: bool,
+    ) -> int:
+        """Insert a chunk's rows and record it as done in one transaction."""
+        cpu_samples, memory_samples = samples
+        half_step = self.step / 2
+
+        db = SessionLocal(bind=self.bind)
+        try:
+            # A slot is taken if any row lies within half a step of it
+            existing = sorted(
+                timestamp
+                for (timestamp,) in db.query(ResourceMetric.timestamp)
+                .filter(
+                    ResourceMetric.timestamp >= window_start - half_step,
+                    ResourceMetric.timestamp < window_end + half_step,
+                )
+                .distinct()
+            )
+
+            def slot_taken(timestamp: datetime) -> bool:
+                index = bisect.bisect_left(existing, timestamp - half_step)
+                return index < len(existing) and existing[index] < timestamp + half_step
+
+            rows = []
+            timestamps = {}
+            for key in cpu_samples.keys() | memory_samples.keys():
+                pod, container = specs[key]
+                cpu_values = cpu_samples.get(key, {})
+                memory_values = memory_samples.get(key, {})
+
+                for ts in cpu_values.keys() | memory_values.keys():
+                    if ts not in timestamps:
+                        timestamp = datetime.fromtimestamp(ts, timezone.utc).replace(
+                            tzinfo=None
+                        )
+                        timestamps[ts] = None if slot_taken(timestamp) else timestamp
+                    timestamp = timestamps[ts]
+                    if timestamp is None:
+                        continue
+
+                    memory_usage = memory_values.get(ts)
+                    rows.append(
+                        MetricRow(
+                            timestamp=timestamp,
+                            namespace=pod["namespace"],
+                            pod_name=pod["name"],
+                            container_name=container["name"],
+                            node_name=pod.get("node_name"),
+                            pod_phase=pod.get("phase"),
+                            cpu_request_cores=container["requests"]["cpu"],
+                            memory_request_bytes=container["requests"]["memory"],
+                            cpu_limit_cores=container["limits"]["cpu"],
+                            memory_limit_bytes=container["limits"]["memory"],
+                            cpu_usage_cores=cpu_values.get(ts, 0.0),
+                            memory_usage_bytes=(
+                                int(memory_usage) if memory_usage is not None else 0
+                            ),
+                            cpu_usage_max_cores=None,
+                            cpu_usage_p95_cores=None,
+                            memory_usage_max_bytes=None,
+                            memory_usage_p95_bytes=None,
+                        )
+                    )
+
+            # The current specs are assumed to hold across the whole chunk
+            self.writer.write(db, rows, since=window_start)
+
+            if complete:
+                db.add(
+                    BackfillChunk(
+                        chunk_start=chunk_start, chunk_end=chunk_end, rows=len(rows)
+                    )
+                )
+
+            db.commit()
+            return len(rows)
+
+        except Exception as e:
+            db.rollback()
+            self.writer.clear()  # Ids and specs inserted here were rolled back
+            logger.error(f"Error writing backfill chunk {chunk_start}: {e}")
+            raise
+        finally:
+            db.close()
+
+    def _completed_chunks(self, start: datetime) -> set:
+        """Chunk starts already loaded; records older than retention are pruned."""
+        db = SessionLocal(bind=self.bind)
+        try:
+            db.query(BackfillChunk).filter(BackfillChunk.chunk_end <= start).delete()
+            db.commit()
+            return {
+                chunk_start for (chunk_start,) in db.query(BackfillChunk.chunk_start)
+            }
+        finally:
+            db.close()
@@ -0,0 +1,293 @@
+"""Cluster usage over time for the dashboard charts.
+
+Samples, or rollup buckets for long ranges, are grouped into time buckets
+of a fixed step by the database, per namespace, in one aggregate query.
+A bucket's totals are averaged over the snapshots it holds, so a series
+keeps its scale whatever the step. Given a point budget, such as the width
+of the chart canvas, the series are then downsampled to it.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from numpy.typing import ArrayLike
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.database import Container, ContainerSpec, ResourceSample, spec_valid_at
+from .rollup_service import Tier, time_bucket
+from .summary_service import ACTIVE_PHASES
+
+# Steps picked automatically, finest first
+CHART_STEPS = [
+    timedelta(minutes=5),
+    timedelta(minutes=10),
+    timedelta(minutes=15),
+    timedelta(minutes=30),
+    timedelta(hours=1),
+    timedelta(hours=2),
+    timedelta(hours=3),
+    timedelta(hours=6),
+    timedelta(hours=12),
+    timedelta(days=1),
+]
+CHART_POINTS = 300  # Automatic steps keep a chart to about this many buckets
+OVERSAMPLING = 4  # With a point budget, buckets read per point kept
+
+DOWNSAMPLE_MODES = ("lttb", "minmax")
+
+SPEC_COLUMNS = (
+    "cpu_request_cores",
+    "cpu_limit_cores",
+    "memory_request_bytes",
+    "memory_limit_bytes",
+)
+
+# Utilization series: usage total over requests or limits total
+PERCENTAGES = {
+    "cpu_usage_percentage_requests": ("cpu_usage", "cpu_request_cores"),
+    "cpu_usage_percentage_limits": ("cpu_usage", "cpu_limit_cores"),
+    "memory_usage_percentage_requests": ("memory_usage", "memory_request_bytes"),
+    "memory_usage_percentage_limits": ("memory_usage", "memory_limit_bytes"),
+}
+
+
+def select_step(
+    span: timedelta, tier_step: timedelta, points: int = CHART_POINTS
+) -> timedelta:
+    """Finest standard step, no finer than the tier's, within points buckets."""
+    for step in CHART_STEPS:
+        if step >= tier_step and span / step <= points:
+            return step
+    return max(CHART_STEPS[-1], tier_step)
+
+
+def chart_query(
+    tier: Tier,
+    since: datetime,
+    step: timedelta,
+    dialect: str,
+    excluded_namespaces: Iterable[str] = (),
+):
+    """Per bucket and namespace: usage, request and limit sums and snapshots."""
+    if tier.model is None:
+        timestamp = ResourceSample.timestamp
+        phase = ResourceSample.pod_phase
+        usage = (ResourceSample.cpu_usage_cores, ResourceSample.memory_usage_bytes)
+        specs = ContainerSpec
+        source = ResourceSample.__table__.join(
+            Container.__table__, ResourceSample.container_id == Container.id
+        ).outerjoin(
+            ContainerSpec.__table__,
+            spec_valid_at(ResourceSample.container_id, ResourceSample.timestamp),
+        )
+    else:
+        # Rollups hold each container's average usage and its last spec
+        model = specs = tier.model
+        timestamp = model.bucket
+        phase = model.pod_phase
+        usage = (model.cpu_usage_avg_cores, model.memory_usage_avg_bytes)
+        source = model.__table__.join(
+            Container.__table__, model.container_id == Container.id
+        )
+
+    bucket = time_bucket(timestamp, step, dialect).label("bucket")
+    return (
+        select(
+            bucket,
+            Container.namespace,
+            func.count(timestamp.distinct()).label("snapshots"),
+            func.sum(usage[0]).label("cpu_usage"),
+            func.sum(usage[1]).label("memory_usage"),
+            *(func.sum(getattr(specs, name)).label(name) for name in SPEC_COLUMNS),
+        )
+        .select_from(source)
+        .where(
+            timestamp >= since,
+            phase.in_(ACTIVE_PHASES),
+            Container.namespace.not_in(list(excluded_namespaces)),
+        )
+        .group_by(bucket, Container.namespace)
+        .order_by(bucket)
+    )
+
+
+def chart_data(
+    db: Session,
+    tier: Tier,
+    since: datetime,
+    step: Optional[timedelta] = None,
+    excluded_namespaces: Iterable[str] = (),
+    max_points: Optional[int] = None,
+    mode: str = "lttb",
+) -> Dict:
+    """Cluster totals and utilization per bucket, with usage per namespace.
+
+    Buckets are labelled with the ISO 8601 UTC time of their start. With
+    max_points, the series are downsampled to that many points by mode.
+    """
+    if step is None:
+        points = max_points * OVERSAMPLING if max_points else CHART_POINTS
+        step = select_step(datetime.utcnow() - since, tier.step, points)
+    query = chart_query(
+        tier, since, step, db.get_bind().dialect.name, excluded_namespaces
+    )
+
+    buckets: Dict[int, Dict] = {}
+    for row in db.execute(query):
+        buckets.setdefault(row.bucket, {})[row.namespace] = row
+    namespaces = sorted({namespace for rows in buckets.values() for namespace in rows})
+
+    data = {
+        "step": int(step.total_seconds()),
+        "timestamps": [],
+        "downsampled": False,
+        "cpu_usage_absolute": [],
+        "memory_usage_absolute": [],
+        **{name: [] for name in PERCENTAGES},
+        "namespaces": {
+            namespace: {"cpu_usage_absolute": [], "memory_usage_absolute": []}
+            for namespace in namespaces
+        },
+    }
+    for bucket, rows in sorted(buckets.items()):
+        # Averaged over the bucket's snapshots; a namespace missing from
+        # some of them counts as zero there
+        snapshots = max(row.snapshots for row in rows.values())
+        totals = {
+            name: sum(getattr(row, name) or 0 for row in rows.values()) / snapshots
+            for name in ("cpu_usage", "memory_usage", *SPEC_COLUMNS)
+        }
+
+        data["timestamps"].append(bucket)
+        data["cpu_usage_absolute"].append(round(totals["cpu_usage"], 3))
+        data["memory_usage_absolute"].append(_gigabytes(totals["memory_usage"]))
+        for name, (used, capacity) in PERCENTAGES.items():
+            data[name].append(_percentage(totals[used], totals[capacity]))
+
+        for namespace, series in data["namespaces"].items():
+            row = rows.get(namespace)
+            cpu = (row.cpu_usage or 0) / snapshots if row else 0
+            memory = (row.memory_usage or 0) / snapshots if row else 0
+            series["cpu_usage_absolute"].append(round(cpu, 3))
+            series["memory_usage_absolute"].append(_gigabytes(memory))
+
+    if max_points and len(data["timestamps"]) > max_points:
+        _downsample_chart(data, max_points, mode)
+    data["timestamps"] = [
+        datetime.utcfromtimestamp(bucket).isoformat() + "Z"
+        for bucket in data["timestamps"]
+    ]
+    return data
+
+
+def _downsample_chart(data: Dict, max_points: int, mode: str):
+    """Downsample every series of chart data in place, on shared timestamps."""
+    cluster = [name for name, value in data.items() if isinstance(value, list)]
+    cluster.remove("timestamps")
+    namespaced = [
+        (series, name) for series in data["namespaces"].values() for name in series
+    ]
+    columns = [data[name] for name in cluster]
+    columns += [series[name] for series, name in namespaced]
+
+    x = np.asarray(data["timestamps"])
+    values = np.asarray(columns, dtype=float)
+    if mode == "minmax":
+        x, values = minmax(x, values, max_points)
+    else:
+        # Points are picked for the shape of the cluster series alone
+        indices = lttb(x, values[: len(cluster)], max_points)
+        x, values = x[indices], values[:, indices]
+
+    data["timestamps"] = x.tolist()
+    data["downsampled"] = True
+    columns = values.tolist()
+    for name, column in zip(cluster, columns):
+        data[name] = column
+    for (series, name), column in zip(namespaced, columns[len(cluster) :]):
+        series[name] = column
+
+
+def lttb(x: ArrayLike, columns: ArrayLike, max_points: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets, shared by all columns.
+
+    The first and last points are always kept. Between them, each bucket keeps
+    the point forming the largest triangle with the point kept before it and
+    the next bucket's average; the triangle's area is summed over the columns,
+    each scaled to its own range so no column dominates. A bucket's choice
+    depends on the previous one, so buckets are visited in turn, each scored
+    with array operations over all its points and columns at once.
+    """
+    x = np.asarray(x, dtype=float)
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+
+    ys = np.asarray(columns, dtype=float)
+    scales = np.ptp(ys, axis=1)
+    ys = ys / np.where(scales > 0, scales, 1)[:, None]
+
+    buckets = max_points - 2
+    edges = 1 + (count - 2) * np.arange(buckets + 1) // buckets
+    # Averages of the bucket after each one; the last is the final point
+    sizes = np.diff(np.append(edges[1:], count))
+    next_x = np.add.reduceat(x, edges[1:]) / sizes
+    next_ys = np.add.reduceat(ys, edges[1:], axis=1) / sizes
+
+    kept = np.empty(max_points, dtype=int)
+    kept[0], kept[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(buckets):
+        start, end = edges[bucket], edges[bucket + 1]
+        x_a, y_a = x[previous], ys[:, previous, None]
+        areas = np.abs(
+            (x_a - next_x[bucket]) * (ys[:, start:end] - y_a)
+            - (x_a - x[start:end]) * (next_ys[:, bucket, None] - y_a)
+        ).sum(axis=0)
+        previous = kept[bucket + 1] = start + int(areas.argmax())
+    return kept
+
+
+def minmax(
+    x: ArrayLike, columns: ArrayLike, max_points: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Min/max envelope: each column's extremes per bucket of two points.
+
+    The bucket's first and last times carry each column's extremes in the
+    order they occur, so peaks survive at up to a bucket's width of shift.
+    """
+    x = np.asarray(x)
+    ys = np.asarray(columns, dtype=float)
+    count = len(x)
+    buckets = max_points // 2
+    if max_points >= count or buckets < 1:
+        return x, ys
+
+    # Every bucket holds at least two points, as count > 2 * buckets
+    edges = count * np.arange(buckets + 1) // buckets
+    starts, ends = edges[:-1], edges[1:]
+    # Buckets padded to the widest by repeating their last point, which
+    # changes neither the extremes nor which of them comes first
+    width = int((ends - starts).max())
+    index = np.minimum(starts[:, None] + np.arange(width), ends[:, None] - 1)
+    windows = ys[:, index]
+
+    low, high = windows.argmin(axis=2), windows.argmax(axis=2)
+    lows = np.take_along_axis(windows, low[..., None], axis=2)[..., 0]
+    highs = np.take_along_axis(windows, high[..., None], axis=2)[..., 0]
+    low_first = low <= high
+    kept = np.stack(
+        [np.where(low_first, lows, highs), np.where(low_first, highs, lows)], axis=2
+    )
+    kept_x = np.stack([x[starts], x[ends - 1]], axis=1)
+    return kept_x.reshape(-1), kept.reshape(len(ys), -1)
+
+
+def _percentage(used: float, capacity: float) -> float:
+    return round(used / capacity * 100, 1) if capacity > 0 else 0
+
+
+def _gigabytes(value: float) -> float:
+    return round(value / 1024**3, 2)
@@ -0,0 +1,68 @@
+"""Collection runs and the snapshot that reads are pinned to."""
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal, engine
+from ..core.partitions import latest_sample_time
+from ..models.database import CollectionRun
+
+logger = logging.getLogger(__name__)
+
+
+def start_run(snapshot_time: datetime, bind=engine) -> int:
+    """Record a collection as running and return its id."""
+    db = SessionLocal(bind=bind)
+    try:
+        run = CollectionRun(snapshot_time=snapshot_time, status="running")
+        db.add(run)
+        db.commit()
+        return run.id
+    finally:
+        db.close()
+
+
+def complete_run(db: Session, run_id: int, **counts):
+    """Mark a run completed in the transaction that commits its snapshot."""
+    db.query(CollectionRun).filter(CollectionRun.id == run_id).update(
+        {"status": "completed", "finished_at": datetime.utcnow(), **counts},
+        synchronize_session=False,
+    )
+
+
+def fail_run(run_id: int, bind=engine):
+    db = SessionLocal(bind=bind)
+    try:
+        db.query(CollectionRun).filter(CollectionRun.id == run_id).update(
+            {"status": "failed", "finished_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error marking collection run {run_id} failed: {e}")
+    finally:
+        db.close()
+
+
+def latest_run(db: Session) -> Optional[CollectionRun]:
+    """Newest completed collection run."""
+    return (
+        db.query(CollectionRun)
+        .filter(CollectionRun.status == "completed")
+        .order_by(CollectionRun.id.desc())
+        .first()
+    )
+
+
+def snapshot_time(db: Session) -> Optional[datetime]:
+    """Timestamp of the snapshot reads should see.
+
+    That is the latest completed run's, falling back to the newest sample
+    for data written before runs were recorded.
+    """
+    run = latest_run(db)
+    return run.snapshot_time if run is not None else latest_sample_time(db)
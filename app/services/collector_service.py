@@ -1,25 +1,58 @@
 import asyncio
 import logging
+import time
+from contextlib import aclosing
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import and_, exists
 
 from ..core.config import get_settings
-from ..core.database import SessionLocal
-from ..models.database import ResourceMetric, ResourceSummary
+from ..core.database import SessionLocal, engine, run_db, write_lock
+from ..core.partitions import SamplePartitions
+from ..core.response_cache import response_cache
+from ..models.database import (
+    CollectionRun,
+    Container,
+    ContainerSpec,
+    ContainerStats,
+    ContainerStatsBin,
+    DailyRollup,
+    HourlyRollup,
+    ResourceSample,
+    ResourceSummary,
+)
+from .collection_runs import complete_run, fail_run, start_run
+from .container_stats import expire_stats
 from .kubernetes_service import KubernetesService
-from .prometheus_service import PrometheusService
+from .metric_writer import ContainerRegistry, MetricRow, MetricWriter, SpecHistory
+from .prometheus_service import PEAK_METRICS, PrometheusService
+from .rollup_service import RollupService
+from .summary_service import SummaryAccumulator
 
 logger = logging.getLogger(__name__)
 
 
 class ResourceCollectorService:
-    def __init__(self):
+    def __init__(
+        self, prometheus_service: Optional[PrometheusService] = None, bind=engine
+    ):
         self.settings = get_settings()
+        self.bind = bind
         self.k8s_service = KubernetesService()
+        self.prometheus_service = prometheus_service or PrometheusService()
+        self.timings: Dict[str, float] = {}
+        # Kept across collections so unchanged specs are never written again
+        self.containers = ContainerRegistry()
+        self.specs = SpecHistory()
+        self.partitions = SamplePartitions()
+        self.rollups = RollupService(bind)
 
     async def initialize(self):
         """Initialize services."""
         await self.k8s_service.initialize()
+        if self.settings.k8s_watch_enabled:
+            await self.k8s_service.start_watch()
 
     async def cleanup(self):
         """Cleanup resources."""
@@ -28,106 +61,264 @@ class ResourceCollectorService:
     async def collect_and_store_metrics(self):
         """Main collection method - collects from K8s and Prometheus, stores in DB."""
         logger.info("Starting resource metrics collection")
+        started = time.perf_counter()
+        self.timings = {"kubernetes": 0.0, "prometheus": 0.0, "store": 0.0}
+
+        # Single instant for the Prometheus evaluation and the stored rows
+        timestamp = datetime.utcnow().replace(microsecond=0)
+        run_id = await run_db(start_run, timestamp, bind=self.bind)
 
         try:
-            # Collect Kubernetes resource data
-            pods_data = await self.k8s_service.get_all_pods()
+            # Closed on every exit, so a failed run never leaves a list open
+            async with aclosing(
+                self._timed_pages(self.k8s_service.iter_pod_pages())
+            ) as pod_pages:
+                first_page = asyncio.ensure_future(anext(pod_pages, None))
 
-            # Collect Prometheus usage data
-            async with PrometheusService() as prom_service:
-                usage_metrics = await prom_service.get_all_usage_metrics()
+                try:
+                    # Fetch usage while the first page of pods is being listed
+                    async with self.prometheus_service as prom_service:
+                        prom_started = time.perf_counter()
+                        usage_metrics = await prom_service.get_all_usage_metrics(
+                            time=timestamp
+                        )
+                        self.timings["prometheus"] = time.perf_counter() - prom_started
+                except BaseException:
+                    first_page.cancel()
+                    # The pages cannot be closed while the fetch still runs
+                    await asyncio.gather(first_page, return_exceptions=True)
+                    raise
+
+                # Store pods page by page as the rest of the stream arrives
+                await self._store_metrics(
+                    self._resume_pages(first_page, pod_pages),
+                    usage_metrics,
+                    timestamp,
+                    run_id,
+                )
 
-            # Combine and store data
-            await self._store_metrics(pods_data, usage_metrics)
+            # Roll new samples up before the oldest ones expire
+            if self.settings.rollup_enabled:
+                rollup_started = time.perf_counter()
+                await run_db(self.rollups.update)
+                self.timings["rollup"] = time.perf_counter() - rollup_started
 
             # Clean old data
-            await self._cleanup_old_data()
+            cleanup_started = time.perf_counter()
+            await run_db(self._cleanup_old_data)
+            self.timings["cleanup"] = time.perf_counter() - cleanup_started
 
-            logger.info("Resource metrics collection completed successfully")
+            # Rollups and expiry change long-range reads after the snapshot did
+            response_cache.invalidate()
+
+            self.timings["total"] = time.perf_counter() - started
+            stages = " ".join(f"{k}={v:.2f}s" for k, v in self.timings.items())
+            logger.info(f"Resource metrics collection completed successfully: {stages}")
 
         except Exception as e:
             logger.error(f"Error in resource collection: {e}")
+            await run_db(fail_run, run_id, bind=self.bind)
             raise
 
-    async def _store_metrics(self, pods_data: List[Dict], usage_metrics: Dict):
-        """Store collected metrics in database."""
-        timestamp = datetime.utcnow()
-        metrics_to_store = []
+    async def _timed_pages(
+        self, pod_pages: AsyncIterator[List[Dict]]
+    ) -> AsyncIterator[List[Dict]]:
+        """Pass pod pages through, accumulating time spent waiting on the API."""
+        async with aclosing(pod_pages):
+            while True:
+                fetch_started = time.perf_counter()
+                try:
+                    page = await anext(pod_pages)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    self.timings["kubernetes"] += time.perf_counter() - fetch_started
+                yield page
 
-        for pod in pods_data:
-            for container in pod["containers"]:
-                container_key = f"{pod['namespace']}/{pod['name']}/{container['name']}"
-                cpu_usage = usage_metrics["cpu_usage"].get(container_key, 0.0)
-                memory_usage = usage_metrics["memory_usage"].get(container_key, 0)
-
-                metric = ResourceMetric(
-                    timestamp=timestamp,
-                    namespace=pod["namespace"],
-                    pod_name=pod["name"],
-                    container_name=container["name"],
-                    node_name=pod.get("node_name"),
-                    pod_phase=pod.get("phase"),
-                    # Resource requests and limits
-                    cpu_request_cores=container["requests"]["cpu"],
-                    memory_request_bytes=container["requests"]["memory"],
-                    cpu_limit_cores=container["limits"]["cpu"],
-                    memory_limit_bytes=container["limits"]["memory"],
-                    # Actual usage (per-container from Prometheus)
-                    cpu_usage_cores=cpu_usage,
-                    memory_usage_bytes=memory_usage,
-                )
-                metrics_to_store.append(metric)
+    async def _resume_pages(
+        self, first_page: asyncio.Future, pod_pages: AsyncIterator[List[Dict]]
+    ) -> AsyncIterator[List[Dict]]:
+        """Yield the prefetched first page followed by the remaining pages."""
+        page = await first_page
+        if page is None:
+            return
+
+        yield page
+        async for page in pod_pages:
+            yield page
+
+    async def _store_metrics(
+        self,
+        pod_pages: AsyncIterator[List[Dict]],
+        usage_metrics: Dict,
+        timestamp: datetime,
+        run_id: int,
+    ):
+        """Store collected metrics in database, writing one page at a time.
 
-        # Batch insert
-        db = SessionLocal()
+        The run is completed in the same transaction as its samples. Database
+        work runs in a worker thread so requests are served meanwhile, and the
+        next page is listed while one is written. The transaction still spans
+        the listing, so backfill waits on write_lock until it commits.
+        """
+        writer = MetricWriter(
+            self.settings.metric_write_batch_size,
+            self.containers,
+            self.specs,
+            self.partitions,
+        )
+        write = (
+            writer.write_orm
+            if self.settings.metric_write_mode == "orm"
+            else writer.write
+        )
+        summaries = SummaryAccumulator(self.settings.excluded_namespaces_list)
+
+        pods = 0
+        db = SessionLocal(bind=self.bind)
+        next_page = asyncio.ensure_future(anext(pod_pages, None))
         try:
-            db.add_all(metrics_to_store)
-            db.commit()
-            logger.info(f"Stored {len(metrics_to_store)} resource metrics")
+            async with write_lock():
+                while (pods_data := await next_page) is not None:
+                    next_page = asyncio.ensure_future(anext(pod_pages, None))
+                    store_started = time.perf_counter()
+                    pods += len(pods_data)
+                    rows = self._build_rows(pods_data, usage_metrics, timestamp)
+                    await run_db(write, db, rows)
+                    summaries.add(rows)
+                    self.timings["store"] += time.perf_counter() - store_started
+
+                # The snapshot commits as a whole with its summaries and run:
+                # reads are pinned to the latest completed run
+                store_started = time.perf_counter()
+
+                def finish():
+                    summaries.write(db, timestamp)
+                    complete_run(
+                        db,
+                        run_id,
+                        pods=pods,
+                        rows_written=writer.rows_written,
+                        specs_written=writer.specs_written,
+                    )
+                    db.commit()
+
+                await run_db(finish)
+            response_cache.invalidate()
+            self.timings["store"] += time.perf_counter() - store_started
+            writer.log_stats()
         except Exception as e:
             db.rollback()
+            writer.clear()  # Ids and specs written here were rolled back
             logger.error(f"Error storing metrics: {e}")
             raise
         finally:
+            next_page.cancel()
+            await asyncio.gather(next_page, return_exceptions=True)
             db.close()
 
-    async def _cleanup_old_data(self):
+    def _build_rows(
+        self, pods_data: List[Dict], usage_metrics: Dict, timestamp: datetime
+    ) -> List[MetricRow]:
+        """Combine pod specs with usage into metric rows."""
+        rows = []
+        cpu_usage = usage_metrics["cpu_usage"]
+        memory_usage = usage_metrics["memory_usage"]
+        cpu_max, cpu_p95, memory_max, memory_p95 = (
+            usage_metrics.get(name, {}) for name in PEAK_METRICS
+        )
+
+        for pod in pods_data:
+            for container in pod["containers"]:
+                container_key = (pod["namespace"], pod["name"], container["name"])
+
+                rows.append(
+                    MetricRow(
+                        timestamp=timestamp,
+                        namespace=pod["namespace"],
+                        pod_name=pod["name"],
+                        container_name=container["name"],
+                        node_name=pod.get("node_name"),
+                        pod_phase=pod.get("phase"),
+                        # Resource requests and limits
+                        cpu_request_cores=container["requests"]["cpu"],
+                        memory_request_bytes=container["requests"]["memory"],
+                        cpu_limit_cores=container["limits"]["cpu"],
+                        memory_limit_bytes=container["limits"]["memory"],
+                        # Actual usage (per-container from Prometheus)
+                        cpu_usage_cores=cpu_usage.get(container_key, 0.0),
+                        memory_usage_bytes=memory_usage.get(container_key, 0),
+                        # Peaks over the interval, None when not sampled
+                        cpu_usage_max_cores=cpu_max.get(container_key),
+                        cpu_usage_p95_cores=cpu_p95.get(container_key),
+                        memory_usage_max_bytes=memory_max.get(container_key),
+                        memory_usage_p95_bytes=memory_p95.get(container_key),
+                    )
+                )
+
+        return rows
+
+    def _cleanup_old_data(self):
         """Remove data older than retention period."""
         cutoff_time = datetime.utcnow() - timedelta(days=self.settings.retention_days)
 
-        db = SessionLocal()
+        db = SessionLocal(bind=self.bind)
         try:
-            # Delete old metrics in batches to avoid locks
-            while True:
-                # Get IDs of records to delete
-                ids_to_delete = [
-                    row.id
-                    for row in db.query(ResourceMetric.id)
-                    .filter(ResourceMetric.timestamp < cutoff_time)
-                    .limit(1000)
-                ]
+            # Expire samples a whole partition at a time
+            dropped = self.partitions.drop_before(db.connection(), cutoff_time)
 
-                if not ids_to_delete:
-                    break
+            # Drop specs superseded before the cutoff
+            db.query(ContainerSpec).filter(ContainerSpec.valid_to < cutoff_time).delete(
+                synchronize_session=False
+            )
 
-                # Delete by IDs
-                db.query(ResourceMetric).filter(
-                    ResourceMetric.id.in_(ids_to_delete)
-                ).delete(synchronize_session=False)
+            # Containers can only lose their last samples with a partition
+            pruned = 0
+            if dropped:
+                # Statistics cover the retained samples only
+                expire_stats(db.connection(), dropped)
 
-                db.commit()
-                await asyncio.sleep(0.1)  # Brief pause
+                # Drop containers that no longer have any samples or rollups,
+                # with their specs and statistics
+                no_samples = and_(
+                    *(
+                        ~exists().where(model.container_id == Container.id)
+                        for model in (ResourceSample, HourlyRollup, DailyRollup)
+                    )
+                )
+                unused = db.query(Container.id).filter(no_samples)
+                for model in (ContainerSpec, ContainerStats, ContainerStatsBin):
+                    db.query(model).filter(model.container_id.in_(unused)).delete(
+                        synchronize_session=False
+                    )
+                pruned = (
+                    db.query(Container)
+                    .filter(no_samples)
+                    .delete(synchronize_session=False)
+                )
 
             # Delete old summaries
             db.query(ResourceSummary).filter(
                 ResourceSummary.timestamp < cutoff_time
             ).delete(synchronize_session=False)
 
+            # Delete old collection runs
+            db.query(CollectionRun).filter(
+                CollectionRun.snapshot_time < cutoff_time
+            ).delete(synchronize_session=False)
+
             db.commit()
-            logger.info(f"Cleaned up data older than {cutoff_time}")
+            if pruned:
+                self.containers.clear()
+                self.specs.clear()
+            logger.info(
+                f"Cleaned up data older than {cutoff_time}, "
+                f"dropped {len(dropped)} sample partitions"
+            )
 
         except Exception as e:
             db.rollback()
+            self.partitions.clear()  # A rolled back drop leaves them in place
             logger.error(f"Error cleaning up old data: {e}")
         finally:
             db.close()
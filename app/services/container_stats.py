@@ -0,0 +1,371 @@
+"""Per-container usage statistics maintained as samples are written.
+
+Each container has a ``ContainerStats`` row per sample partition period with
+the count, sum, min and max of its CPU and memory usage, plus the bins of a
+quantile sketch of each, so historical min/max and trimmed means are lookups
+by container id, merging a handful of periods. Every write adds its rows to
+the stored values with upserts, without reading them back, and a period's
+rows are dropped with its partition, so the statistics cover the retained
+samples only. They can be regenerated from the raw samples:
+
+    python -m app.services.container_stats
+"""
+
+import logging
+import math
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, select
+
+from ..core.database import dialect_insert, engine, executemany, init_database
+from ..core.partitions import partition_names, partition_start, partition_table
+from ..models.database import ContainerStats, ContainerStatsBin
+
+logger = logging.getLogger(__name__)
+
+_IN_CHUNK_SIZE = 500
+
+# Sums and extremes of the statistics rows; upserts add sums and keep extremes
+_SUMS = ["sample_count", "cpu_usage_sum_cores", "memory_usage_sum_bytes"]
+_MINIMA = ["first_sample", "cpu_usage_min_cores", "memory_usage_min_bytes"]
+_MAXIMA = ["last_sample", "cpu_usage_max_cores", "memory_usage_max_bytes"]
+
+
+class QuantileSketch:
+    """Counts of values in logarithmic bins, merged by adding counts.
+
+    Bins are sized so any quantile is within RELATIVE_ACCURACY of the true
+    value (the DDSketch scheme); values up to MIN_VALUE share ZERO_BIN.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    MIN_VALUE = 1e-9
+    ZERO_BIN = -(2**31)
+
+    def __init__(self, bins: Optional[Dict[int, int]] = None):
+        self.bins = bins or {}
+
+    @property
+    def count(self) -> int:
+        return sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1):
+        if value <= self.MIN_VALUE:
+            index = self.ZERO_BIN
+        else:
+            index = math.ceil(math.log(value, self.GAMMA))
+        self.bins[index] = self.bins.get(index, 0) + count
+
+    def merge(self, other: "QuantileSketch"):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, fraction: float) -> float:
+        rank = fraction * (self.count - 1)
+        cumulative = 0
+        value = 0.0
+        for value, count in self._values():
+            cumulative += count
+            if cumulative > rank:
+                break
+        return value
+
+    def trimmed_mean(self, trim_fraction: float = 0.20) -> float:
+        """Mean of the bottom (1 - trim_fraction) of values."""
+        keep = max(1, int(self.count * (1 - trim_fraction)))
+        remaining = keep
+        total = 0.0
+        for value, count in self._values():
+            taken = min(count, remaining)
+            total += value * taken
+            remaining -= taken
+            if not remaining:
+                break
+        return total / keep
+
+    def _values(self):
+        """(value, count) per bin, smallest first."""
+        for index in sorted(self.bins):
+            if index == self.ZERO_BIN:
+                yield 0.0, self.bins[index]
+            else:
+                yield 2 * self.GAMMA**index / (self.GAMMA + 1), self.bins[index]
+
+
+class UsageStats:
+    """Usage statistics of one container, stored or about to be added."""
+
+    def __init__(self, row=None):
+        self.sample_count = 0
+        self.cpu_usage_sum_cores = 0.0
+        self.memory_usage_sum_bytes = 0
+        for name in _MINIMA + _MAXIMA:
+            setattr(self, name, None)
+        if row is not None:
+            for name in _SUMS + _MINIMA + _MAXIMA:
+                setattr(self, name, getattr(row, name))
+        self.sketches = {"cpu": QuantileSketch(), "memory": QuantileSketch()}
+
+    def add(self, sample):
+        """Add a sample with timestamp, usage and optional peak usage fields."""
+        cpu = sample.cpu_usage_cores or 0.0
+        memory = sample.memory_usage_bytes or 0
+        # Maxima are taken over interval peaks, which catch bursts between samples
+        cpu_peak = _or(sample.cpu_usage_max_cores, cpu)
+        memory_peak = _or(sample.memory_usage_max_bytes, memory)
+
+        self.sample_count += 1
+        self.first_sample = _min(self.first_sample, sample.timestamp)
+        self.last_sample = _max(self.last_sample, sample.timestamp)
+        self.cpu_usage_sum_cores += cpu
+        self.cpu_usage_min_cores = _min(self.cpu_usage_min_cores, cpu)
+        self.cpu_usage_max_cores = _max(self.cpu_usage_max_cores, cpu_peak)
+        self.memory_usage_sum_bytes += memory
+        self.memory_usage_min_bytes = _min(self.memory_usage_min_bytes, memory)
+        self.memory_usage_max_bytes = _max(self.memory_usage_max_bytes, memory_peak)
+        self.sketches["cpu"].add(cpu)
+        self.sketches["memory"].add(memory)
+
+    def cpu_trimmed_mean(self) -> float:
+        return self._trimmed_mean("cpu", self.cpu_usage_sum_cores)
+
+    def memory_trimmed_mean(self) -> float:
+        return self._trimmed_mean("memory", self.memory_usage_sum_bytes)
+
+    def values(self) -> Dict:
+        """Column values of the statistics row."""
+        return {name: getattr(self, name) for name in _SUMS + _MINIMA + _MAXIMA}
+
+    def _trimmed_mean(self, metric: str, total: float) -> float:
+        # Exact simple mean below 5 samples, as calculate_trimmed_mean
+        if self.sample_count < 5:
+            return total / self.sample_count if self.sample_count else 0.0
+        return self.sketches[metric].trimmed_mean()
+
+
+def _or(value, default):
+    return value if value is not None else default
+
+
+def _min(current, value):
+    return value if current is None else min(current, value)
+
+
+def _max(current, value):
+    return value if current is None else max(current, value)
+
+
+def _merged(table):
+    """Statistics columns merged over a container's periods, labelled as stored."""
+    return [
+        table.c.container_id,
+        *(func.sum(table.c[name]).label(name) for name in _SUMS),
+        *(func.min(table.c[name]).label(name) for name in _MINIMA),
+        *(func.max(table.c[name]).label(name) for name in _MAXIMA),
+    ]
+
+
+def load_stats(connection, container_ids: Iterable[int]) -> Dict[int, UsageStats]:
+    """Statistics of the given containers that have any."""
+    table = ContainerStats.__table__
+    bins = ContainerStatsBin.__table__
+    ids = list(set(container_ids))
+    stats = {}
+    for offset in range(0, len(ids), _IN_CHUNK_SIZE):
+        chunk = ids[offset : offset + _IN_CHUNK_SIZE]
+        for row in connection.execute(
+            select(*_merged(table))
+            .where(table.c.container_id.in_(chunk))
+            .group_by(table.c.container_id)
+        ):
+            stats[row.container_id] = UsageStats(row)
+        for row in connection.execute(
+            select(
+                bins.c.container_id, bins.c.metric, bins.c.bin, func.sum(bins.c.count)
+            )
+            .where(bins.c.container_id.in_(chunk))
+            .group_by(bins.c.container_id, bins.c.metric, bins.c.bin)
+        ):
+            container_id, metric, index, count = row
+            stats[container_id].sketches[metric].bins[index] = count
+    return stats
+
+
+def historical_stats(connection, container_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Historical min, max and mean usage of the given containers.
+
+    Reads only the statistics rows, one query for up to 500 containers, so a
+    table page costs the same however long its containers' history is.
+    """
+    table = ContainerStats.__table__
+    ids = list(set(container_ids))
+    stats = {}
+    for offset in range(0, len(ids), _IN_CHUNK_SIZE):
+        chunk = ids[offset : offset + _IN_CHUNK_SIZE]
+        for row in connection.execute(
+            select(*_merged(table))
+            .where(table.c.container_id.in_(chunk))
+            .group_by(table.c.container_id)
+        ):
+            stats[row.container_id] = {
+                "cpu_min": row.cpu_usage_min_cores,
+                "cpu_max": row.cpu_usage_max_cores,
+                "cpu_avg": row.cpu_usage_sum_cores / row.sample_count,
+                "memory_min": row.memory_usage_min_bytes,
+                "memory_max": row.memory_usage_max_bytes,
+                "memory_avg": row.memory_usage_sum_bytes / row.sample_count,
+            }
+    return stats
+
+
+def record_stats(
+    connection,
+    container_ids: Sequence[int],
+    rows: Sequence,
+    period_of: Callable[[datetime], datetime],
+) -> int:
+    """Add written rows to their containers' statistics.
+
+    period_of maps a sample time to the start of its partition. Returns the
+    number of container periods updated.
+    """
+    stats: Dict[Tuple[int, datetime], UsageStats] = {}
+    periods: Dict[datetime, datetime] = {}
+    for container_id, row in zip(container_ids, rows):
+        period = periods.get(row.timestamp)
+        if period is None:
+            period = periods[row.timestamp] = period_of(row.timestamp)
+        entry = stats.get((container_id, period))
+        if entry is None:
+            entry = stats[container_id, period] = UsageStats()
+        entry.add(row)
+
+    _add(connection, stats)
+    return len(stats)
+
+
+def expire_stats(connection, partitions: Sequence[str]):
+    """Drop the statistics of dropped sample partitions' periods."""
+    periods = [partition_start(name) for name in partitions]
+    if periods:
+        for model in (ContainerStatsBin, ContainerStats):
+            table = model.__table__
+            connection.execute(delete(table).where(table.c.period_start.in_(periods)))
+
+
+def rebuild_stats(connection) -> int:
+    """Regenerate every container's statistics from the raw samples."""
+    stats: Dict[Tuple[int, datetime], UsageStats] = {}
+    for name in partition_names(connection):
+        period = partition_start(name)
+        table = partition_table(name)
+        for sample in connection.execute(
+            select(
+                table.c.container_id,
+                table.c.timestamp,
+                table.c.cpu_usage_cores,
+                table.c.memory_usage_bytes,
+                table.c.cpu_usage_max_cores,
+                table.c.memory_usage_max_bytes,
+            )
+        ):
+            key = (sample.container_id, period)
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = UsageStats()
+            entry.add(sample)
+
+    connection.execute(delete(ContainerStatsBin.__table__))
+    connection.execute(delete(ContainerStats.__table__))
+    _add(connection, stats)
+    return len({container_id for container_id, _ in stats})
+
+
+def rebuild(bind=engine) -> int:
+    """Rebuild the statistics in a transaction of their own."""
+    with bind.begin() as connection:
+        count = rebuild_stats(connection)
+    logger.info(f"Rebuilt usage statistics of {count} containers")
+    return count
+
+
+def ensure_stats(bind=engine):
+    """Build statistics for history written before they were maintained."""
+    with bind.connect() as connection:
+        has_stats = connection.execute(
+            select(func.count()).select_from(ContainerStats.__table__)
+        ).scalar()
+        has_samples = bool(partition_names(connection))
+    if not has_stats and has_samples:
+        rebuild(bind)
+
+
+def _add(connection, stats: Dict[Tuple[int, datetime], UsageStats]):
+    """Add container period statistics to the stored rows and bins."""
+    if not stats:
+        return
+
+    insert = dialect_insert(connection)
+    table = ContainerStats.__table__
+    statement = insert(table)
+    new = statement.excluded
+    columns = [column.name for column in table.columns]
+    executemany(
+        connection,
+        statement.on_conflict_do_update(
+            index_elements=[table.c.container_id, table.c.period_start],
+            set_={
+                **{name: table.c[name] + new[name] for name in _SUMS},
+                **{
+                    name: case(
+                        (new[name] < table.c[name], new[name]), else_=table.c[name]
+                    )
+                    for name in _MINIMA
+                },
+                **{
+                    name: case(
+                        (new[name] > table.c[name], new[name]), else_=table.c[name]
+                    )
+                    for name in _MAXIMA
+                },
+            },
+        ),
+        columns,
+        [
+            (*key, *(getattr(entry, name) for name in columns[2:]))
+            for key, entry in stats.items()
+        ],
+    )
+
+    bins = ContainerStatsBin.__table__
+    statement = insert(bins)
+    executemany(
+        connection,
+        statement.on_conflict_do_update(
+            index_elements=[
+                bins.c.container_id,
+                bins.c.period_start,
+                bins.c.metric,
+                bins.c.bin,
+            ],
+            set_={"count": bins.c.count + statement.excluded.count},
+        ),
+        ["container_id", "period_start", "metric", "bin", "count"],
+        [
+            (*key, metric, index, count)
+            for key, entry in stats.items()
+            for metric, sketch in entry.sketches.items()
+            for index, count in sketch.bins.items()
+        ],
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    init_database()
+    rebuild()
@@ -1,10 +1,15 @@
+import asyncio
 import logging
-from typing import Dict, List
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+import orjson
 from kubernetes.client.rest import ApiException
-from kubernetes_asyncio import client, config
+from kubernetes_asyncio import client, config, watch
 
 from ..core.config import get_settings
+from .pod_inventory import PodInventory
+from .quantity import parse_cpu, parse_memory
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +19,8 @@ class KubernetesService:
         self.settings = get_settings()
         self.api_client = None
         self.v1 = None
+        self.inventory = PodInventory()
+        self._watch_task: Optional[asyncio.Task] = None
 
     async def initialize(self):
         """Initialize Kubernetes client."""
@@ -42,65 +49,48 @@ class KubernetesService:
 
     async def close(self):
         """Close Kubernetes client."""
+        await self.stop_watch()
         if self.api_client:
             await self.api_client.close()
 
-    async def get_all_pods(self) -> List[Dict]:
-        """Get all pods excluding specified namespaces."""
+    async def start_watch(self):
+        """Populate the pod inventory and keep it up to date with a watch."""
+        if self._watch_task and not self._watch_task.done():
+            return
+
+        await self._relist()
+        self._watch_task = asyncio.create_task(self._watch_loop())
+        logger.info("Kubernetes pod watch started")
+
+    async def stop_watch(self):
+        """Stop the pod watch if it is running."""
+        if not self._watch_task:
+            return
+
+        self._watch_task.cancel()
         try:
-            pods_list = await self.v1.list_pod_for_all_namespaces()
-            pods_data = []
+            await self._watch_task
+        except asyncio.CancelledError:
+            pass
+        self._watch_task = None
+        logger.info("Kubernetes pod watch stopped")
 
-            for pod in pods_list.items:
-                if pod.metadata.namespace in self.settings.excluded_namespaces_list:
-                    continue
+    @property
+    def watching(self) -> bool:
+        """Whether pods are served from a synced watch inventory."""
+        return (
+            self._watch_task is not None
+            and not self._watch_task.done()
+            and self.inventory.synced
+        )
 
-                pod_info = {
-                    "name": pod.metadata.name,
-                    "namespace": pod.metadata.namespace,
-                    "node_name": pod.spec.node_name,
-                    "phase": pod.status.phase,
-                    "created": pod.metadata.creation_timestamp,
-                    "containers": [],
-                }
+    async def get_all_pods(self) -> List[Dict]:
+        """Get all pods excluding specified namespaces."""
+        if self.watching:
+            return self.inventory.pods()
 
-                if pod.spec.containers:
-                    for container in pod.spec.containers:
-                        container_info = {
-                            "name": container.name,
-                            "image": container.image,
-                            "requests": {"cpu": 0.0, "memory": 0},
-                            "limits": {"cpu": 0.0, "memory": 0},
-                        }
-
-                        if container.resources:
-                            if container.resources.requests:
-                                cpu_req = container.resources.requests.get("cpu", "0")
-                                mem_req = container.resources.requests.get(
-                                    "memory", "0"
-                                )
-                                container_info["requests"]["cpu"] = self._parse_cpu(
-                                    cpu_req
-                                )
-                                container_info["requests"]["memory"] = (
-                                    self._parse_memory(mem_req)
-                                )
-
-                            if container.resources.limits:
-                                cpu_limit = container.resources.limits.get("cpu", "0")
-                                mem_limit = container.resources.limits.get(
-                                    "memory", "0"
-                                )
-                                container_info["limits"]["cpu"] = self._parse_cpu(
-                                    cpu_limit
-                                )
-                                container_info["limits"]["memory"] = self._parse_memory(
-                                    mem_limit
-                                )
-
-                        pod_info["containers"].append(container_info)
-
-                pods_data.append(pod_info)
+        try:
+            pods_data, _, _ = await self._list_pods()
 
             logger.info(f"Retrieved {len(pods_data)} pods from Kubernetes")
             return pods_data
@@ -112,44 +102,219 @@ class KubernetesService:
             logger.error(f"Error retrieving pods: {e}")
             raise
 
-    def _parse_cpu(self, cpu_str: str) -> float:
-        """Parse CPU resource string to cores."""
-        if not cpu_str or cpu_str == "0":
-            return 0.0
-
-        if cpu_str.endswith("m"):
-            return float(cpu_str[:-1]) / 1000
-        elif cpu_str.endswith("u"):
-            return float(cpu_str[:-1]) / 1000000
-        else:
-            return float(cpu_str)
-
-    def _parse_memory(self, memory_str: str) -> int:
-        """Parse memory resource string to bytes."""
-        if not memory_str or memory_str == "0":
-            return 0
-
-        multipliers = {
-            "Ki": 1024,
-            "Mi": 1024**2,
-            "Gi": 1024**3,
-            "Ti": 1024**4,
-            "Pi": 1024**5,
-            "Ei": 1024**6,
-            "K": 1000,
-            "M": 1000**2,
-            "G": 1000**3,
-            "T": 1000**4,
-            "P": 1000**5,
-            "E": 1000**6,
+    async def iter_pod_pages(self) -> AsyncIterator[List[Dict]]:
+        """Yield pods page by page so callers never hold the whole cluster."""
+        page_size = self.settings.k8s_list_page_size
+
+        if self.watching:
+            pods = self.inventory.pods()
+            step = page_size or len(pods) or 1
+            for start in range(0, len(pods), step):
+                yield pods[start : start + step]
+            return
+
+        if not page_size:
+            yield await self.get_all_pods()
+            return
+
+        continue_token = None
+        total_pods = 0
+        pages = 0
+        while True:
+            try:
+                page, continue_token, _ = await self._list_pods(
+                    limit=page_size, _continue=continue_token
+                )
+            except ApiException as e:
+                logger.error(f"Kubernetes API error: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"Error retrieving pods page: {e}")
+                raise
+
+            total_pods += len(page)
+            pages += 1
+            yield page
+
+            if not continue_token:
+                break
+
+        logger.info(f"Retrieved {total_pods} pods from Kubernetes in {pages} pages")
+
+    async def _relist(self):
+        """Do a full pod list and reset the inventory from it."""
+        pods_data, _, resource_version = await self._list_pods()
+        self.inventory.replace(pods_data, resource_version)
+        logger.info(
+            f"Pod inventory synced with {len(self.inventory)} pods "
+            f"at resourceVersion {self.inventory.resource_version}"
+        )
+
+    async def _list_pods(
+        self, **kwargs
+    ) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+        """List pods and return (pods, continue token, resourceVersion)."""
+        if not self.settings.k8s_raw_decode:
+            pods_list = await self.v1.list_pod_for_all_namespaces(**kwargs)
+            pods_data = [
+                self._pod_to_dict(pod)
+                for pod in pods_list.items
+                if not self._is_excluded(pod.metadata.namespace)
+            ]
+            metadata = pods_list.metadata
+            return pods_data, metadata._continue, metadata.resource_version
+
+        # Skip client model construction: read the raw body and pick out
+        # only the fields the collector needs
+        response = await self.v1.list_pod_for_all_namespaces(
+            _preload_content=False, **kwargs
+        )
+        try:
+            if not 200 <= response.status <= 299:
+                raise client.exceptions.ApiException(
+                    status=response.status, reason=await response.text()
+                )
+            payload = orjson.loads(await response.read())
+        finally:
+            response.release()
+
+        pods_data = [
+            self._raw_pod_to_dict(item)
+            for item in payload.get("items") or ()
+            if not self._is_excluded(item["metadata"].get("namespace"))
+        ]
+        metadata = payload.get("metadata") or {}
+        return pods_data, metadata.get("continue"), metadata.get("resourceVersion")
+
+    async def _watch_loop(self):
+        """Apply pod watch events to the inventory, relisting when required."""
+        backoff = 1
+        while True:
+            try:
+                if not self.inventory.synced:
+                    await self._relist()
+
+                await self._watch_once()
+                backoff = 1
+                continue
+
+            except asyncio.CancelledError:
+                raise
+            except (ApiException, client.exceptions.ApiException) as e:
+                if e.status == 410:
+                    logger.info("Pod watch resourceVersion expired, relisting")
+                    self.inventory.invalidate()
+                    continue
+                logger.error(f"Kubernetes watch API error: {e}")
+            except Exception as e:
+                logger.error(f"Error watching pods: {e}")
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def _watch_once(self):
+        """Consume a single watch request until the server closes it."""
+        async with watch.Watch() as pod_watch:
+            stream = pod_watch.stream(
+                self.v1.list_pod_for_all_namespaces,
+                resource_version=self.inventory.resource_version,
+                allow_watch_bookmarks=True,
+                timeout_seconds=self.settings.k8s_watch_timeout_seconds,
+            )
+            async for event in stream:
+                event_type = event["type"]
+                metadata = event["raw_object"].get("metadata", {})
+                resource_version = metadata.get("resourceVersion")
+
+                if event_type in ("ADDED", "MODIFIED", "DELETED"):
+                    namespace = metadata.get("namespace")
+                    if not self._is_excluded(namespace):
+                        if event_type == "DELETED":
+                            self.inventory.delete(namespace, metadata.get("name"))
+                        else:
+                            self.inventory.upsert(
+                                self._raw_pod_to_dict(event["raw_object"])
+                            )
+
+                # Bookmarks carry only a resourceVersion to resume from
+                if resource_version:
+                    self.inventory.resource_version = resource_version
+
+    def _is_excluded(self, namespace: str) -> bool:
+        return namespace in self.settings.excluded_namespaces_list
+
+    def _pod_to_dict(self, pod) -> Dict:
+        """Convert a V1Pod into the dict consumed by the collector."""
+        pod_info = {
+            "name": pod.metadata.name,
+            "namespace": pod.metadata.namespace,
+            "node_name": pod.spec.node_name,
+            "phase": pod.status.phase,
+            "created": pod.metadata.creation_timestamp,
+            "containers": [],
         }
 
-        for suffix, multiplier in multipliers.items():
-            if memory_str.endswith(suffix):
-                return int(float(memory_str[: -len(suffix)]) * multiplier)
+        if pod.spec.containers:
+            for container in pod.spec.containers:
+                container_info = {
+                    "name": container.name,
+                    "image": container.image,
+                    "requests": {"cpu": 0.0, "memory": 0},
+                    "limits": {"cpu": 0.0, "memory": 0},
+                }
+
+                if container.resources:
+                    if container.resources.requests:
+                        cpu_req = container.resources.requests.get("cpu", "0")
+                        mem_req = container.resources.requests.get("memory", "0")
+                        container_info["requests"]["cpu"] = parse_cpu(cpu_req)
+                        container_info["requests"]["memory"] = parse_memory(mem_req)
+
+                    if container.resources.limits:
+                        cpu_limit = container.resources.limits.get("cpu", "0")
+                        mem_limit = container.resources.limits.get("memory", "0")
+                        container_info["limits"]["cpu"] = parse_cpu(cpu_limit)
+                        container_info["limits"]["memory"] = parse_memory(mem_limit)
+
+                pod_info["containers"].append(container_info)
+
+        return pod_info
+
+    def _raw_pod_to_dict(self, item: Dict) -> Dict:
+        """Convert a raw pod JSON object into the dict consumed by the collector."""
+        metadata = item["metadata"]
+        spec = item.get("spec") or {}
+        status = item.get("status") or {}
+        # RFC 3339 in UTC, parsed to the aware datetime the client models hold
+        created = metadata.get("creationTimestamp")
 
-        # Handle "m" (milli) suffix — Kubernetes allows millibytes
-        if memory_str.endswith("m"):
-            return int(float(memory_str[:-1]) / 1000)
+        pod_info = {
+            "name": metadata["name"],
+            "namespace": metadata["namespace"],
+            "node_name": spec.get("nodeName"),
+            "phase": status.get("phase"),
+            "created": datetime.fromisoformat(created) if created else None,
+            "containers": [],
+        }
+
+        for container in spec.get("containers") or ():
+            resources = container.get("resources") or {}
+            requests = resources.get("requests") or {}
+            limits = resources.get("limits") or {}
+
+            pod_info["containers"].append(
+                {
+                    "name": container["name"],
+                    "image": container.get("image"),
+                    "requests": {
+                        "cpu": parse_cpu(requests.get("cpu", "0")),
+                        "memory": parse_memory(requests.get("memory", "0")),
+                    },
+                    "limits": {
+                        "cpu": parse_cpu(limits.get("cpu", "0")),
+                        "memory": parse_memory(limits.get("memory", "0")),
+                    },
+                }
+            )
 
-        return int(memory_str)
+        return pod_info
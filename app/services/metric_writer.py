@@ -0,0 +1,380 @@
+"""Bulk loading of resource metric rows.
+
+Rows are ``MetricRow`` tuples: a container identity, its requests and limits,
+then the sample values. Identities are resolved to ``containers`` ids through
+a cache, specs are written only when they differ from the last known ones, and
+samples are written to their time partition with one Core ``INSERT`` executed
+for the whole batch, bypassing the ORM unit of work and identity map.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..core.database import dialect_insert, executemany
+from ..core.partitions import SamplePartitions, sample_class
+from ..models.database import Container, ContainerSpec, ResourceSample
+from .container_stats import record_stats
+
+logger = logging.getLogger(__name__)
+
+containers_table = Container.__table__
+specs_table = ContainerSpec.__table__
+samples_table = ResourceSample.__table__
+
+CONTAINER_COLUMNS = ("namespace", "pod_name", "container_name", "node_name")
+SPEC_COLUMNS = (
+    "cpu_request_cores",
+    "memory_request_bytes",
+    "cpu_limit_cores",
+    "memory_limit_bytes",
+)
+SAMPLE_COLUMNS = tuple(
+    column.name
+    for column in samples_table.columns
+    if column.name not in ("id", "container_id")
+)
+METRIC_COLUMNS = CONTAINER_COLUMNS + SPEC_COLUMNS + SAMPLE_COLUMNS
+
+MetricRow = namedtuple("MetricRow", METRIC_COLUMNS)
+SAMPLE_INSERT_COLUMNS = ("container_id", *SAMPLE_COLUMNS)
+
+ContainerIdentity = Tuple[str, str, str, str]
+Spec = Tuple[float, int, float, int]
+
+_IDENTITY = slice(0, len(CONTAINER_COLUMNS))
+_SPEC = slice(_IDENTITY.stop, _IDENTITY.stop + len(SPEC_COLUMNS))
+_SAMPLE = slice(_SPEC.stop, None)
+_TIMESTAMP = 1 + SAMPLE_COLUMNS.index("timestamp")  # In (container_id, *sample)
+
+# Keeps IN lists well under SQLite's bound parameter limit
+_IN_CHUNK_SIZE = 500
+
+
+def _chunks(values: Sequence) -> Iterator[Sequence]:
+    for offset in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[offset : offset + _IN_CHUNK_SIZE]
+
+
+class ContainerRegistry:
+    """Map container identities to ``containers`` ids, adding new ones."""
+
+    def __init__(self):
+        self._ids: Dict[ContainerIdentity, int] = {}
+        self._max_id = 0
+        self._loaded = False
+
+    def clear(self):
+        """Forget cached ids, e.g. after a rollback or container pruning."""
+        self._ids.clear()
+        self._max_id = 0
+        self._loaded = False
+
+    def resolve(self, connection, rows: Sequence[MetricRow]) -> List[int]:
+        """Return the container id of each row, inserting unknown identities.
+
+        Identities another writer (e.g. a backfill) has already inserted are
+        skipped by the insert and picked up by the reload.
+        """
+        if not self._loaded:
+            self._load(connection)
+            self._loaded = True
+
+        missing = {row[_IDENTITY] for row in rows} - self._ids.keys()
+        if missing:
+            connection.execute(
+                dialect_insert(connection)(containers_table).on_conflict_do_nothing(),
+                [dict(zip(CONTAINER_COLUMNS, identity)) for identity in missing],
+            )
+            self._load(connection)
+            if not missing <= self._ids.keys():
+                # Committed by another writer under an id below ones seen here
+                self._max_id = 0
+                self._load(connection)
+
+        return [self._ids[row[_IDENTITY]] for row in rows]
+
+    def _load(self, connection):
+        """Read identities added since the last load."""
+        columns = [containers_table.c[name] for name in CONTAINER_COLUMNS]
+        result = connection.execute(
+            select(containers_table.c.id, *columns).where(
+                containers_table.c.id > self._max_id
+            )
+        )
+        for container_id, *identity in result:
+            self._ids[tuple(identity)] = container_id
+            self._max_id = max(self._max_id, container_id)
+
+
+class SpecHistory:
+    """Last known spec per container id; history rows are written on change.
+
+    The snapshot is reloaded whenever spec rows were added by another writer,
+    which shows as a newest row id other than the one last seen here.
+    """
+
+    def __init__(self):
+        self._current: Dict[int, Spec] = {}
+        self._max_id: Optional[int] = None
+        self._loaded = False
+
+    def clear(self):
+        """Forget the snapshot; it is reloaded from the open history rows."""
+        self._current.clear()
+        self._max_id = None
+        self._loaded = False
+
+    def record(
+        self, connection, container_ids: Sequence[int], rows: Sequence[MetricRow]
+    ) -> int:
+        """Close and replace the specs that changed since the last snapshot."""
+        self._refresh(connection)
+
+        changed: Dict[int, Tuple[Spec, datetime]] = {}
+        for container_id, row in zip(container_ids, rows):
+            spec = row[_SPEC]
+            if self._current.get(container_id) != spec:
+                changed[container_id] = (spec, row.timestamp)
+
+        if not changed:
+            return 0
+
+        # A collection shares one timestamp, so this is normally one group
+        by_time: Dict[datetime, List[int]] = {}
+        for container_id, (_, timestamp) in changed.items():
+            by_time.setdefault(timestamp, []).append(container_id)
+        for timestamp, ids in by_time.items():
+            for chunk in _chunks(ids):
+                connection.execute(
+                    update(specs_table)
+                    .where(
+                        specs_table.c.container_id.in_(chunk),
+                        specs_table.c.valid_to.is_(None),
+                    )
+                    .values(valid_to=timestamp)
+                )
+
+        connection.execute(
+            insert(specs_table),
+            [
+                {
+                    "container_id": container_id,
+                    "valid_from": timestamp,
+                    **dict(zip(SPEC_COLUMNS, spec)),
+                }
+                for container_id, (spec, timestamp) in changed.items()
+            ],
+        )
+        for container_id, (spec, _) in changed.items():
+            self._current[container_id] = spec
+        self._max_id = self._newest_id(connection)
+        return len(changed)
+
+    def backdate(
+        self,
+        connection,
+        container_ids: Sequence[int],
+        rows: Sequence[MetricRow],
+        since: datetime,
+    ):
+        """Make specs cover history loaded from before they were first seen.
+
+        A container's earliest spec is extended back to since; a container
+        without any spec gets the row's spec as its current one.
+        """
+        self._refresh(connection)
+        ids = sorted(set(container_ids))
+        earliest = {}
+        for chunk in _chunks(ids):
+            earliest.update(
+                connection.execute(
+                    select(
+                        specs_table.c.container_id, func.min(specs_table.c.valid_from)
+                    )
+                    .where(specs_table.c.container_id.in_(chunk))
+                    .group_by(specs_table.c.container_id)
+                ).all()
+            )
+
+        later = [cid for cid, valid_from in earliest.items() if valid_from > since]
+        other = specs_table.alias()
+        first_valid_from = (
+            select(func.min(other.c.valid_from))
+            .where(other.c.container_id == specs_table.c.container_id)
+            .scalar_subquery()
+        )
+        for chunk in _chunks(later):
+            connection.execute(
+                update(specs_table)
+                .where(
+                    specs_table.c.container_id.in_(chunk),
+                    specs_table.c.valid_from == first_valid_from,
+                )
+                .values(valid_from=since)
+            )
+
+        missing = {}
+        for container_id, row in zip(container_ids, rows):
+            if container_id not in earliest:
+                missing.setdefault(container_id, row[_SPEC])
+        if missing:
+            connection.execute(
+                insert(specs_table),
+                [
+                    {
+                        "container_id": container_id,
+                        "valid_from": since,
+                        **dict(zip(SPEC_COLUMNS, spec)),
+                    }
+                    for container_id, spec in missing.items()
+                ],
+            )
+            self._current.update(missing)
+            self._max_id = self._newest_id(connection)
+
+    def _refresh(self, connection):
+        """Reload the snapshot if it is missing or another writer added specs."""
+        newest = self._newest_id(connection)
+        if not self._loaded or newest != self._max_id:
+            self._current.clear()
+            self._load(connection)
+            self._max_id = newest
+            self._loaded = True
+
+    @staticmethod
+    def _newest_id(connection) -> Optional[int]:
+        return connection.execute(select(func.max(specs_table.c.id))).scalar()
+
+    def _load(self, connection):
+        """Read the open spec of every container."""
+        columns = [specs_table.c[name] for name in SPEC_COLUMNS]
+        result = connection.execute(
+            select(specs_table.c.container_id, *columns).where(
+                specs_table.c.valid_to.is_(None)
+            )
+        )
+        for container_id, *spec in result:
+            self._current[container_id] = tuple(spec)
+
+
+class MetricWriter:
+    """Write metric rows in batches and keep rows/second statistics.
+
+    Pass the same registry, spec history and partitions on every collection
+    so unchanged containers, specs and partitions are recognized without
+    reading them back.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 5000,
+        containers: Optional[ContainerRegistry] = None,
+        specs: Optional[SpecHistory] = None,
+        partitions: Optional[SamplePartitions] = None,
+    ):
+        self.batch_size = batch_size
+        self.containers = containers or ContainerRegistry()
+        self.specs = specs or SpecHistory()
+        self.partitions = partitions or SamplePartitions()
+        self.rows_written = 0
+        self.specs_written = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.seconds if self.seconds else 0.0
+
+    def clear(self):
+        """Drop cached state, e.g. after the transaction rolled back."""
+        self.containers.clear()
+        self.specs.clear()
+        self.partitions.clear()
+
+    def write(
+        self,
+        db: Session,
+        rows: Sequence[MetricRow],
+        since: Optional[datetime] = None,
+    ) -> int:
+        """Insert rows in the session's transaction, one batch at a time.
+
+        With since, the rows are history loaded after the fact: specs are
+        backdated to since rather than recorded as changes.
+        """
+        started = time.perf_counter()
+        connection = db.connection()
+
+        for offset in range(0, len(rows), self.batch_size):
+            batch = rows[offset : offset + self.batch_size]
+            container_ids = self._resolve(connection, batch, since)
+            samples = [
+                (container_id, *row[_SAMPLE])
+                for container_id, row in zip(container_ids, batch)
+            ]
+            partitions = self.partitions.route(
+                connection, samples, lambda sample: sample[_TIMESTAMP]
+            )
+            for table, partition_samples in partitions.items():
+                executemany(
+                    connection,
+                    insert(table),
+                    SAMPLE_INSERT_COLUMNS,
+                    partition_samples,
+                )
+
+        self.rows_written += len(rows)
+        self.seconds += time.perf_counter() - started
+        return len(rows)
+
+    def write_orm(self, db: Session, rows: Sequence[MetricRow]) -> int:
+        """Insert rows as ORM objects; slower, kept for tests and comparison."""
+        started = time.perf_counter()
+
+        connection = db.connection()
+        container_ids = self._resolve(connection, rows)
+        partitions = self.partitions.route(
+            connection, zip(container_ids, rows), lambda item: item[1].timestamp
+        )
+        samples = [
+            sample_class(table)(
+                container_id=container_id, **dict(zip(SAMPLE_COLUMNS, row[_SAMPLE]))
+            )
+            for table, items in partitions.items()
+            for container_id, row in items
+        ]
+
+        # Flush and drop the objects so the session does not accumulate them
+        db.add_all(samples)
+        db.flush()
+        db.expunge_all()
+
+        self.rows_written += len(rows)
+        self.seconds += time.perf_counter() - started
+        return len(rows)
+
+    def log_stats(self, label: str = "Stored"):
+        logger.info(
+            f"{label} {self.rows_written} resource metrics in {self.seconds:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s), {self.specs_written} spec changes"
+        )
+
+    def _resolve(
+        self,
+        connection,
+        rows: Sequence[MetricRow],
+        since: Optional[datetime] = None,
+    ) -> List[int]:
+        """Resolve container ids and update spec history and usage statistics."""
+        container_ids = self.containers.resolve(connection, rows)
+        if since is None:
+            self.specs_written += self.specs.record(connection, container_ids, rows)
+        else:
+            self.specs.backdate(connection, container_ids, rows, since)
+        record_stats(connection, container_ids, rows, self.partitions.start_of)
+        return container_ids
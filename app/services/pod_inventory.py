@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class PodInventory:
+    """In-memory pod store indexed by namespace, fed by a Kubernetes watch."""
+
+    def __init__(self):
+        self._pods: Dict[str, Dict[str, Dict]] = {}
+        self.resource_version: Optional[str] = None
+        self.synced = False
+
+    def __len__(self) -> int:
+        return sum(len(pods) for pods in self._pods.values())
+
+    def replace(self, pods: Iterable[Dict], resource_version: Optional[str]):
+        """Replace the whole store with the result of a full list."""
+        store: Dict[str, Dict[str, Dict]] = {}
+        for pod in pods:
+            store.setdefault(pod["namespace"], {})[pod["name"]] = pod
+
+        self._pods = store
+        self.resource_version = resource_version
+        self.synced = True
+
+    def upsert(self, pod: Dict):
+        """Insert or update a single pod."""
+        self._pods.setdefault(pod["namespace"], {})[pod["name"]] = pod
+
+    def delete(self, namespace: str, name: str):
+        """Remove a single pod if present."""
+        namespace_pods = self._pods.get(namespace)
+        if namespace_pods is None:
+            return
+
+        namespace_pods.pop(name, None)
+        if not namespace_pods:
+            del self._pods[namespace]
+
+    def invalidate(self):
+        """Drop the resume point so the next sync does a full relist."""
+        self.resource_version = None
+        self.synced = False
+
+    def get(self, namespace: str, name: str) -> Optional[Dict]:
+        """Get a single pod by namespace and name."""
+        return self._pods.get(namespace, {}).get(name)
+
+    def namespaces(self) -> List[str]:
+        """Get namespaces that currently have pods."""
+        return list(self._pods)
+
+    def namespace_pods(self, namespace: str) -> List[Dict]:
+        """Get all pods of a namespace."""
+        return list(self._pods.get(namespace, {}).values())
+
+    def pods(self) -> List[Dict]:
+        """Get a snapshot of all pods in the store."""
+        return [pod for pods in self._pods.values() for pod in pods.values()]
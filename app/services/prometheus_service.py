@@ -1,34 +1,107 @@
 import asyncio
 import logging
 import ssl
-from datetime import datetime
-from typing import Dict, Optional
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 
 from ..core.config import get_settings
+from .prometheus_stream import (
+    CHUNK_SIZE,
+    MatrixSeries,
+    Series,
+    iter_matrix_series,
+    iter_vector_series,
+)
 
 logger = logging.getLogger(__name__)
 
+ContainerKey = Tuple[str, str, str]
+
+CONTAINER_SELECTOR = 'container!="POD",container!=""'
+
+
+PEAK_METRICS = ("cpu_max", "cpu_p95", "memory_max", "memory_p95")
+
+MAX_OVER_TIME = "max_over_time({})"
+P95_OVER_TIME = "quantile_over_time(0.95, {})"
+
+
+def cpu_usage_query(selector: str = "", rate_window: str = "5m") -> str:
+    """PromQL for per-container CPU usage, optionally narrowed by a selector."""
+    return (
+        f"sum(rate(container_cpu_usage_seconds_total{{{CONTAINER_SELECTOR}{selector}}}"
+        f"[{rate_window}])) by (namespace, pod, container)"
+    )
+
+
+def memory_usage_query(selector: str = "") -> str:
+    """PromQL for per-container working set, optionally narrowed by a selector."""
+    return (
+        f"sum(container_memory_working_set_bytes{{{CONTAINER_SELECTOR}{selector}}})"
+        " by (namespace, pod, container)"
+    )
+
+
+def usage_over_time(template: str, inner: str, window: str, resolution: str) -> str:
+    """Aggregate a per-container query over a window with a subquery."""
+    return template.format(f"({inner})[{window}:{resolution}]")
+
 
 class PrometheusService:
+    """Prometheus HTTP API client.
+
+    Started once for the application lifetime and shared, it keeps a pool of
+    keep-alive connections to Prometheus. Used as an async context manager on
+    an instance that was not started, it opens and closes a session for the
+    duration of the block.
+    """
+
     def __init__(self):
         self.settings = get_settings()
         self.session = None
+        self._scoped = False
+        self._depth = 0
+
+    async def start(self):
+        """Open the pooled HTTP session."""
+        if self.session and not self.session.closed:
+            return
 
-    async def __aenter__(self):
         ssl_context = ssl.create_default_context()
         ssl_context.check_hostname = False
         ssl_context.verify_mode = ssl.CERT_NONE
         self.session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=self.settings.prometheus_timeout),
-            connector=aiohttp.TCPConnector(limit=10, ssl=ssl_context),
+            connector=aiohttp.TCPConnector(
+                limit=self.settings.prometheus_pool_size,
+                keepalive_timeout=self.settings.prometheus_keepalive_seconds,
+                use_dns_cache=True,
+                ttl_dns_cache=self.settings.prometheus_dns_cache_seconds,
+                ssl=ssl_context,
+            ),
+            headers={"Accept-Encoding": "gzip, deflate"},
         )
-        return self
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def close(self):
+        """Close the HTTP session and its connection pool."""
         if self.session:
             await self.session.close()
+        self.session = None
+        self._scoped = False
+
+    async def __aenter__(self):
+        if self.session is None or self.session.closed:
+            await self.start()
+            self._scoped = True
+        self._depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._scoped and self._depth == 0:
+            await self.close()
 
     async def query_prometheus(
         self, query: str, time: Optional[datetime] = None
@@ -36,99 +109,265 @@ class PrometheusService:
         """Execute PromQL query."""
         params = {"query": query}
         if time:
-            params["time"] = time.isoformat()
+            params["time"] = self._format_time(time)
+
+        try:
+            return await self._get("/api/v1/query", params)
 
-        url = f"{self.settings.prometheus_url}/api/v1/query"
+        except Exception as e:
+            logger.error(f"Prometheus query error for '{query}': {e}")
+            raise
+
+    async def stream_vector(
+        self, query: str, time: Optional[datetime] = None
+    ) -> AsyncIterator[Series]:
+        """Execute a PromQL query, yielding series as the response streams in."""
+        params = {"query": query}
+        if time:
+            params["time"] = self._format_time(time)
+
+        async for series in self._stream("/api/v1/query", params, iter_vector_series):
+            yield series
+
+    async def stream_matrix(
+        self, query: str, start: datetime, end: datetime, step: timedelta
+    ) -> AsyncIterator[MatrixSeries]:
+        """Execute a PromQL range query, yielding series as they stream in."""
+        params = {
+            "query": query,
+            "start": self._format_time(start),
+            "end": self._format_time(end),
+            "step": f"{int(step.total_seconds())}s",
+        }
+
+        async for series in self._stream(
+            "/api/v1/query_range", params, iter_matrix_series
+        ):
+            yield series
+
+    async def _stream(self, path: str, params: Dict, decode: Callable):
+        """GET a Prometheus query path and decode the result as it arrives."""
+        url = f"{self.settings.prometheus_url}{path}"
 
         try:
             async with self.session.get(url, params=params) as response:
                 response.raise_for_status()
-                data = await response.json()
-
-                if data["status"] != "success":
-                    raise Exception(
-                        f"Prometheus query failed: {data.get('error', 'Unknown error')}"
-                    )
-
-                return data["data"]
+                chunks = response.content.iter_chunked(CHUNK_SIZE)
+                async for series in decode(chunks):
+                    yield series
 
         except Exception as e:
-            logger.error(f"Prometheus query error for '{query}': {e}")
+            logger.error(f"Prometheus query error for '{params['query']}': {e}")
             raise
 
-    async def get_pod_cpu_usage(self) -> Dict[str, float]:
-        """Get CPU usage by container (keyed as namespace/pod/container)."""
-        query = (
-            'sum(rate(container_cpu_usage_seconds_total{container!="POD",container!=""}[5m]))'
-            " by (namespace, pod, container)"
-        )
+    async def get_namespaces(self, time: Optional[datetime] = None) -> List[str]:
+        """Get namespaces that have container metrics, minus excluded ones."""
+        params = {
+            "match[]": f"container_memory_working_set_bytes{{{CONTAINER_SELECTOR}}}"
+        }
+        if time:
+            params["start"] = self._format_time(time - timedelta(minutes=15))
+            params["end"] = self._format_time(time)
 
-        try:
-            data = await self.query_prometheus(query)
-            usage_by_container = {}
+        namespaces = await self._get("/api/v1/label/namespace/values", params)
+        excluded = set(self.settings.excluded_namespaces_list)
+        return sorted(ns for ns in namespaces if ns and ns not in excluded)
 
-            for result in data["result"]:
-                metric = result["metric"]
-                namespace = metric.get("namespace", "")
-                pod = metric.get("pod", "")
-                container = metric.get("container", "")
-                usage = float(result["value"][1])
+    async def _get(self, path: str, params: Dict):
+        """GET a Prometheus API path and return the payload's data field."""
+        url = f"{self.settings.prometheus_url}{path}"
 
-                if namespace and pod and container:
-                    key = f"{namespace}/{pod}/{container}"
-                    usage_by_container[key] = usage
+        async with self.session.get(url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
 
-            return usage_by_container
+            if data["status"] != "success":
+                raise Exception(
+                    f"Prometheus query failed: {data.get('error', 'Unknown error')}"
+                )
+
+            return data["data"]
+
+    @staticmethod
+    def _format_time(time: datetime) -> str:
+        # Naive datetimes are UTC throughout the app
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=timezone.utc)
+        return f"{time.timestamp():.3f}"
+
+    async def get_pod_cpu_usage(
+        self, time: Optional[datetime] = None, namespaces: Optional[List[str]] = None
+    ) -> Dict[ContainerKey, float]:
+        """Get CPU usage by container, keyed by (namespace, pod, container)."""
+        try:
+            return await self._query_usage(cpu_usage_query, float, time, namespaces)
 
         except Exception as e:
             logger.error(f"Error getting CPU usage: {e}")
             return {}
 
-    async def get_pod_memory_usage(self) -> Dict[str, int]:
-        """Get memory usage by container (keyed as namespace/pod/container)."""
-        query = (
-            'sum(container_memory_working_set_bytes{container!="POD",container!=""})'
-            " by (namespace, pod, container)"
+    async def get_pod_memory_usage(
+        self, time: Optional[datetime] = None, namespaces: Optional[List[str]] = None
+    ) -> Dict[ContainerKey, int]:
+        """Get memory usage by container, keyed by (namespace, pod, container)."""
+        try:
+            return await self._query_usage(
+                memory_usage_query, lambda value: int(float(value)), time, namespaces
+            )
+
+        except Exception as e:
+            logger.error(f"Error getting memory usage: {e}")
+            return {}
+
+    async def get_pod_usage_peaks(
+        self, time: Optional[datetime] = None, namespaces: Optional[List[str]] = None
+    ) -> Dict[str, Dict[ContainerKey, float]]:
+        """Get per-container max and p95 usage over the collection interval.
+
+        Instant samples miss bursts between collections; these subqueries
+        look at the whole interval so peaks survive longer intervals.
+        """
+        window = f"{self.settings.collection_interval_minutes}m"
+        resolution = self.settings.prometheus_peak_resolution
+        rate_window = self.settings.prometheus_peak_rate_window
+
+        def peak_query(template: str, inner_query: Callable[[str], str]):
+            def build_query(selector: str = "") -> str:
+                return usage_over_time(
+                    template, inner_query(selector), window, resolution
+                )
+
+            return build_query
+
+        def cpu_query(selector: str = "") -> str:
+            return cpu_usage_query(selector, rate_window)
+
+        def to_bytes(value: str) -> int:
+            return int(float(value))
+
+        queries = {
+            "cpu_max": (peak_query(MAX_OVER_TIME, cpu_query), float),
+            "cpu_p95": (peak_query(P95_OVER_TIME, cpu_query), float),
+            "memory_max": (peak_query(MAX_OVER_TIME, memory_usage_query), to_bytes),
+            "memory_p95": (peak_query(P95_OVER_TIME, memory_usage_query), to_bytes),
+        }
+
+        results = await asyncio.gather(
+            *(
+                self._query_usage(build_query, cast, time, namespaces)
+                for build_query, cast in queries.values()
+            ),
+            return_exceptions=True,
         )
 
-        try:
-            data = await self.query_prometheus(query)
-            usage_by_container = {}
+        peaks = {}
+        for name, result in zip(queries, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error getting {name} usage: {result}")
+                result = {}
+            peaks[name] = result
 
-            for result in data["result"]:
-                metric = result["metric"]
-                namespace = metric.get("namespace", "")
-                pod = metric.get("pod", "")
-                container = metric.get("container", "")
-                usage = int(float(result["value"][1]))
+        return peaks
 
-                if namespace and pod and container:
-                    key = f"{namespace}/{pod}/{container}"
-                    usage_by_container[key] = usage
+    async def _query_usage(
+        self,
+        build_query: Callable[[str], str],
+        cast: Callable,
+        time: Optional[datetime],
+        namespaces: Optional[List[str]],
+    ) -> Dict:
+        """Run a per-container usage query, sharded by namespace when given."""
+        usage_by_container = {}
 
+        if not namespaces:
+            await self._merge_usage(usage_by_container, build_query(), time, cast)
             return usage_by_container
 
-        except Exception as e:
-            logger.error(f"Error getting memory usage: {e}")
-            return {}
+        shard_size = self.settings.prometheus_shard_size
+        shards = [
+            namespaces[i : i + shard_size]
+            for i in range(0, len(namespaces), shard_size)
+        ]
+        semaphore = asyncio.Semaphore(self.settings.prometheus_shard_concurrency)
+
+        async def run_shard(shard: List[str]):
+            selector = f',namespace=~"{"|".join(shard)}"'
+            async with semaphore:
+                await self._merge_usage(
+                    usage_by_container, build_query(selector), time, cast
+                )
 
-    async def get_all_usage_metrics(self) -> Dict:
-        """Get all usage metrics concurrently."""
+        # Retry only the shards that failed; the others are already merged
+        pending = shards
+        for attempt in range(self.settings.prometheus_shard_retries + 1):
+            results = await asyncio.gather(
+                *(run_shard(shard) for shard in pending), return_exceptions=True
+            )
+            pending = [
+                shard
+                for shard, result in zip(pending, results)
+                if isinstance(result, Exception)
+            ]
+            if not pending:
+                break
+            logger.warning(
+                f"{len(pending)} of {len(shards)} Prometheus shards failed "
+                f"(attempt {attempt + 1})"
+            )
+
+        if pending:
+            missing = sorted(ns for shard in pending for ns in shard)
+            logger.error(f"No usage data for namespaces: {', '.join(missing)}")
+
+        return usage_by_container
+
+    async def _merge_usage(
+        self,
+        usage_by_container: Dict,
+        query: str,
+        time: Optional[datetime],
+        cast: Callable,
+    ):
+        """Stream a vector query into the usage dict keyed by container."""
+        async for namespace, pod, container, value in self.stream_vector(query, time):
+            if namespace and pod and container:
+                usage_by_container[(namespace, pod, container)] = cast(value)
+
+    async def get_all_usage_metrics(self, time: Optional[datetime] = None) -> Dict:
+        """Get all usage metrics concurrently, evaluated at the same instant."""
         try:
-            cpu_task = self.get_pod_cpu_usage()
-            memory_task = self.get_pod_memory_usage()
+            namespaces = None
+            if self.settings.prometheus_shard_size > 0:
+                try:
+                    namespaces = await self.get_namespaces(time)
+                except Exception as e:
+                    logger.error(f"Namespace discovery failed, not sharding: {e}")
+
+            cpu_task = self.get_pod_cpu_usage(time, namespaces)
+            memory_task = self.get_pod_memory_usage(time, namespaces)
+            peaks_task = (
+                self.get_pod_usage_peaks(time, namespaces)
+                if self.settings.prometheus_peak_sampling
+                else asyncio.sleep(0, result={})
+            )
 
-            cpu_usage, memory_usage = await asyncio.gather(
-                cpu_task, memory_task, return_exceptions=True
+            cpu_usage, memory_usage, peaks = await asyncio.gather(
+                cpu_task, memory_task, peaks_task, return_exceptions=True
             )
 
-            return {
+            usage_metrics = {
                 "cpu_usage": cpu_usage if not isinstance(cpu_usage, Exception) else {},
                 "memory_usage": (
                     memory_usage if not isinstance(memory_usage, Exception) else {}
                 ),
             }
+            if isinstance(peaks, Exception):
+                peaks = {}
+            for name in PEAK_METRICS:
+                usage_metrics[name] = peaks.get(name, {})
+
+            return usage_metrics
 
         except Exception as e:
             logger.error(f"Error getting usage metrics: {e}")
-            return {"cpu_usage": {}, "memory_usage": {}}
+            return {name: {} for name in ("cpu_usage", "memory_usage", *PEAK_METRICS)}
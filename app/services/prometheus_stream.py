@@ -0,0 +1,134 @@
+"""Incremental decoding of Prometheus vector and matrix responses.
+
+A cluster-wide ``by (namespace, pod, container)`` query can return hundreds of
+thousands of series. Rather than parsing the whole body into one tree, the
+``result`` array is walked element by element as chunks arrive, so memory is
+bounded by the chunk size plus a single series.
+"""
+
+import codecs
+import json
+import re
+import sys
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+_RESULT_START_RE = re.compile(r'"result"\s*:\s*\[')
+_SEPARATORS = " \t\r\n,"
+
+_decoder = json.JSONDecoder()
+
+Series = Tuple[str, str, str, str]
+MatrixSeries = Tuple[str, str, str, List[List[Any]]]
+
+
+class PrometheusResponseError(Exception):
+    """Raised when Prometheus answers with an error instead of a result."""
+
+
+async def iter_vector_series(chunks: AsyncIterator[bytes]) -> AsyncIterator[Series]:
+    """Yield (namespace, pod, container, value) for each series in a response.
+
+    Label strings are interned so the many repeated namespace and container
+    names share one object across series and across queries.
+    """
+    intern = sys.intern
+    async for element in _iter_result_elements(chunks):
+        metric = element["metric"]
+        yield (
+            intern(metric.get("namespace", "")),
+            intern(metric.get("pod", "")),
+            intern(metric.get("container", "")),
+            element["value"][1],
+        )
+
+
+async def iter_matrix_series(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[MatrixSeries]:
+    """Yield (namespace, pod, container, [[ts, value], ...]) for a range query."""
+    intern = sys.intern
+    async for element in _iter_result_elements(chunks):
+        metric = element["metric"]
+        yield (
+            intern(metric.get("namespace", "")),
+            intern(metric.get("pod", "")),
+            intern(metric.get("container", "")),
+            element["values"],
+        )
+
+
+async def _iter_result_elements(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each element of the response's result array as it is decoded."""
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = None  # Index just past the "result": [ opener once found
+    exhausted = False
+
+    chunk_iterator = chunks.__aiter__()
+
+    while True:
+        if position is None:
+            match = _RESULT_START_RE.search(buffer)
+            if match:
+                _check_status(buffer[: match.start()])
+                position = match.end()
+
+        if position is not None:
+            while True:
+                # Skip separators between elements
+                length = len(buffer)
+                while position < length and buffer[position] in _SEPARATORS:
+                    position += 1
+                if position >= length:
+                    break
+                if buffer[position] == "]":
+                    return
+
+                try:
+                    element, position = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                    break  # Element continues in the next chunk
+
+                yield element
+
+            buffer = buffer[position:]
+            position = 0
+
+        if exhausted:
+            break
+
+        try:
+            chunk = await chunk_iterator.__anext__()
+        except StopAsyncIteration:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+    # The stream ended without a result array: report the error body
+    try:
+        payload = json.loads(buffer)
+    except json.JSONDecodeError:
+        raise PrometheusResponseError("Truncated or malformed Prometheus response")
+    _raise_for_payload(payload)
+    raise PrometheusResponseError("Prometheus response has no result array")
+
+
+def _check_status(prefix: str):
+    """Fail fast if the part of the body before the result is not a success."""
+    match = re.search(r'"status"\s*:\s*"(\w+)"', prefix)
+    if match and match.group(1) != "success":
+        raise PrometheusResponseError(f"Prometheus query failed: {match.group(1)}")
+
+
+def _raise_for_payload(payload):
+    if isinstance(payload, dict) and payload.get("status") != "success":
+        raise PrometheusResponseError(
+            f"Prometheus query failed: {payload.get('error', 'Unknown error')}"
+        )
@@ -0,0 +1,76 @@
+"""Kubernetes resource quantity parsing.
+
+Implements the quantity grammar used by the API server::
+
+    <quantity>        ::= <signedNumber><suffix>
+    <suffix>          ::= <binarySI> | <decimalExponent> | <decimalSI>
+    <binarySI>        ::= Ki | Mi | Gi | Ti | Pi | Ei
+    <decimalSI>       ::= n | u | m | "" | k | M | G | T | P | E
+    <decimalExponent> ::= "e" <signedNumber> | "E" <signedNumber>
+
+Clusters reuse a small set of distinct quantity strings across thousands of
+containers, so parsed values are memoized per raw string.
+"""
+
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+QUANTITY_CACHE_SIZE = 4096
+
+_QUANTITY_RE = re.compile(
+    r"^([+-]?(?:\d+\.?\d*|\.\d+))"
+    r"(?:[eE]([+-]?\d+)|(Ki|Mi|Gi|Ti|Pi|Ei|[numkKMGTPE]))?$"
+)
+
+_SUFFIX_MULTIPLIERS = {
+    None: Decimal(1),
+    "n": Decimal("1e-9"),
+    "u": Decimal("1e-6"),
+    "m": Decimal("1e-3"),
+    "k": Decimal(1000),
+    "K": Decimal(1000),  # Not in the grammar, but accepted for compatibility
+    "M": Decimal(1000**2),
+    "G": Decimal(1000**3),
+    "T": Decimal(1000**4),
+    "P": Decimal(1000**5),
+    "E": Decimal(1000**6),
+    "Ki": Decimal(1024),
+    "Mi": Decimal(1024**2),
+    "Gi": Decimal(1024**3),
+    "Ti": Decimal(1024**4),
+    "Pi": Decimal(1024**5),
+    "Ei": Decimal(1024**6),
+}
+
+
+def parse_quantity(quantity: str) -> Decimal:
+    """Parse a quantity string into an exact decimal value."""
+    match = _QUANTITY_RE.match(str(quantity).strip())
+    if not match:
+        raise ValueError(f"Invalid Kubernetes quantity: {quantity!r}")
+
+    number, exponent, suffix = match.groups()
+    value = Decimal(number)
+    if exponent is not None:
+        return value.scaleb(int(exponent))
+
+    return value * _SUFFIX_MULTIPLIERS[suffix]
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def parse_cpu(quantity: str) -> float:
+    """Parse CPU resource string to cores."""
+    if not quantity:
+        return 0.0
+
+    return float(parse_quantity(quantity))
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def parse_memory(quantity: str) -> int:
+    """Parse memory resource string to bytes (fractional bytes truncated)."""
+    if not quantity:
+        return 0
+
+    return int(parse_quantity(quantity))
@@ -0,0 +1,315 @@
+"""Hourly and daily rollups of resource samples.
+
+Raw samples are aggregated per container into hourly buckets and hourly
+buckets into daily ones, so history can be kept longer than raw samples.
+Hourly buckets are aggregated by the database in one grouped query, and
+daily ones from the hourly buckets. Each run recomputes buckets from the
+newest rolled-up one onwards, since that one may have been incomplete, and
+upserts them.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import Integer, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from ..core.config import Settings, get_settings
+from ..core.database import SessionLocal, dialect_insert, engine
+from ..core.partitions import EPOCH, earliest_sample_time
+from ..models.database import DailyRollup, HourlyRollup, ResourceMetric
+
+logger = logging.getLogger(__name__)
+
+Tier = namedtuple("Tier", ["name", "step", "model", "retention"])
+
+# Taken from the last sample of a bucket
+LAST_FIELDS = (
+    "cpu_request_cores",
+    "memory_request_bytes",
+    "cpu_limit_cores",
+    "memory_limit_bytes",
+    "pod_phase",
+)
+
+
+def rollup_tiers(settings: Settings) -> List[Tier]:
+    """Storage tiers from finest to coarsest; raw samples have no rollup model."""
+    return [
+        Tier(
+            "raw",
+            timedelta(minutes=settings.collection_interval_minutes),
+            None,
+            timedelta(days=settings.retention_days),
+        ),
+        Tier(
+            "hourly",
+            timedelta(hours=1),
+            HourlyRollup,
+            timedelta(days=settings.rollup_hourly_retention_days),
+        ),
+        Tier(
+            "daily",
+            timedelta(days=1),
+            DailyRollup,
+            timedelta(days=settings.rollup_daily_retention_days),
+        ),
+    ]
+
+
+def select_tier(span: timedelta, settings: Settings) -> Tier:
+    """Coarsest tier covering span with at least rollup_min_points buckets.
+
+    Falls back to the finest covering tier when none has enough buckets, and
+    to the longest kept tier when none covers span.
+    """
+    tiers = rollup_tiers(settings)
+    if not settings.rollup_enabled:
+        tiers = tiers[:1]
+
+    covering = [tier for tier in tiers if tier.retention >= span]
+    if not covering:
+        return max(tiers, key=lambda tier: tier.retention)
+
+    for tier in reversed(covering):
+        if span / tier.step >= settings.rollup_min_points:
+            return tier
+    return covering[0]
+
+
+def percentile(values: Sequence, weights: Sequence[int], fraction: float = 0.95):
+    """Nearest-rank percentile of values, each counted weight times."""
+    pairs = sorted(zip(values, weights))
+    threshold = fraction * sum(weights)
+    cumulative = 0
+    for value, weight in pairs:
+        cumulative += weight
+        if cumulative >= threshold:
+            return value
+    return pairs[-1][0]
+
+
+def time_bucket(column, step: timedelta, dialect: str):
+    """Start of column's step-aligned bucket, in seconds since the epoch."""
+    seconds = int(step.total_seconds())
+    if dialect == "postgresql":
+        epoch = func.extract("epoch", column)
+    else:
+        epoch = func.strftime("%s", column)
+    return cast(epoch, Integer) // seconds * seconds
+
+
+def rollup_query(start: datetime, end: datetime, step: timedelta, dialect: str):
+    """Raw samples in [start, end) aggregated per container and bucket.
+
+    Window functions rank each bucket's samples, so the nearest-rank p95 and
+    the last sample's fields come out of the same GROUP BY as the sums.
+    """
+    timestamp = ResourceMetric.timestamp
+    bucket = time_bucket(timestamp, step, dialect)
+    group = (ResourceMetric.container_id, bucket)
+    cpu = func.coalesce(ResourceMetric.cpu_usage_cores, 0.0)
+    memory = func.coalesce(ResourceMetric.memory_usage_bytes, 0)
+    cpu_peak = ResourceMetric.cpu_usage_max_cores
+    memory_peak = ResourceMetric.memory_usage_max_bytes
+    samples = (
+        select(
+            ResourceMetric.container_id,
+            bucket.label("bucket"),
+            cpu.label("cpu"),
+            memory.label("memory"),
+            # Interval peaks count towards the maximum
+            case((cpu_peak > cpu, cpu_peak), else_=cpu).label("cpu_peak"),
+            case((memory_peak > memory, memory_peak), else_=memory).label(
+                "memory_peak"
+            ),
+            func.count().over(partition_by=group).label("count"),
+            func.row_number().over(partition_by=group, order_by=cpu).label("cpu_rank"),
+            func.row_number()
+            .over(partition_by=group, order_by=memory)
+            .label("memory_rank"),
+            func.row_number()
+            .over(partition_by=group, order_by=timestamp.desc())
+            .label("newest"),
+            *(getattr(ResourceMetric, field) for field in LAST_FIELDS),
+        )
+        .where(timestamp >= start, timestamp < end)
+        .subquery()
+    )
+
+    def p95(value, rank):
+        return func.min(case((rank >= 0.95 * samples.c.count, value)))
+
+    return select(
+        samples.c.container_id,
+        samples.c.bucket,
+        func.count().label("sample_count"),
+        func.min(samples.c.cpu).label("cpu_usage_min_cores"),
+        func.avg(samples.c.cpu).label("cpu_usage_avg_cores"),
+        p95(samples.c.cpu, samples.c.cpu_rank).label("cpu_usage_p95_cores"),
+        func.max(samples.c.cpu_peak).label("cpu_usage_max_cores"),
+        func.min(samples.c.memory).label("memory_usage_min_bytes"),
+        func.avg(samples.c.memory).label("memory_usage_avg_bytes"),
+        p95(samples.c.memory, samples.c.memory_rank).label("memory_usage_p95_bytes"),
+        func.max(samples.c.memory_peak).label("memory_usage_max_bytes"),
+        *(
+            func.max(case((samples.c.newest == 1, samples.c[field]))).label(field)
+            for field in LAST_FIELDS
+        ),
+    ).group_by(samples.c.container_id, samples.c.bucket)
+
+
+def rollup_buckets(buckets: Sequence) -> Dict:
+    """Aggregate one container's finer buckets, oldest first, into a bucket.
+
+    The p95 is taken over the finer buckets' p95s weighted by their sample
+    counts, which slightly overestimates the p95 of the samples.
+    """
+    counts = [bucket.sample_count for bucket in buckets]
+    count = sum(counts)
+
+    def average(field: str) -> float:
+        return sum(getattr(b, field) * b.sample_count for b in buckets) / count
+
+    return {
+        "sample_count": count,
+        "cpu_usage_min_cores": min(b.cpu_usage_min_cores for b in buckets),
+        "cpu_usage_avg_cores": average("cpu_usage_avg_cores"),
+        "cpu_usage_p95_cores": percentile(
+            [b.cpu_usage_p95_cores for b in buckets], counts
+        ),
+        "cpu_usage_max_cores": max(b.cpu_usage_max_cores for b in buckets),
+        "memory_usage_min_bytes": min(b.memory_usage_min_bytes for b in buckets),
+        "memory_usage_avg_bytes": int(average("memory_usage_avg_bytes")),
+        "memory_usage_p95_bytes": percentile(
+            [b.memory_usage_p95_bytes for b in buckets], counts
+        ),
+        "memory_usage_max_bytes": max(b.memory_usage_max_bytes for b in buckets),
+        **{field: getattr(buckets[-1], field) for field in LAST_FIELDS},
+    }
+
+
+class RollupService:
+    """Keep the hourly and daily rollup tiers up to date and expire them."""
+
+    def __init__(self, bind=engine):
+        self.settings = get_settings()
+        self.bind = bind
+        self.hourly, self.daily = rollup_tiers(self.settings)[1:]
+
+    def update(self, since: Optional[datetime] = None) -> Dict[str, int]:
+        """Run in a session of its own, logging errors instead of raising."""
+        db = SessionLocal(bind=self.bind)
+        try:
+            written = self.run(db, since=since)
+            db.commit()
+            logger.info(f"Updated rollups: {written}")
+            return written
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error updating rollups: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def run(
+        self,
+        db: Session,
+        now: Optional[datetime] = None,
+        since: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """Roll up new data and expire old buckets; returns rows written per tier.
+
+        since recomputes buckets from an earlier time, e.g. after history was
+        backfilled.
+        """
+        now = now or datetime.utcnow()
+
+        written = {
+            self.hourly.name: self._roll(
+                db,
+                self.hourly,
+                self._hourly_rollups,
+                earliest_sample_time(db),
+                since,
+                now,
+            ),
+        }
+        written[self.daily.name] = self._roll(
+            db,
+            self.daily,
+            self._daily_rollups,
+            db.query(func.min(HourlyRollup.bucket)).scalar(),
+            since,
+            now,
+        )
+
+        for tier in (self.hourly, self.daily):
+            db.query(tier.model).filter(
+                tier.model.bucket < now - tier.retention
+            ).delete(synchronize_session=False)
+        return written
+
+    def _roll(
+        self,
+        db: Session,
+        tier: Tier,
+        compute: Callable[[Session, datetime, datetime], List[Dict]],
+        earliest: Optional[datetime],
+        since: Optional[datetime],
+        now: datetime,
+    ) -> int:
+        """Recompute a tier's buckets from the newest one (or since) up to now."""
+        if earliest is None:
+            return 0
+
+        model = tier.model
+        start = db.query(func.max(model.bucket)).scalar() or earliest
+        if since is not None:
+            start = min(start, since)
+        # Buckets before the source's first row cannot be recomputed
+        start = max(start, earliest)
+        start -= (start - EPOCH) % tier.step
+        end = now - (now - EPOCH) % tier.step + tier.step
+
+        rows = compute(db, start, end)
+        if rows:
+            table = model.__table__
+            statement = dialect_insert(db.connection())(table)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[table.c.container_id, table.c.bucket],
+                    set_={name: statement.excluded[name] for name in rows[0]},
+                ),
+                rows,
+            )
+        return len(rows)
+
+    def _hourly_rollups(self, db: Session, start: datetime, end: datetime):
+        dialect = db.get_bind().dialect.name
+        rows = []
+        for row in db.execute(rollup_query(start, end, self.hourly.step, dialect)):
+            bucket = row._asdict()
+            bucket["bucket"] = EPOCH + timedelta(seconds=bucket["bucket"])
+            bucket["memory_usage_avg_bytes"] = int(bucket["memory_usage_avg_bytes"])
+            rows.append(bucket)
+        return rows
+
+    def _daily_rollups(self, db: Session, start: datetime, end: datetime):
+        columns = [
+            column for column in HourlyRollup.__table__.columns if column.name != "id"
+        ]
+        by_day: Dict[tuple, List] = {}
+        for row in (
+            db.query(*columns)
+            .filter(HourlyRollup.bucket >= start, HourlyRollup.bucket < end)
+            .order_by(HourlyRollup.bucket)
+        ):
+            day = row.bucket - (row.bucket - EPOCH) % self.daily.step
+            by_day.setdefault((row.container_id, day), []).append(row)
+        return [
+            {"container_id": container_id, "bucket": day, **rollup_buckets(rows)}
+            for (container_id, day), rows in by_day.items()
+        ]
@@ -0,0 +1,160 @@
+"""Namespace and cluster totals of a snapshot's containers.
+
+Totals are computed while a collection is written and stored as summary
+rows; filters they do not cover are summed by the database on request.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from ..models.database import CLUSTER_SUMMARY, ResourceMetric, ResourceSummary
+from .metric_writer import MetricRow
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_PHASES = ("Running", "Pending", "Unknown")
+
+# ResourceSummary column totalled from each MetricRow field
+TOTALS = {
+    "total_cpu_requests": "cpu_request_cores",
+    "total_memory_requests": "memory_request_bytes",
+    "total_cpu_limits": "cpu_limit_cores",
+    "total_memory_limits": "memory_limit_bytes",
+    "total_cpu_usage": "cpu_usage_cores",
+    "total_memory_usage": "memory_usage_bytes",
+}
+
+SummaryTotals = namedtuple("SummaryTotals", [*TOTALS, "total_containers", "total_pods"])
+
+
+class SummaryAccumulator:
+    """Totals of the active containers of one collection, per namespace.
+
+    Add rows as pages are written and write the totals in the same
+    transaction, so summaries always match the samples they describe. Pods
+    are counted per page, so memory stays bounded by the number of namespaces.
+    """
+
+    def __init__(self, excluded_namespaces: Iterable[str] = ()):
+        self.excluded_namespaces = set(excluded_namespaces)
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def add(self, rows: Iterable[MetricRow]):
+        """Add a page of rows; all of a pod's containers must be in one page."""
+        pods = set()
+        for row in rows:
+            if row.pod_phase not in ACTIVE_PHASES:
+                continue
+            totals = self._totals.get(row.namespace)
+            if totals is None:
+                totals = self._totals[row.namespace] = dict.fromkeys(
+                    [*TOTALS, "total_containers", "total_pods"], 0
+                )
+            for column, field in TOTALS.items():
+                totals[column] += getattr(row, field) or 0
+            totals["total_containers"] += 1
+            pods.add((row.namespace, row.pod_name))
+        for namespace, _ in pods:
+            self._totals[namespace]["total_pods"] += 1
+
+    def rows(self, timestamp: datetime) -> List[Dict]:
+        """Summary rows for every namespace plus the cluster row."""
+        cluster = dict.fromkeys([*TOTALS, "total_containers", "total_pods"], 0)
+        rows = []
+        for namespace, totals in sorted(self._totals.items()):
+            rows.append({"timestamp": timestamp, "namespace": namespace, **totals})
+            if namespace not in self.excluded_namespaces:
+                for column, value in totals.items():
+                    cluster[column] += value
+        rows.append({"timestamp": timestamp, "namespace": CLUSTER_SUMMARY, **cluster})
+        return rows
+
+    def write(self, db: Session, timestamp: datetime) -> int:
+        rows = self.rows(timestamp)
+        db.execute(insert(ResourceSummary), rows)
+        return len(rows)
+
+
+def snapshot_summary(
+    db: Session, timestamp: Optional[datetime], namespace: Optional[str] = None
+):
+    """Summary of one snapshot for a namespace or the whole cluster.
+
+    Returns None when the snapshot was not summarized, and an empty summary
+    when the namespace had no active containers in it.
+    """
+    if timestamp is None:
+        return None
+
+    summaries = {
+        summary.namespace: summary
+        for summary in db.query(ResourceSummary).filter(
+            ResourceSummary.timestamp == timestamp,
+            ResourceSummary.namespace.in_(
+                {CLUSTER_SUMMARY, namespace or CLUSTER_SUMMARY}
+            ),
+        )
+    }
+    if CLUSTER_SUMMARY not in summaries:
+        return None
+
+    summary = summaries.get(namespace or CLUSTER_SUMMARY)
+    if summary is None:
+        summary = ResourceSummary(
+            timestamp=timestamp,
+            namespace=namespace,
+            total_pods=0,
+            total_containers=0,
+            **dict.fromkeys(TOTALS, 0),
+        )
+    return summary
+
+
+def aggregate_summary(
+    db: Session,
+    timestamp: Optional[datetime],
+    excluded_namespaces: Iterable[str] = (),
+    search: Optional[str] = None,
+    namespace: Optional[str] = None,
+    phases: Iterable[str] = ACTIVE_PHASES,
+    by_namespace: bool = False,
+) -> Union[SummaryTotals, Dict[str, SummaryTotals]]:
+    """Totals of one snapshot's containers, summed by the database.
+
+    For filters the stored summaries cannot answer, such as a pod name
+    search. Returns the totals, or totals per namespace with by_namespace.
+    """
+    pod = ResourceMetric.namespace + "/" + ResourceMetric.pod_name
+    columns = [
+        *(
+            func.coalesce(func.sum(getattr(ResourceMetric, field)), 0)
+            for field in TOTALS.values()
+        ),
+        func.count(),
+        func.count(pod.distinct()),
+    ]
+    query = select(*columns).where(
+        ResourceMetric.timestamp == timestamp,
+        ResourceMetric.pod_phase.in_(list(phases)),
+        ResourceMetric.namespace.not_in(list(excluded_namespaces)),
+    )
+    if search:
+        query = query.where(ResourceMetric.pod_name.contains(search))
+    if namespace:
+        query = query.where(ResourceMetric.namespace == namespace)
+
+    if not by_namespace:
+        return SummaryTotals(*db.execute(query).one())
+
+    query = query.add_columns(ResourceMetric.namespace).group_by(
+        ResourceMetric.namespace
+    )
+    return {
+        row_namespace: SummaryTotals(*totals)
+        for *totals, row_namespace in db.execute(query)
+    }
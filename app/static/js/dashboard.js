@@ -402,31 +402,45 @@ function initializeCharts() {
     }
 }
 
+// Format an ISO bucket time in local time, with the date beyond one-day ranges
+function formatChartTime(timestamp, step) {
+    const date = new Date(timestamp);
+    const pad = value => String(value).padStart(2, '0');
+    const day = `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+    const time = `${pad(date.getHours())}:${pad(date.getMinutes())}`;
+    if (step >= 86400) return day;
+    if (step > 300) return `${day.slice(5)} ${time}`;
+    return time;
+}
+
 // Load and update chart data
 async function loadChartData() {
     try {
-        const response = await fetch('/api/chart-data?hours=24');
+        // No more points than the canvas has pixels across
+        const maxPoints = Math.max(3, Math.floor(cpuRequestsChart.width || 300));
+        const response = await fetch(`/api/chart-data?hours=24&max_points=${maxPoints}`);
         if (!response.ok) throw new Error('Failed to fetch chart data');
 
         const data = await response.json();
+        const labels = data.timestamps.map(timestamp => formatChartTime(timestamp, data.step));
 
         // Update CPU vs Requests chart
-        cpuRequestsChart.data.labels = data.timestamps;
+        cpuRequestsChart.data.labels = labels;
         cpuRequestsChart.data.datasets[0].data = data.cpu_usage_percentage_requests;
         cpuRequestsChart.update('none');
 
         // Update CPU vs Limits chart
-        cpuLimitsChart.data.labels = data.timestamps;
+        cpuLimitsChart.data.labels = labels;
         cpuLimitsChart.data.datasets[0].data = data.cpu_usage_percentage_limits;
         cpuLimitsChart.update('none');
 
         // Update Memory vs Requests chart
-        memoryRequestsChart.data.labels = data.timestamps;
+        memoryRequestsChart.data.labels = labels;
         memoryRequestsChart.data.datasets[0].data = data.memory_usage_percentage_requests;
         memoryRequestsChart.update('none');
 
         // Update Memory vs Limits chart
-        memoryLimitsChart.data.labels = data.timestamps;
+        memoryLimitsChart.data.labels = labels;
         memoryLimitsChart.data.datasets[0].data = data.memory_usage_percentage_limits;
         memoryLimitsChart.update('none');
 
@@ -0,0 +1,155 @@
+"""Measure dashboard request latency while collections are being written.
+
+Loads history into a throwaway SQLite file, then has concurrent clients
+request the dashboard and summary while collection cycles store snapshots
+and a liveness probe polls, all on one event loop as in the server. Run
+from the repository root:
+
+    python -m benchmarks.bench_dashboard_latency [--containers 5000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROUTES = ("/dashboard", "/api/summary", "/health/liveness")
+
+
+def make_pods(containers: int):
+    return [
+        {
+            "namespace": f"ns-{i % 50}",
+            "name": f"pod-{i}",
+            "node_name": f"node-{i % 100}",
+            "phase": "Running",
+            "containers": [
+                {
+                    "name": "app",
+                    "requests": {"cpu": 0.1, "memory": 128 * 1024**2},
+                    "limits": {"cpu": 0.5, "memory": 256 * 1024**2},
+                }
+            ],
+        }
+        for i in range(containers)
+    ]
+
+
+def load_history(containers: int, snapshots: int, start: datetime):
+    from app.core.database import SessionLocal
+    from app.services.metric_writer import MetricWriter
+
+    from .bench_metric_write import make_rows
+
+    db = SessionLocal()
+    writer = MetricWriter()
+    for index in range(snapshots):
+        writer.write(db, make_rows(containers, start + timedelta(minutes=5 * index)))
+    db.commit()
+    db.close()
+
+
+async def collect(collector, pods, until: float, cycles: list, errors: dict):
+    """Store snapshots back to back, as a long collection would."""
+    usage = {"cpu_usage": {}, "memory_usage": {}}
+    while time.perf_counter() < until:
+
+        async def pages():
+            for offset in range(0, len(pods), 1000):
+                await asyncio.sleep(0)  # Pages arrive from the API server
+                yield pods[offset : offset + 1000]
+
+        started = time.perf_counter()
+        collector.timings = {"store": 0.0}
+        timestamp = datetime.utcnow().replace(microsecond=0) + timedelta(
+            seconds=len(cycles)
+        )
+        try:
+            await collector._store_metrics(pages(), usage, timestamp, None)
+        except Exception:
+            errors["collection"] += 1
+        cycles.append(time.perf_counter() - started)
+
+
+async def request(client, route, until: float, latencies: list, errors, pause):
+    while time.perf_counter() < until:
+        started = time.perf_counter()
+        response = await client.get(route)
+        latencies.append(time.perf_counter() - started)
+        if response.is_error:
+            errors[route] += 1
+        await asyncio.sleep(pause)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(containers: int, clients: int, seconds: float):
+    import httpx
+
+    from app.main import app
+    from app.services.collector_service import ResourceCollectorService
+
+    collector = ResourceCollectorService()
+    pods = make_pods(containers)
+    latencies = {route: [] for route in ROUTES}
+    errors = dict.fromkeys([*ROUTES, "collection"], 0)
+    cycles = []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            until = time.perf_counter() + seconds
+            tasks = [collect(collector, pods, until, cycles, errors)]
+            for index in range(clients):
+                route = ROUTES[index % 2]
+                tasks.append(request(client, route, until, latencies[route], errors, 0))
+            route = ROUTES[2]
+            tasks.append(request(client, route, until, latencies[route], errors, 0.05))
+            await asyncio.gather(*tasks)
+
+    print(
+        f"{len(cycles)} collections of {containers} containers, "
+        f"{statistics.mean(cycles):.2f} s each, {errors['collection']} failed\n"
+    )
+    print(
+        f"{'route':<18} {'requests':>8} {'errors':>6} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for route, values in latencies.items():
+        print(
+            f"{route:<18} {len(values):>8} {errors[route]:>6} "
+            f"{percentile(values, 0.5) * 1000:>8.0f} "
+            f"{percentile(values, 0.99) * 1000:>8.0f} {max(values) * 1000:>8.0f}"
+        )
+
+
+def main(containers: int, snapshots: int, clients: int, seconds: float):
+    with tempfile.TemporaryDirectory() as directory:
+        # Settings are read on import, so point them at the scratch database
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+        os.environ["ENABLE_SCHEDULER"] = "false"
+        os.environ["BACKFILL_ON_STARTUP"] = "false"
+        from app.core.database import init_database
+
+        init_database()
+        start = datetime.utcnow() - timedelta(minutes=5 * snapshots)
+        load_history(containers, snapshots, start)
+        asyncio.run(run(containers, clients, seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=5000)
+    parser.add_argument("--snapshots", type=int, default=12)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    main(args.containers, args.snapshots, args.clients, args.seconds)
@@ -0,0 +1,73 @@
+"""Compare the ORM and bulk write paths for one collection snapshot.
+
+Writes into a throwaway SQLite file. Run from the repository root:
+
+    python -m benchmarks.bench_metric_write [--containers 50000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import init_database
+from app.services.metric_writer import MetricRow, MetricWriter
+
+
+def make_rows(containers: int, timestamp: datetime):
+    return [
+        MetricRow(
+            timestamp=timestamp,
+            namespace=f"ns-{i % 50}",
+            pod_name=f"pod-{i}",
+            container_name="app",
+            node_name=f"node-{i % 100}",
+            pod_phase="Running",
+            cpu_request_cores=0.1,
+            memory_request_bytes=128 * 1024**2,
+            cpu_limit_cores=0.5,
+            memory_limit_bytes=256 * 1024**2,
+            cpu_usage_cores=0.05,
+            memory_usage_bytes=90 * 1024**2,
+            cpu_usage_max_cores=0.2,
+            cpu_usage_p95_cores=0.1,
+            memory_usage_max_bytes=100 * 1024**2,
+            memory_usage_p95_bytes=95 * 1024**2,
+        )
+        for i in range(containers)
+    ]
+
+
+def main(containers: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        init_database(engine)
+        Session = sessionmaker(bind=engine)
+
+        print(f"{containers} containers per snapshot\n")
+        timestamp = datetime(2024, 1, 1)
+        for label in ("orm", "bulk"):
+            rows = make_rows(containers, timestamp)
+            writer = MetricWriter()
+            write = writer.write_orm if label == "orm" else writer.write
+
+            db = Session()
+            started = time.perf_counter()
+            write(db, rows)
+            db.commit()
+            elapsed = time.perf_counter() - started
+            db.close()
+
+            print(f"{label:<6} {elapsed:7.2f} s  {containers / elapsed:10.0f} rows/s")
+            timestamp += timedelta(minutes=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.containers)
@@ -0,0 +1,138 @@
+"""Compare pod list decoding through client models against the raw JSON path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pod_decode [--pods 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import orjson
+from kubernetes_asyncio import client
+
+from app.services.kubernetes_service import KubernetesService
+
+
+def make_pod(index: int) -> dict:
+    """Build a realistic pod object with two containers."""
+    namespace = f"team-{index % 50}"
+    name = f"app-{index // 3}-7d9f8b6c5-{index:05d}"
+    containers = []
+    for suffix, cpu, memory in (("app", "250m", "512Mi"), ("sidecar", "50m", "64Mi")):
+        containers.append(
+            {
+                "name": suffix,
+                "image": f"registry.example.com/{namespace}/{suffix}:1.2.3",
+                "ports": [{"containerPort": 8080, "protocol": "TCP"}],
+                "env": [{"name": f"VAR_{i}", "value": str(i)} for i in range(5)],
+                "resources": {
+                    "requests": {"cpu": cpu, "memory": memory},
+                    "limits": {"cpu": "1", "memory": "1Gi"},
+                },
+                "volumeMounts": [
+                    {"name": "token", "mountPath": "/var/run/secrets", "readOnly": True}
+                ],
+            }
+        )
+
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "uid": f"00000000-0000-0000-0000-{index:012d}",
+            "resourceVersion": str(100000 + index),
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": {"app": f"app-{index // 3}", "pod-template-hash": "7d9f8b6c5"},
+            "annotations": {"prometheus.io/scrape": "true"},
+            "ownerReferences": [
+                {
+                    "apiVersion": "apps/v1",
+                    "kind": "ReplicaSet",
+                    "name": f"app-{index // 3}-7d9f8b6c5",
+                    "uid": "11111111-1111-1111-1111-111111111111",
+                    "controller": True,
+                }
+            ],
+        },
+        "spec": {
+            "nodeName": f"node-{index % 200}",
+            "containers": containers,
+            "volumes": [{"name": "token", "projected": {"sources": []}}],
+        },
+        "status": {
+            "phase": "Running",
+            "podIP": "10.0.0.1",
+            "conditions": [
+                {"type": "Ready", "status": "True"},
+                {"type": "ContainersReady", "status": "True"},
+            ],
+            "containerStatuses": [
+                {
+                    "name": c["name"],
+                    "ready": True,
+                    "restartCount": 0,
+                    "image": c["image"],
+                    "imageID": "sha256:abc",
+                    "state": {"running": {"startedAt": "2024-01-01T00:00:05Z"}},
+                }
+                for c in containers
+            ],
+        },
+    }
+
+
+def make_payload(pods: int) -> bytes:
+    return json.dumps(
+        {
+            "kind": "PodList",
+            "apiVersion": "v1",
+            "metadata": {"resourceVersion": "999999"},
+            "items": [make_pod(i) for i in range(pods)],
+        }
+    ).encode()
+
+
+def bench(label: str, func, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<12} {best:8.3f}s  ({len(result)} pods)")
+    return best, result
+
+
+async def main(pods: int):
+    payload = make_payload(pods)
+    print(f"Synthetic PodList: {pods} pods, {len(payload) / 1024**2:.1f} MiB\n")
+
+    service = KubernetesService()
+    api_client = client.ApiClient()
+
+    def model_path():
+        pods_list = api_client.deserialize(
+            SimpleNamespace(data=payload.decode()), "V1PodList"
+        )
+        return [service._pod_to_dict(pod) for pod in pods_list.items]
+
+    def raw_path():
+        data = orjson.loads(payload)
+        return [service._raw_pod_to_dict(item) for item in data["items"]]
+
+    model, model_pods = bench("model path", model_path, repeat=1)
+    raw, raw_pods = bench("raw path", raw_path)
+    assert [p["containers"] for p in model_pods] == [p["containers"] for p in raw_pods]
+    print(f"\nspeedup: {model / raw:.1f}x")
+
+    await api_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pods", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.pods))
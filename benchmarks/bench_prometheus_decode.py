@@ -0,0 +1,103 @@
+"""Compare whole-body and streaming decoding of a large Prometheus response.
+
+Builds a recorded-style instant-vector response (200k series by default),
+then replays it in 64 KiB chunks through both decoders, measuring wall time
+and peak Python heap allocations with tracemalloc.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_prometheus_decode [--series 200000]
+    python -m benchmarks.bench_prometheus_decode --response recorded.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.services.prometheus_stream import CHUNK_SIZE, iter_vector_series
+
+
+def make_response(series: int) -> bytes:
+    result = [
+        {
+            "metric": {
+                "container": f"container-{i % 4}",
+                "namespace": f"team-{i % 120}",
+                "pod": f"workload-{i // 4}-5f7c9d8b4-{i % 9973:05d}",
+            },
+            "value": [1700000000.123, f"{(i % 997) / 1000:.6f}"],
+        }
+        for i in range(series)
+    ]
+    return json.dumps(
+        {"status": "success", "data": {"resultType": "vector", "result": result}}
+    ).encode()
+
+
+async def replay(payload: bytes):
+    view = memoryview(payload)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield bytes(view[start : start + CHUNK_SIZE])
+
+
+async def whole_body(payload: bytes) -> dict:
+    """The previous path: read everything, json-parse, build f-string keys."""
+    body = b"".join([chunk async for chunk in replay(payload)])
+    data = json.loads(body.decode())["data"]
+    usage = {}
+    for result in data["result"]:
+        metric = result["metric"]
+        namespace = metric.get("namespace", "")
+        pod = metric.get("pod", "")
+        container = metric.get("container", "")
+        if namespace and pod and container:
+            usage[f"{namespace}/{pod}/{container}"] = float(result["value"][1])
+    return usage
+
+
+async def streaming(payload: bytes) -> dict:
+    usage = {}
+    async for namespace, pod, container, value in iter_vector_series(replay(payload)):
+        if namespace and pod and container:
+            usage[(namespace, pod, container)] = float(value)
+    return usage
+
+
+def measure(label: str, decode, payload: bytes):
+    start = time.perf_counter()
+    usage = asyncio.run(decode(payload))
+    elapsed = time.perf_counter() - start
+    del usage
+
+    tracemalloc.start()
+    usage = asyncio.run(decode(payload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:<12} {elapsed:7.2f}s  peak {peak / 1024**2:7.1f} MiB  "
+        f"({len(usage)} series)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, default=200000)
+    parser.add_argument("--response", help="Recorded /api/v1/query response body")
+    args = parser.parse_args()
+
+    if args.response:
+        with open(args.response, "rb") as f:
+            payload = f.read()
+    else:
+        payload = make_response(args.series)
+    print(f"Response body: {len(payload) / 1024**2:.1f} MiB\n")
+
+    measure("whole body", whole_body, payload)
+    measure("streaming", streaming, payload)
+
+
+if __name__ == "__main__":
+    main()
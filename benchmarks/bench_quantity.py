@@ -0,0 +1,91 @@
+"""Micro-benchmark the memoized quantity parser against the previous parsers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_quantity [--containers 50000]
+"""
+
+import argparse
+import random
+import timeit
+
+from app.services.quantity import parse_cpu, parse_memory
+
+CPU_QUANTITIES = ["10m", "50m", "100m", "250m", "500m", "1", "2", "1500m", "4"]
+MEMORY_QUANTITIES = ["64Mi", "128Mi", "256Mi", "512Mi", "1Gi", "2Gi", "1G", "750M"]
+
+
+def legacy_parse_cpu(cpu_str: str) -> float:
+    """KubernetesService._parse_cpu before the quantity module."""
+    if not cpu_str or cpu_str == "0":
+        return 0.0
+
+    if cpu_str.endswith("m"):
+        return float(cpu_str[:-1]) / 1000
+    elif cpu_str.endswith("u"):
+        return float(cpu_str[:-1]) / 1000000
+    else:
+        return float(cpu_str)
+
+
+def legacy_parse_memory(memory_str: str) -> int:
+    """KubernetesService._parse_memory before the quantity module."""
+    if not memory_str or memory_str == "0":
+        return 0
+
+    multipliers = {
+        "Ki": 1024,
+        "Mi": 1024**2,
+        "Gi": 1024**3,
+        "Ti": 1024**4,
+        "Pi": 1024**5,
+        "Ei": 1024**6,
+        "K": 1000,
+        "M": 1000**2,
+        "G": 1000**3,
+        "T": 1000**4,
+        "P": 1000**5,
+        "E": 1000**6,
+    }
+
+    for suffix, multiplier in multipliers.items():
+        if memory_str.endswith(suffix):
+            return int(float(memory_str[: -len(suffix)]) * multiplier)
+
+    if memory_str.endswith("m"):
+        return int(float(memory_str[:-1]) / 1000)
+
+    return int(memory_str)
+
+
+def main(containers: int):
+    rng = random.Random(42)
+    cpu = [rng.choice(CPU_QUANTITIES) for _ in range(containers * 2)]
+    memory = [rng.choice(MEMORY_QUANTITIES) for _ in range(containers * 2)]
+
+    def legacy():
+        for value in cpu:
+            legacy_parse_cpu(value)
+        for value in memory:
+            legacy_parse_memory(value)
+
+    def memoized():
+        for value in cpu:
+            parse_cpu(value)
+        for value in memory:
+            parse_memory(value)
+
+    print(f"{containers} containers, requests + limits per container\n")
+    for label, func in (("legacy", legacy), ("memoized", memoized)):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{label:<10} {best * 1000:8.1f} ms per collection cycle")
+
+    print(f"\ncpu cache:    {parse_cpu.cache_info()}")
+    print(f"memory cache: {parse_memory.cache_info()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.containers)
@@ -0,0 +1,116 @@
+"""Compare expiring one day of samples by batched DELETE and by partition drop.
+
+Loads the same history into a plain samples table, expired the way cleanup
+used to (1000 ids per DELETE and commit), and into daily partitions, expired
+by dropping the oldest one. Run from the repository root:
+
+    python -m benchmarks.bench_retention [--containers 1000] [--days 3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import init_database
+from app.core.partitions import SamplePartitions
+from app.models.database import Base, Container, ResourceSample
+from app.services.metric_writer import SAMPLE_COLUMNS, MetricWriter
+
+from .bench_metric_write import make_rows
+
+SNAPSHOTS_PER_DAY = 288
+
+
+def load(engine, partitioned, containers, days, start):
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    writer = MetricWriter(partitions=SamplePartitions(days=1))
+    samples = ResourceSample.__table__
+
+    for index in range(days * SNAPSHOTS_PER_DAY):
+        rows = make_rows(containers, start + timedelta(minutes=5 * index))
+        if partitioned:
+            writer.write(db, rows)
+        else:
+            ids = writer.containers.resolve(db.connection(), rows)
+            db.execute(
+                insert(samples),
+                [
+                    {
+                        "container_id": container_id,
+                        **{name: getattr(row, name) for name in SAMPLE_COLUMNS},
+                    }
+                    for container_id, row in zip(ids, rows)
+                ],
+            )
+    db.commit()
+    db.close()
+
+
+def expire_by_delete(engine, cutoff):
+    samples = ResourceSample.__table__
+    with engine.connect() as connection:
+        while True:
+            ids = connection.execute(
+                select(samples.c.id).where(samples.c.timestamp < cutoff).limit(1000)
+            ).all()
+            ids = [id_ for (id_,) in ids]
+            if not ids:
+                break
+            connection.execute(delete(samples).where(samples.c.id.in_(ids)))
+            connection.commit()
+
+
+def expire_by_drop(engine, cutoff):
+    with engine.begin() as connection:
+        SamplePartitions(days=1).drop_before(connection, cutoff)
+
+
+def free_pages(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("PRAGMA freelist_count")).scalar()
+
+
+def main(containers: int, days: int):
+    start = datetime(2024, 1, 1)
+    cutoff = start + timedelta(days=1)
+    print(f"{containers} containers x {days} days, expiring the first day\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, partitioned in (("delete", False), ("partition", True)):
+            path = os.path.join(directory, f"{label}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            if partitioned:
+                init_database(engine)
+            else:
+                Base.metadata.create_all(
+                    engine, tables=[Container.__table__, ResourceSample.__table__]
+                )
+            load(engine, partitioned, containers, days, start)
+
+            started = time.perf_counter()
+            if partitioned:
+                expire_by_drop(engine, cutoff)
+            else:
+                expire_by_delete(engine, cutoff)
+            elapsed = time.perf_counter() - started
+
+            size = os.path.getsize(path) / 1024**2
+            print(
+                f"{label:<10} {elapsed:7.2f} s   file {size:6.1f} MiB   "
+                f"{free_pages(engine)} free pages"
+            )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=3)
+    args = parser.parse_args()
+    main(args.containers, args.days)
@@ -0,0 +1,125 @@
+"""Compare dashboard-style reads during bulk writes with and without the profile.
+
+For each profile, snapshots are first written alone, then again while
+reader threads repeatedly total the latest snapshot through the samples
+view.
+"default" is SQLite's rollback journal with synchronous=FULL on a single
+engine; "profile" is the configured WAL profile with a read-only reader
+engine. Run from the repository root:
+
+    python -m benchmarks.bench_sqlite_profile [--containers 20000]
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings
+from app.core.database import create_database_engine, init_database
+from app.models.database import ResourceMetric
+from app.services.metric_writer import MetricWriter
+
+from .bench_metric_write import make_rows
+
+PROFILES = {
+    "default": Settings(
+        sqlite_journal_mode="delete",
+        sqlite_synchronous="full",
+        sqlite_cache_size_mb=2,
+        sqlite_mmap_size_mb=0,
+        sqlite_temp_store="default",
+    ),
+    "profile": Settings(),
+}
+
+
+def write(engine, containers: int, snapshots: int, start: datetime, seconds: list):
+    db = sessionmaker(bind=engine)()
+    writer = MetricWriter()
+    for index in range(snapshots):
+        rows = make_rows(containers, start + timedelta(minutes=5 * index))
+        started = time.perf_counter()
+        writer.write(db, rows)
+        db.commit()
+        seconds.append(time.perf_counter() - started)
+    db.close()
+
+
+def read(engine, done: threading.Event, latencies: list, errors: list):
+    latest = select(func.max(ResourceMetric.timestamp)).scalar_subquery()
+    query = select(func.count(), func.sum(ResourceMetric.cpu_usage_cores)).where(
+        ResourceMetric.timestamp == latest
+    )
+    while not done.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(query).one()
+        except Exception:
+            errors.append(1)
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(containers: int, snapshots: int, readers: int):
+    start = datetime(2024, 1, 1)
+    print(
+        f"{snapshots} snapshots of {containers} containers, {readers} readers\n\n"
+        f"{'profile':<8} {'alone s':>8} {'write s':>8} {'reads':>6} {'errors':>6} "
+        f"{'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}"
+    )
+
+    for label, settings in PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{directory}/bench.db"
+            writer_engine = create_database_engine(url, settings)
+            if label == "default":
+                reader_engine = writer_engine
+            else:
+                reader_engine = create_database_engine(url, settings, read_only=True)
+            init_database(writer_engine)
+            alone = []
+            write(writer_engine, containers, snapshots, start, alone)
+
+            done = threading.Event()
+            latencies, errors, seconds = [], [], []
+            threads = [
+                threading.Thread(
+                    target=read, args=(reader_engine, done, latencies, errors)
+                )
+                for _ in range(readers)
+            ]
+            for thread in threads:
+                thread.start()
+            later = start + timedelta(minutes=5 * snapshots)
+            write(writer_engine, containers, snapshots, later, seconds)
+            done.set()
+            for thread in threads:
+                thread.join()
+
+            print(
+                f"{label:<8} {sum(alone):>8.2f} {sum(seconds):>8.2f} {len(latencies):>6} "
+                f"{len(errors):>6} {percentile(latencies, 0.5) * 1000:>7.0f} "
+                f"{percentile(latencies, 0.99) * 1000:>7.0f} "
+                f"{max(latencies) * 1000:>7.0f}"
+            )
+            reader_engine.dispose()
+            writer_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=20000)
+    parser.add_argument("--snapshots", type=int, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+    main(args.containers, args.snapshots, args.readers)
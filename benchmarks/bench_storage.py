@@ -0,0 +1,104 @@
+"""Compare the wide legacy table with normalized containers + samples.
+
+Loads the same history, with realistic pod names, into two throwaway SQLite
+files and reports file size and the time of the chart-data query (as the
+route ran it before and after normalization). Run from the repository root:
+
+    python -m benchmarks.bench_storage [--containers 2000] [--hours 24]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import get_settings
+from app.core.database import init_database
+from app.models.database import LegacyBase, LegacyResourceMetric
+from app.services.chart_service import chart_data
+from app.services.metric_writer import MetricWriter
+from app.services.rollup_service import rollup_tiers
+
+from .bench_metric_write import make_rows
+
+ACTIVE_PHASES = ["Running", "Pending", "Unknown"]
+EXCLUDED = ["kube-system"]
+
+
+def realistic_rows(containers, timestamp):
+    return [
+        row._replace(
+            namespace=f"team-{index % 40}-production",
+            pod_name=f"service-{index // 3}-deployment-7d9f8b6c4-{index:05x}",
+            container_name=("app", "istio-proxy", "log-shipper")[index % 3],
+            node_name=f"ip-10-0-{index % 64}-{index % 250}.ec2.internal",
+        )
+        for index, row in enumerate(make_rows(containers, timestamp))
+    ]
+
+
+def wide_chart_query(db, start):
+    """The chart-data query before normalization."""
+    return (
+        db.query(LegacyResourceMetric)
+        .filter(
+            LegacyResourceMetric.timestamp >= start,
+            LegacyResourceMetric.pod_phase.in_(ACTIVE_PHASES),
+            ~LegacyResourceMetric.namespace.in_(EXCLUDED),
+        )
+        .order_by(LegacyResourceMetric.timestamp)
+    )
+
+
+def load(path, wide, containers, snapshots, start):
+    engine = create_engine(f"sqlite:///{path}")
+    init_database(engine)
+    LegacyBase.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    writer = MetricWriter()
+    for index in range(snapshots):
+        rows = realistic_rows(containers, start + timedelta(minutes=5 * index))
+        if wide:
+            db.execute(insert(LegacyResourceMetric), [row._asdict() for row in rows])
+        else:
+            writer.write(db, rows)
+    db.commit()
+
+    started = time.perf_counter()
+    if wide:
+        wide_chart_query(db, start).all()
+    else:
+        # Raw samples, one bucket per snapshot like the wide rows
+        raw = rollup_tiers(get_settings())[0]
+        chart_data(db, raw, start, raw.step, EXCLUDED)
+    scan = time.perf_counter() - started
+
+    db.close()
+    engine.dispose()
+    return os.path.getsize(path), scan
+
+
+def main(containers: int, hours: int):
+    snapshots = hours * 12
+    start = datetime(2024, 1, 1)
+    print(f"{containers} containers x {snapshots} snapshots\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, wide in (("wide", True), ("normalized", False)):
+            path = os.path.join(directory, f"{label}.db")
+            size, scan = load(path, wide, containers, snapshots, start)
+            print(f"{label:<11} {size / 1024**2:8.1f} MiB   chart scan {scan:6.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=2000)
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+    main(args.containers, args.hours)
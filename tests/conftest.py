@@ -0,0 +1,54 @@
+"""Shared test helpers: a metric row factory and in-memory database fixtures"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import init_database
+from app.services.metric_writer import MetricRow
+
+# One running container with requests, no limits and no interval peaks
+ROW_DEFAULTS = {
+    "namespace": "ns",
+    "pod_name": "pod",
+    "container_name": "app",
+    "node_name": None,
+    "pod_phase": "Running",
+    "cpu_request_cores": 0.5,
+    "memory_request_bytes": 1024,
+    "cpu_limit_cores": None,
+    "memory_limit_bytes": None,
+    "cpu_usage_cores": 0.05,
+    "memory_usage_bytes": 512,
+    "cpu_usage_max_cores": None,
+    "cpu_usage_p95_cores": None,
+    "memory_usage_max_bytes": None,
+    "memory_usage_p95_bytes": None,
+}
+
+
+def metric_row(timestamp, **fields) -> MetricRow:
+    """A container's row at timestamp, with fields replacing ROW_DEFAULTS"""
+    return MetricRow(timestamp=timestamp, **{**ROW_DEFAULTS, **fields})
+
+
+@pytest.fixture
+def engine():
+    """A fresh in-memory database, shared by every connection and thread"""
+    memory_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    init_database(memory_engine)
+    yield memory_engine
+    memory_engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """A session on the engine fixture's database"""
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
@@ -0,0 +1,140 @@
+"""Backfill service tests"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import init_database
+from app.models.database import ResourceMetric
+from app.services.backfill_service import BackfillService, plan_chunks
+
+NAMESPACE = "backfill-test"
+
+
+class FakeKubernetes:
+    async def get_all_pods(self):
+        container = {
+            "name": "app",
+            "requests": {"cpu": 0.1, "memory": 64 * 1024**2},
+            "limits": {"cpu": 0.5, "memory": 128 * 1024**2},
+        }
+        return [
+            {
+                "namespace": NAMESPACE,
+                "name": "pod",
+                "phase": "Running",
+                "containers": [container],
+            }
+        ]
+
+
+def make_engine():
+    # Chunks are written from worker threads
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    init_database(engine)
+    return engine
+
+
+def make_service(engine):
+    service = BackfillService(kubernetes_service=FakeKubernetes(), bind=engine)
+    queries = []
+
+    async def fake_stream(query, start, end, step):
+        queries.append((start, end))
+        values = []
+        moment = start
+        while moment <= end:
+            values.append([(moment - datetime(1970, 1, 1)).total_seconds(), "0.25"])
+            moment += step
+        yield NAMESPACE, "pod", "app", values
+        yield NAMESPACE, "gone", "app", values  # No current spec: dropped
+
+    service.prometheus_service.stream_matrix = fake_stream
+    return service, queries
+
+
+def test_plan_chunks_are_aligned_and_cover_range():
+    """Test chunks are epoch-aligned so they match between runs"""
+    start = datetime(2024, 1, 1, 5, 30)
+    end = datetime(2024, 1, 1, 20, 0)
+
+    chunks = plan_chunks(start, end, timedelta(hours=6))
+
+    assert chunks[0] == (datetime(2024, 1, 1), datetime(2024, 1, 1, 6))
+    assert chunks[-1] == (datetime(2024, 1, 1, 18), datetime(2024, 1, 2))
+    assert len(chunks) == 4
+
+
+def test_backfill_is_resumable_and_idempotent():
+    """Test a second run loads nothing and only current containers are kept"""
+    engine = make_engine()
+    service, queries = make_service(engine)
+    threads = []
+    write_chunk = service._write_chunk
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return write_chunk(*args, **kwargs)
+
+    service._write_chunk = record_thread
+
+    first = asyncio.run(service.run())
+    second_service, second_queries = make_service(engine)
+    second = asyncio.run(second_service.run())
+
+    db = sessionmaker(bind=engine)()
+    rows = db.query(ResourceMetric).all()
+    timestamps = [row.timestamp for row in rows]
+    assert {row.pod_name for row in rows} == {"pod"}
+    # The current spec is backdated over the loaded history
+    assert {row.cpu_request_cores for row in rows} == {0.1}
+    db.close()
+
+    assert first["rows"] > 0
+    assert first["failed"] == 0
+    # Chunks are written off the event loop
+    assert threads and threading.get_ident() not in threads
+    assert len(timestamps) == len(set(timestamps)) == first["rows"]
+    assert second["rows"] == 0
+    # Only the chunk still in progress is fetched again
+    assert second["skipped"] == first["chunks"] - 1
+    assert len(second_queries) == 2
+
+
+def test_chunks_in_memory_are_bounded_by_concurrency():
+    """Test fetched chunks wait for their write within the concurrency limit"""
+    service, _ = make_service(make_engine())
+    service.settings = service.settings.model_copy(update={"backfill_concurrency": 2})
+    held = []
+    peak = []
+    fetch_chunk, write_chunk = service._fetch_chunk, service._write_chunk
+
+    async def fetch(*args):
+        samples = await fetch_chunk(*args)
+        held.append(samples)
+        peak.append(len(held))
+        return samples
+
+    def slow_write(*args, **kwargs):
+        # Writes fall behind the fetches
+        time.sleep(0.01)
+        rows = write_chunk(*args, **kwargs)
+        held.pop()
+        return rows
+
+    service._fetch_chunk = fetch
+    service._write_chunk = slow_write
+
+    result = asyncio.run(service.run())
+
+    assert result["chunks"] > 2 and result["failed"] == 0
+    assert max(peak) == 2
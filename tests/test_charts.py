@@ -0,0 +1,136 @@
+"""Chart data tests"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core.config import Settings
+from app.services.chart_service import chart_data, lttb, minmax, select_step
+from app.services.metric_writer import MetricWriter
+from app.services.rollup_service import RollupService, rollup_tiers
+
+from .conftest import metric_row
+
+START = datetime(2024, 3, 1, 0, 0)
+RAW, HOURLY, _ = rollup_tiers(Settings())
+
+
+def make_row(timestamp, namespace, pod_name, cpu):
+    return metric_row(
+        timestamp,
+        namespace=namespace,
+        pod_name=pod_name,
+        memory_request_bytes=1024**3,
+        cpu_usage_cores=cpu,
+        memory_usage_bytes=1024**3 // 2,
+    )
+
+
+def test_select_step_fits_range_and_tier():
+    """Test automatic steps stay within the point budget and the tier step"""
+    assert select_step(timedelta(hours=24), RAW.step) == timedelta(minutes=5)
+    assert select_step(timedelta(days=7), RAW.step) == timedelta(hours=1)
+    assert select_step(timedelta(hours=24), HOURLY.step) == timedelta(hours=1)
+    assert select_step(timedelta(days=90), HOURLY.step) == timedelta(hours=12)
+
+
+def test_chart_buckets_average_snapshots_per_namespace(engine, db):
+    """Test one grouped query yields per-snapshot totals at any step"""
+
+    # Two hours of 5-minute snapshots: 3 containers in two namespaces
+    writer = MetricWriter()
+    for index in range(24):
+        timestamp = START + timedelta(minutes=5 * index)
+        writer.write(
+            db,
+            [
+                make_row(timestamp, "shop", "web", 0.1),
+                make_row(timestamp, "shop", "api", 0.2),
+                make_row(timestamp, "data", "db", 0.3),
+            ],
+        )
+    db.commit()
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    hourly = chart_data(db, RAW, START, timedelta(hours=1))
+    assert len(statements) == 1
+
+    assert hourly["step"] == 3600
+    assert hourly["timestamps"] == ["2024-03-01T00:00:00Z", "2024-03-01T01:00:00Z"]
+    assert hourly["cpu_usage_absolute"] == [0.6, 0.6]
+    assert hourly["cpu_usage_percentage_requests"] == [40.0, 40.0]
+    assert hourly["memory_usage_absolute"] == [1.5, 1.5]
+    assert hourly["memory_usage_percentage_requests"] == [50.0, 50.0]
+    assert hourly["cpu_usage_percentage_limits"] == [0, 0]
+    assert hourly["namespaces"] == {
+        "data": {"cpu_usage_absolute": [0.3, 0.3], "memory_usage_absolute": [0.5, 0.5]},
+        "shop": {"cpu_usage_absolute": [0.3, 0.3], "memory_usage_absolute": [1.0, 1.0]},
+    }
+
+    fine = chart_data(db, RAW, START, timedelta(minutes=5))
+    assert len(fine["timestamps"]) == 24
+    assert fine["cpu_usage_absolute"] == [0.6] * 24
+
+    # The hourly rollup tier gives the same totals
+    RollupService().run(db, now=START + timedelta(hours=3))
+    rolled = chart_data(db, HOURLY, START, timedelta(hours=1))
+    assert rolled["timestamps"] == hourly["timestamps"]
+    assert rolled["cpu_usage_absolute"] == pytest.approx(hourly["cpu_usage_absolute"])
+    assert rolled["namespaces"] == hourly["namespaces"]
+
+
+def test_downsampling_keeps_endpoints_and_peaks():
+    """Test LTTB and the min/max envelope both keep a one-point spike"""
+    x = list(range(1000))
+    cpu = [1.0] * 1000
+    cpu[437] = 9.0
+    memory = [float(index % 7) for index in x]
+
+    kept = lttb(x, [cpu], 50).tolist()
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert kept == sorted(kept)
+    assert 437 in kept
+
+    envelope_x, (envelope_cpu, envelope_memory) = minmax(x, [cpu, memory], 50)
+    assert len(envelope_x) == len(envelope_cpu) == len(envelope_memory) == 50
+    assert max(envelope_cpu) == 9.0
+    assert min(envelope_memory) == 0 and max(envelope_memory) == 6
+
+    assert lttb(x[:10], [cpu[:10]], 50).tolist() == list(range(10))
+
+
+def test_chart_data_downsamples_all_series_to_max_points(db):
+    """Test every series shares the downsampled timestamps"""
+    writer = MetricWriter()
+    for index in range(100):
+        timestamp = START + timedelta(minutes=5 * index)
+        cpu = 2.0 if index == 61 else 0.1
+        writer.write(
+            db,
+            [
+                make_row(timestamp, "shop", "web", cpu),
+                make_row(timestamp, "data", "db", 0.1),
+            ],
+        )
+    db.commit()
+
+    for mode in ("lttb", "minmax"):
+        data = chart_data(
+            db, RAW, START, timedelta(minutes=5), max_points=20, mode=mode
+        )
+        assert data["downsampled"]
+        assert len(data["timestamps"]) == 20
+        assert data["timestamps"][0] == "2024-03-01T00:00:00Z"
+        assert max(data["cpu_usage_absolute"]) == 2.1
+        for series in data["namespaces"].values():
+            assert len(series["cpu_usage_absolute"]) == 20
+        assert max(data["namespaces"]["shop"]["cpu_usage_absolute"]) == 2.0
+
+    full = chart_data(db, RAW, START, timedelta(minutes=5), max_points=500)
+    assert not full["downsampled"]
+    assert len(full["timestamps"]) == 100
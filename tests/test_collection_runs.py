@@ -0,0 +1,36 @@
+"""Collection run tests"""
+
+from datetime import datetime
+
+from app.models.database import CollectionRun
+from app.services.collection_runs import (
+    complete_run,
+    fail_run,
+    latest_run,
+    snapshot_time,
+    start_run,
+)
+
+FIRST = datetime(2030, 1, 1, 12, 0)
+SECOND = datetime(2030, 1, 1, 12, 5)
+
+
+def test_reads_are_pinned_to_latest_completed_run(engine, db):
+    """Test a run in progress or failed does not move the snapshot"""
+
+    first = start_run(FIRST, engine)
+    complete_run(db, first, pods=2, rows_written=3)
+    db.commit()
+    assert snapshot_time(db) == FIRST
+
+    second = start_run(SECOND, engine)
+    assert snapshot_time(db) == FIRST
+
+    fail_run(second, engine)
+    db.expire_all()
+    assert snapshot_time(db) == FIRST
+    assert db.get(CollectionRun, second).status == "failed"
+
+    run = latest_run(db)
+    assert (run.id, run.pods, run.rows_written) == (first, 2, 3)
+    assert run.finished_at is not None
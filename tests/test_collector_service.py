@@ -0,0 +1,125 @@
+"""Collector service tests"""
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import init_database, write_lock
+from app.models.database import CollectionRun, ResourceMetric
+from app.services import collector_service
+from app.services.collector_service import ResourceCollectorService
+from app.services.metric_writer import MetricWriter
+
+
+class FailingPrometheus:
+    """Prometheus client whose usage query fails once the loop has run a bit."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def get_all_usage_metrics(self, time=None):
+        for _ in range(3):
+            await asyncio.sleep(0)
+        raise RuntimeError("Prometheus unavailable")
+
+
+class Prometheus(FailingPrometheus):
+    async def get_all_usage_metrics(self, time=None):
+        return {"cpu_usage": {}, "memory_usage": {}}
+
+
+def make_pod(name):
+    resources = {"cpu": 0.1, "memory": 1024}
+    container = {"name": "app", "requests": resources, "limits": resources}
+    return {
+        "namespace": "ns",
+        "name": name,
+        "phase": "Running",
+        "containers": [container],
+    }
+
+
+def make_service(pages):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    init_database(engine)
+    service = ResourceCollectorService(FailingPrometheus(), bind=engine)
+    closed = []
+
+    async def iter_pod_pages():
+        try:
+            for page in pages:
+                yield page
+            # The rest of the list is still in flight
+            await asyncio.Event().wait()
+        finally:
+            closed.append(True)
+
+    service.k8s_service.iter_pod_pages = iter_pod_pages
+    return service, engine, closed
+
+
+@pytest.mark.parametrize("pages", [[], [[{"name": "web"}]]])
+def test_prometheus_failure_closes_the_pod_list(pages):
+    """Test a failed run closes the pod list, listed or not, and is recorded"""
+    service, engine, closed = make_service(pages)
+
+    async def collect():
+        with pytest.raises(RuntimeError):
+            await service.collect_and_store_metrics()
+        # Closed by the collector itself, not when the loop shuts down
+        assert closed == [True]
+
+    asyncio.run(collect())
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(CollectionRun.status).scalar() == "failed"
+    db.close()
+
+
+def test_next_page_is_listed_while_a_page_is_written():
+    """Test listing overlaps writing, with backfill held off by the write lock"""
+    pages = [[make_pod(f"pod-{index}")] for index in range(3)]
+    service, engine, closed = make_service(pages)
+    service.prometheus_service = Prometheus()
+    listing = [threading.Event() for _ in pages]
+    overlapped = []
+    locked = []
+
+    async def iter_pod_pages():
+        for index, page in enumerate(pages):
+            listing[index].set()
+            locked.append(write_lock().locked())
+            yield page
+
+    class Writer(MetricWriter):
+        def write(self, db, rows):
+            index = int(rows[0].pod_name.split("-")[1])
+            if index + 1 < len(pages):
+                overlapped.append(listing[index + 1].wait(timeout=5))
+            return super().write(db, rows)
+
+    service.k8s_service.iter_pod_pages = iter_pod_pages
+    collector_service.MetricWriter = Writer
+    try:
+        asyncio.run(service.collect_and_store_metrics())
+    finally:
+        collector_service.MetricWriter = MetricWriter
+
+    assert overlapped == [True, True]
+    # Later pages are listed inside the collection's write transaction
+    assert locked[1:] == [True, True]
+    db = sessionmaker(bind=engine)()
+    assert db.query(CollectionRun.status).scalar() == "completed"
+    assert db.query(ResourceMetric).count() == 3
+    db.close()
@@ -0,0 +1,131 @@
+"""Container statistics tests"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.routes.dashboard import calculate_trimmed_mean
+from app.core.partitions import SamplePartitions
+from app.services.container_stats import (
+    QuantileSketch,
+    expire_stats,
+    historical_stats,
+    load_stats,
+    rebuild_stats,
+)
+from app.services.metric_writer import MetricWriter
+
+from .conftest import metric_row
+
+START = datetime(2024, 3, 1, 22, 0)
+
+
+def make_row(pod_name, timestamp, cpu, memory, cpu_peak=None):
+    return metric_row(
+        timestamp,
+        pod_name=pod_name,
+        cpu_usage_cores=cpu,
+        memory_usage_bytes=memory,
+        cpu_usage_max_cores=cpu_peak,
+    )
+
+
+def test_sketch_quantiles_and_trimmed_mean_are_close():
+    """Test sketch estimates stay within its relative accuracy, also merged"""
+    generator = random.Random(7)
+    values = [generator.lognormvariate(-2, 1) for _ in range(5000)] + [0.0] * 50
+    first, second = QuantileSketch(), QuantileSketch()
+    for index, value in enumerate(values):
+        (first if index % 2 else second).add(value)
+    first.merge(second)
+    sketch = first
+
+    ordered = sorted(values)
+    assert sketch.count == len(values)
+    for fraction in (0.5, 0.95, 0.99):
+        exact = ordered[int(fraction * (len(ordered) - 1))]
+        assert sketch.quantile(fraction) == pytest.approx(exact, rel=0.011)
+    assert sketch.trimmed_mean() == pytest.approx(
+        calculate_trimmed_mean(values), rel=0.011
+    )
+
+
+def test_writes_maintain_stats_and_rebuild_matches(db):
+    """Test stats follow every write and a rebuild reproduces them"""
+    writer = MetricWriter()
+
+    # Snapshots across two daily partitions
+    for index in range(6):
+        timestamp = START + timedelta(hours=index)
+        writer.write(
+            db,
+            [
+                make_row("a", timestamp, 0.1 * (index + 1), 100 * (index + 1)),
+                make_row(
+                    "b", timestamp, 0.2, 300, cpu_peak=0.9 if index == 2 else None
+                ),
+            ],
+        )
+    db.commit()
+
+    ids = writer.containers.resolve(
+        db.connection(), [make_row(pod, START, 0, 0) for pod in ("a", "b")]
+    )
+    stats = load_stats(db.connection(), ids)
+    a, b = stats[ids[0]], stats[ids[1]]
+    assert a.sample_count == 6
+    assert (a.first_sample, a.last_sample) == (START, START + timedelta(hours=5))
+    assert a.cpu_usage_min_cores == pytest.approx(0.1)
+    assert a.cpu_usage_max_cores == pytest.approx(0.6)
+    assert a.cpu_usage_sum_cores == pytest.approx(2.1)
+    assert (a.memory_usage_min_bytes, a.memory_usage_max_bytes) == (100, 600)
+    # Trimmed mean of 6 samples keeps the lowest 4
+    assert a.cpu_trimmed_mean() == pytest.approx(0.25, rel=0.011)
+    assert b.cpu_usage_max_cores == 0.9
+
+    rebuilt_count = rebuild_stats(db.connection())
+    rebuilt = load_stats(db.connection(), ids)
+    assert rebuilt_count == 2
+    for container_id in ids:
+        assert rebuilt[container_id].values() == pytest.approx(
+            stats[container_id].values()
+        )
+        for metric, sketch in stats[container_id].sketches.items():
+            assert rebuilt[container_id].sketches[metric].bins == sketch.bins
+
+
+def test_expired_partitions_leave_the_stats(db):
+    """Test stats cover the retained samples once a partition is dropped"""
+    writer = MetricWriter()
+
+    # 22:00 and 23:00 in the first day's partition, four hours in the next
+    for index in range(6):
+        timestamp = START + timedelta(hours=index)
+        writer.write(db, [make_row("a", timestamp, 0.1 * (index + 1), 100)])
+    db.commit()
+    (container_id,) = writer.containers.resolve(
+        db.connection(), [make_row("a", START, 0, 0)]
+    )
+    assert historical_stats(db.connection(), [container_id])[container_id][
+        "cpu_min"
+    ] == pytest.approx(0.1)
+
+    connection = db.connection()
+    dropped = SamplePartitions().drop_before(connection, datetime(2024, 3, 2))
+    expire_stats(connection, dropped)
+    db.commit()
+
+    assert len(dropped) == 1
+    history = historical_stats(db.connection(), [container_id])[container_id]
+    assert history["cpu_min"] == pytest.approx(0.3)
+    assert history["cpu_avg"] == pytest.approx(0.45)
+    stats = load_stats(db.connection(), [container_id])[container_id]
+    assert stats.sample_count == 4
+    assert stats.first_sample == START + timedelta(hours=2)
+
+    # The same as rebuilding from the remaining samples
+    rebuild_stats(db.connection())
+    rebuilt = load_stats(db.connection(), [container_id])[container_id]
+    assert rebuilt.values() == pytest.approx(stats.values())
+    assert rebuilt.sketches["cpu"].bins == stats.sketches["cpu"].bins
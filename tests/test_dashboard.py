@@ -0,0 +1,65 @@
+"""Dashboard rendering tests"""
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.dependencies import get_database_session
+from app.core.response_cache import response_cache
+from app.main import app
+from app.services.metric_writer import MetricWriter
+
+from .conftest import metric_row
+
+START = datetime(2024, 3, 1, 12, 0)
+
+
+def test_dashboard_render_query_count_is_constant(engine, db):
+    """Test a full page costs as many queries as a nearly empty one"""
+    writer = MetricWriter()
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    app.dependency_overrides[get_database_session] = lambda: db
+    try:
+        client = TestClient(app)
+        counts = []
+        # A snapshot of 2 containers, then a full page of 20 with history
+        for snapshot, pods in ((0, 2), (1, 20)):
+            for hour in range(3):
+                timestamp = START + timedelta(days=snapshot, hours=hour)
+                writer.write(
+                    db,
+                    [
+                        metric_row(
+                            timestamp,
+                            pod_name=f"pod-{i}",
+                            cpu_usage_cores=0.1,
+                            memory_usage_bytes=100,
+                        )
+                        for i in range(pods)
+                    ],
+                )
+            db.commit()
+            response_cache.invalidate()  # As the collector does on commit
+
+            statements.clear()
+            response = client.get("/dashboard")
+            assert response.status_code == 200
+            assert f"pod-{pods - 1}" in response.text
+            counts.append(len(statements))
+            assert (
+                client.get("/api/table/cpu-requests").json()["data"][0]["actual_max"]
+                == "100m"
+            )
+    finally:
+        app.dependency_overrides.clear()
+        db.close()
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,81 @@
+"""Database schema tests"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import Settings
+from app.core.database import checkpoint_wal, create_database_engine, init_database
+from app.models.database import (
+    Container,
+    ContainerSpec,
+    LegacyBase,
+    LegacyResourceMetric,
+    ResourceMetric,
+)
+
+
+def test_legacy_metrics_are_migrated_once():
+    """Test wide rows are split into containers and samples"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    LegacyBase.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    for minute, node, request in (
+        (0, None, 0.1),
+        (5, "node-1", 0.1),
+        (10, "node-1", 0.2),
+    ):
+        db.add(
+            LegacyResourceMetric(
+                timestamp=datetime(2024, 1, 1, 0, minute),
+                namespace="ns",
+                pod_name="pod",
+                container_name="app",
+                node_name=node,
+                cpu_usage_cores=0.5,
+                cpu_request_cores=request,
+                pod_phase="Running",
+            )
+        )
+    db.commit()
+
+    init_database(engine)
+    init_database(engine)
+
+    assert db.query(Container).count() == 2
+    metrics = db.query(ResourceMetric).order_by(ResourceMetric.timestamp).all()
+    assert [metric.node_name for metric in metrics] == [None, "node-1", "node-1"]
+    assert all(metric.cpu_usage_cores == 0.5 for metric in metrics)
+    assert [metric.cpu_request_cores for metric in metrics] == [0.1, 0.1, 0.2]
+    assert db.query(ContainerSpec).count() == 3
+    db.close()
+
+
+def test_sqlite_profile_gives_wal_writer_and_read_only_readers(tmp_path):
+    """Test connections get the pragmas, readers cannot write, WAL truncates"""
+    settings = Settings()
+    url = f"sqlite:///{tmp_path}/profile.db"
+    writer = create_database_engine(url, settings)
+    reader = create_database_engine(url, settings, read_only=True)
+
+    with writer.begin() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        connection.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    with reader.connect() as connection:
+        assert connection.exec_driver_sql("SELECT x FROM t").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        with pytest.raises(Exception, match="readonly"):
+            connection.exec_driver_sql("INSERT INTO t VALUES (2)")
+
+    assert checkpoint_wal(writer, truncate_mb=0) > 0
+    assert (tmp_path / "profile.db-wal").stat().st_size == 0
+    writer.dispose()
+    reader.dispose()
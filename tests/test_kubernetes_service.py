@@ -0,0 +1,231 @@
+"""Kubernetes service tests"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from kubernetes_asyncio import client
+
+from app.services.kubernetes_service import KubernetesService
+
+
+def make_pod(namespace, name, resources=None, created="2024-03-01T12:00:00Z"):
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "creationTimestamp": created,
+        },
+        "spec": {
+            "nodeName": "node-1",
+            "containers": [
+                {"name": "app", "image": "app:1", "resources": resources or {}}
+            ],
+        },
+        "status": {"phase": "Running"},
+    }
+
+
+PODS = [
+    make_pod(
+        "shop",
+        "web",
+        {
+            "requests": {"cpu": "250m", "memory": "128Mi"},
+            "limits": {"cpu": "1", "memory": "1Gi"},
+        },
+    ),
+    make_pod("kube-system", "dns"),
+    make_pod("shop", "job", {"requests": {"cpu": "2"}}),
+    make_pod("data", "db"),
+    make_pod("data", "cache", created=None),
+]
+
+
+class FakeResponse:
+    """Unread response, as returned with _preload_content=False."""
+
+    def __init__(self, body: bytes):
+        self.status = 200
+        self.data = body
+        self.released = False
+
+    async def read(self):
+        return self.data
+
+    async def text(self):
+        return self.data.decode()
+
+    def release(self):
+        self.released = True
+
+
+class FakeCoreV1Api:
+    """Lists pods with limit/continue, as raw bodies or client models."""
+
+    def __init__(self, pods):
+        self.pods = pods
+        self.resource_version = "42"
+        self.calls = []
+        self.responses = []
+
+    async def list_pod_for_all_namespaces(self, _preload_content=True, **kwargs):
+        self.calls.append(kwargs)
+        start = int(kwargs.get("_continue") or 0)
+        limit = kwargs.get("limit") or len(self.pods)
+        items = self.pods[start : start + limit]
+        metadata = {"resourceVersion": self.resource_version}
+        if start + limit < len(self.pods):
+            metadata["continue"] = str(start + limit)
+        response = FakeResponse(orjson.dumps({"items": items, "metadata": metadata}))
+
+        if not _preload_content:
+            self.responses.append(response)
+            return response
+        async with client.ApiClient() as api_client:
+            return api_client.deserialize(response, "V1PodList")
+
+
+class FakeWatchStream:
+    """Watch response yielding one JSON event per line, then end of stream."""
+
+    def __init__(self, events):
+        self.lines = [orjson.dumps(event) + b"\n" for event in events]
+        self.content = self
+
+    async def readline(self):
+        return self.lines.pop(0) if self.lines else b""
+
+    def release(self):
+        pass
+
+
+class FakeWatchApi(FakeCoreV1Api):
+    """Serves a list per relist and a stream per watch request, in turn."""
+
+    def __init__(self, lists, streams):
+        super().__init__([])
+        self.lists = iter(lists)
+        self.streams = iter(streams)
+        self.watched_versions = []
+
+    async def list_pod_for_all_namespaces(self, watch=False, **kwargs):
+        """List or watch pods.
+
+        :rtype: V1PodList
+        """
+        if not watch:
+            self.pods, self.resource_version = next(self.lists)
+            return await super().list_pod_for_all_namespaces(**kwargs)
+
+        self.watched_versions.append(kwargs["resource_version"])
+        events = next(self.streams, None)
+        if events is None:
+            # Stands in for stop_watch cancelling the task
+            raise asyncio.CancelledError
+        return FakeWatchStream(events)
+
+
+def event(event_type, pod, resource_version):
+    pod = {**pod, "metadata": {**pod["metadata"], "resourceVersion": resource_version}}
+    return {"type": event_type, "object": pod}
+
+
+def make_service(raw_decode, page_size=2):
+    service = KubernetesService()
+    service.settings = service.settings.model_copy(
+        update={
+            "k8s_raw_decode": raw_decode,
+            "k8s_list_page_size": page_size,
+            "excluded_namespaces": "kube-system",
+        }
+    )
+    service.v1 = FakeCoreV1Api(PODS)
+    return service
+
+
+async def collect_pages(service):
+    return [page async for page in service.iter_pod_pages()]
+
+
+def test_raw_decode_pages_match_client_models():
+    """Test raw JSON pages decode to the same pods as the client models"""
+    raw = make_service(raw_decode=True)
+    models = make_service(raw_decode=False)
+
+    raw_pages = asyncio.run(collect_pages(raw))
+    model_pages = asyncio.run(collect_pages(models))
+
+    assert raw_pages == model_pages
+    assert [[pod["name"] for pod in page] for page in raw_pages] == [
+        ["web"],
+        ["job", "db"],
+        ["cache"],
+    ]
+    web = raw_pages[0][0]
+    assert web["created"] == datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert web["containers"][0]["requests"] == {"cpu": 0.25, "memory": 128 << 20}
+    assert web["containers"][0]["limits"] == {"cpu": 1.0, "memory": 1 << 30}
+    assert raw_pages[2][0]["created"] is None
+    assert all(response.released for response in raw.v1.responses)
+
+
+def test_pod_pages_follow_continue_tokens():
+    """Test each page is requested with the limit and the previous token"""
+    service = make_service(raw_decode=True, page_size=3)
+
+    pages = asyncio.run(collect_pages(service))
+
+    # Excluded pods are dropped after paging, so pages may come up short
+    assert [len(page) for page in pages] == [2, 2]
+    assert service.v1.calls == [
+        {"limit": 3, "_continue": None},
+        {"limit": 3, "_continue": "3"},
+    ]
+
+    # Unpaged lists are one request returning the resourceVersion
+    pods, continue_token, resource_version = asyncio.run(service._list_pods())
+    assert len(pods) == 4
+    assert (continue_token, resource_version) == (None, "42")
+
+
+def test_watch_applies_events_and_relists_on_expiry():
+    """Test watch events update the inventory and a 410 forces a relist"""
+    web, db = PODS[0], PODS[3]
+    succeeded = {**web, "status": {"phase": "Succeeded"}}
+    expired = {
+        "kind": "Status",
+        "status": "Failure",
+        "reason": "Expired",
+        "message": "too old resource version",
+        "code": 410,
+    }
+    service = make_service(raw_decode=True, page_size=0)
+    service.v1 = FakeWatchApi(
+        lists=[([web], "10"), ([succeeded, db], "20")],
+        streams=[
+            [
+                {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "11"}}},
+                event("MODIFIED", succeeded, "12"),
+            ],
+            [event("ADDED", PODS[1], "13"), {"type": "ERROR", "object": expired}],
+            [event("DELETED", db, "21")],
+        ],
+    )
+
+    async def watch():
+        await service._relist()
+        assert service.inventory.resource_version == "10"
+        await service._watch_loop()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(watch())
+
+    # Each watch resumes from the last event's resourceVersion, and the
+    # expired one from the relist's
+    assert service.v1.watched_versions == ["10", "12", "20", "21"]
+    assert service.inventory.synced
+    assert service.inventory.resource_version == "21"
+    assert [pod["name"] for pod in service.inventory.pods()] == ["web"]
+    assert service.inventory.get("shop", "web")["phase"] == "Succeeded"
@@ -1,6 +1,16 @@
 """Main application tests"""
+import asyncio
+import inspect
+import threading
+
 import pytest
+from anyio import to_thread
+from fastapi.routing import APIRoute
 from fastapi.testclient import TestClient
+from app.core.config import get_settings
+from app.core.database import db_limiter, run_db
+from app.api.routes import health
+from app.core.dependencies import get_database_session
 from app.main import app
 
 client = TestClient(app)
@@ -30,4 +40,60 @@ def test_api_endpoints_exist():
     
     for endpoint in endpoints:
         response = client.get(endpoint)
-        assert response.status_code != 404
\ No newline at end of file
+        assert response.status_code != 404
+
+
+def test_database_routes_run_off_event_loop():
+    """Test sync routes using a database session run on the database threads"""
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        uses_database = any(
+            dependency.call is get_database_session
+            for dependency in route.dependant.dependencies
+        )
+        if uses_database and route.path != "/health/":
+            assert asyncio.iscoroutinefunction(route.endpoint), route.path
+            handler = inspect.unwrap(route.endpoint)
+            assert not asyncio.iscoroutinefunction(handler), route.path
+
+
+def test_database_work_has_its_own_thread_limiter():
+    """Test database work is bounded apart from anyio's default thread pool"""
+
+    async def check():
+        limiter = db_limiter()
+        assert limiter is not to_thread.current_default_thread_limiter()
+        assert limiter.total_tokens == get_settings().db_threadpool_size
+        assert await run_db(lambda: limiter.borrowed_tokens) == 1
+        assert to_thread.current_default_thread_limiter().borrowed_tokens == 0
+
+    asyncio.run(check())
+
+
+def test_readiness_checks_the_database_off_the_loop_and_database_threads():
+    """Test readiness pings from a default worker thread, not behind db_limiter"""
+    (route,) = [route for route in app.routes if route.path == "/health/readiness"]
+    assert asyncio.iscoroutinefunction(route.endpoint)
+    assert not route.dependant.dependencies
+
+    threads = []
+    ping = health.ping_database
+
+    def record_thread():
+        threads.append(threading.get_ident())
+        return ping()
+
+    async def check():
+        # Every database thread is taken, as under a burst of slow reads
+        limiter = db_limiter()
+        for _ in range(int(limiter.total_tokens)):
+            await limiter.acquire_on_behalf_of(object())
+        return await health.readiness_probe()
+
+    health.ping_database = record_thread
+    try:
+        assert asyncio.run(check())["status"] == "ready"
+    finally:
+        health.ping_database = ping
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,139 @@
+"""Metric writer tests"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.core.partitions import SamplePartitions
+from app.models.database import (
+    Container,
+    ContainerSpec,
+    ResourceMetric,
+)
+from app.services.metric_writer import (
+    METRIC_COLUMNS,
+    SAMPLE_COLUMNS,
+    MetricRow,
+    MetricWriter,
+)
+
+from .conftest import metric_row
+
+NAMESPACE = "writer-test"
+
+
+def make_row(pod_name, timestamp):
+    return metric_row(
+        timestamp,
+        namespace=NAMESPACE,
+        pod_name=pod_name,
+        node_name="node-1",
+        cpu_request_cores=0.1,
+        cpu_limit_cores=0.5,
+        memory_limit_bytes=2048,
+        cpu_usage_max_cores=0.2,
+        memory_usage_max_bytes=900,
+    )
+
+
+def test_bulk_insert_is_one_executemany_per_partition(engine, db):
+    """Test a batch's samples reach the driver in one call per partition"""
+    inserts = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, context, executemany: (
+            inserts.append(len(parameters) if executemany else 1)
+            if statement.startswith("INSERT INTO resource_samples_")
+            else None
+        ),
+    )
+
+    writer = MetricWriter(partitions=SamplePartitions(days=1))
+    day = datetime(2000, 1, 4)
+    rows = [make_row(f"pod-{i}", day) for i in range(5)]
+    rows += [make_row("pod-0", day + timedelta(days=1))]
+    writer.write(db, rows)
+    db.commit()
+
+    assert inserts == [5, 1]
+    assert MetricRow._fields[-len(SAMPLE_COLUMNS) :] == SAMPLE_COLUMNS
+
+
+def test_bulk_and_orm_paths_store_identical_rows(db):
+    """Test both write paths persist the same values in small batches"""
+    writer = MetricWriter(batch_size=2)
+    bulk_time = datetime(2000, 1, 1, 0, 0)
+    orm_time = datetime(2000, 1, 1, 0, 5)
+
+    writer.write(db, [make_row(f"pod-{i}", bulk_time) for i in range(5)])
+    writer.write_orm(db, [make_row(f"pod-{i}", orm_time) for i in range(5)])
+    db.commit()
+
+    def stored(timestamp):
+        rows = (
+            db.query(ResourceMetric)
+            .filter(ResourceMetric.timestamp == timestamp)
+            .order_by(ResourceMetric.pod_name)
+        )
+        columns = [column for column in METRIC_COLUMNS if column != "timestamp"]
+        return [tuple(getattr(row, column) for column in columns) for row in rows]
+
+    assert len(stored(bulk_time)) == 5
+    assert stored(bulk_time) == stored(orm_time)
+    assert writer.rows_written == 10
+    # Each container identity is stored once
+    assert db.query(Container).count() == 5
+
+
+def test_specs_are_written_only_on_change(db):
+    """Test unchanged specs are skipped and reads resolve the spec as of a sample"""
+    start = datetime(2000, 1, 2)
+    times = [start + timedelta(minutes=5 * i) for i in range(4)]
+    writer = MetricWriter()
+
+    writer.write(db, [make_row("pod", times[0])])
+    writer.write(db, [make_row("pod", times[1])])
+    resized = make_row("pod", times[2])._replace(cpu_request_cores=0.2)
+    writer.write(db, [resized])
+    db.commit()
+
+    # A fresh writer picks up the open spec from the database
+    fresh = MetricWriter()
+    fresh.write(db, [resized._replace(timestamp=times[3])])
+    db.commit()
+
+    assert writer.specs_written == 2
+    assert fresh.specs_written == 0
+    specs = db.query(ContainerSpec).order_by(ContainerSpec.valid_from).all()
+    assert [(spec.valid_from, spec.valid_to) for spec in specs] == [
+        (times[0], times[2]),
+        (times[2], None),
+    ]
+
+    rows = db.query(ResourceMetric).order_by(ResourceMetric.timestamp)
+    assert [row.cpu_request_cores for row in rows] == [0.1, 0.1, 0.2, 0.2]
+
+
+def test_writers_with_separate_state_share_new_containers(db):
+    """Test a backfill's containers and specs are picked up by the collector"""
+    start = datetime(2000, 1, 3)
+    collector, backfill = MetricWriter(), MetricWriter()
+
+    collector.write(db, [make_row("pod-a", start)])
+    db.commit()
+    backfill.write(db, [make_row("pod-b", start)], since=start - timedelta(hours=1))
+    db.commit()
+
+    # pod-b is new to the collector's caches but not to the database
+    collector.write(
+        db, [make_row(pod, start + timedelta(minutes=5)) for pod in ("pod-a", "pod-b")]
+    )
+    db.commit()
+
+    assert db.query(Container).count() == 2
+    assert collector.specs_written == 1
+    open_specs = db.query(ContainerSpec.container_id).filter(
+        ContainerSpec.valid_to.is_(None)
+    )
+    assert sorted(open_specs.all()) == [(1,), (2,)]
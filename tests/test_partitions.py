@@ -0,0 +1,67 @@
+"""Sample partition tests"""
+
+from datetime import datetime, timedelta
+
+from app.core.partitions import SamplePartitions, latest_sample_time, partition_names
+from app.models.database import ResourceMetric
+from app.services.metric_writer import MetricWriter
+
+from .conftest import metric_row
+
+START = datetime(2024, 3, 1, 22, 0)
+
+
+def make_rows(timestamp):
+    return [
+        metric_row(timestamp, pod_name=f"pod-{index}", cpu_request_cores=0.1)
+        for index in range(3)
+    ]
+
+
+def test_rows_are_routed_to_daily_partitions(db):
+    """Test each day gets its own table and the view reads them all"""
+    partitions = SamplePartitions(days=1)
+    writer = MetricWriter(partitions=partitions)
+    times = [START + timedelta(hours=hours) for hours in (0, 1, 2, 27)]
+
+    for timestamp in times:
+        writer.write(db, make_rows(timestamp))
+    db.commit()
+
+    assert partition_names(db.connection()) == [
+        "resource_samples_20240301",
+        "resource_samples_20240302",
+        "resource_samples_20240303",
+    ]
+    metrics = db.query(ResourceMetric).all()
+    assert len(metrics) == 12
+    # Ids stay unique across partitions
+    assert len({metric.id for metric in metrics}) == 12
+    assert latest_sample_time(db) == times[-1]
+
+
+def test_retention_drops_whole_partitions(db):
+    """Test expired days are dropped and a partially expired day is kept"""
+    partitions = SamplePartitions(days=1)
+    writer = MetricWriter(partitions=partitions)
+    for hours in (0, 3, 27):
+        writer.write(db, make_rows(START + timedelta(hours=hours)))
+    db.commit()
+
+    dropped = partitions.drop_before(db.connection(), datetime(2024, 3, 2, 0, 30))
+    db.commit()
+
+    assert dropped == ["resource_samples_20240301"]
+    assert partition_names(db.connection()) == [
+        "resource_samples_20240302",
+        "resource_samples_20240303",
+    ]
+    assert {metric.timestamp for metric in db.query(ResourceMetric)} == {
+        START + timedelta(hours=3),
+        START + timedelta(hours=27),
+    }
+
+    # Writing to a dropped day recreates its partition
+    writer.write(db, make_rows(START))
+    db.commit()
+    assert db.query(ResourceMetric).count() == 9
@@ -0,0 +1,46 @@
+"""Pod inventory tests"""
+
+from app.services.pod_inventory import PodInventory
+
+
+def make_pod(namespace, name, phase="Running"):
+    return {"namespace": namespace, "name": name, "phase": phase, "containers": []}
+
+
+def test_replace_indexes_by_namespace():
+    """Test full relist populates the namespace index"""
+    inventory = PodInventory()
+    inventory.replace(
+        [make_pod("a", "p1"), make_pod("a", "p2"), make_pod("b", "p3")], "100"
+    )
+
+    assert inventory.synced
+    assert inventory.resource_version == "100"
+    assert len(inventory) == 3
+    assert sorted(inventory.namespaces()) == ["a", "b"]
+    assert len(inventory.namespace_pods("a")) == 2
+
+
+def test_watch_events_update_store():
+    """Test upserts and deletes keep the store consistent"""
+    inventory = PodInventory()
+    inventory.replace([make_pod("a", "p1")], "1")
+
+    inventory.upsert(make_pod("a", "p1", phase="Succeeded"))
+    inventory.upsert(make_pod("b", "p2"))
+    assert inventory.get("a", "p1")["phase"] == "Succeeded"
+    assert len(inventory) == 2
+
+    inventory.delete("b", "p2")
+    inventory.delete("b", "missing")
+    assert inventory.namespaces() == ["a"]
+
+
+def test_invalidate_forces_relist():
+    """Test invalidation drops the resume point"""
+    inventory = PodInventory()
+    inventory.replace([make_pod("a", "p1")], "5")
+    inventory.invalidate()
+
+    assert not inventory.synced
+    assert inventory.resource_version is None
@@ -0,0 +1,158 @@
+"""Prometheus service tests"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.prometheus_service import PrometheusService
+from app.services.prometheus_stream import (
+    PrometheusResponseError,
+    iter_vector_series,
+)
+
+
+def shard_namespaces(query):
+    return query.split('namespace=~"')[1].split('"')[0].split("|")
+
+
+def make_service(shard_size=2, retries=1):
+    service = PrometheusService()
+    service.settings = service.settings.model_copy(
+        update={
+            "prometheus_shard_size": shard_size,
+            "prometheus_shard_concurrency": 2,
+            "prometheus_shard_retries": retries,
+        }
+    )
+    return service
+
+
+async def chunked(payload, size):
+    for start in range(0, len(payload), size):
+        yield payload[start : start + size]
+
+
+async def collect(chunks):
+    return [series async for series in iter_vector_series(chunks)]
+
+
+def test_sharded_usage_merges_all_shards():
+    """Test namespace shards are queried separately and merged"""
+    service = make_service()
+    queries = []
+
+    async def fake_stream(query, time=None):
+        queries.append(query)
+        for ns in shard_namespaces(query):
+            yield ns, "pod", "app", "0.5"
+
+    service.stream_vector = fake_stream
+    usage = asyncio.run(service.get_pod_cpu_usage(namespaces=["a", "b", "c"]))
+
+    assert len(queries) == 2
+    assert usage == {
+        ("a", "pod", "app"): 0.5,
+        ("b", "pod", "app"): 0.5,
+        ("c", "pod", "app"): 0.5,
+    }
+
+
+def test_sharded_usage_retries_only_failed_shards():
+    """Test a failing shard is retried without re-running healthy ones"""
+    service = make_service()
+    calls = []
+
+    async def flaky_stream(query, time=None):
+        calls.append(query)
+        if '"c"' in query and calls.count(query) == 1:
+            raise RuntimeError("timeout")
+        for ns in shard_namespaces(query):
+            yield ns, "pod", "app", "1024"
+
+    service.stream_vector = flaky_stream
+    usage = asyncio.run(service.get_pod_memory_usage(namespaces=["a", "b", "c"]))
+
+    assert len(calls) == 3
+    assert usage[("c", "pod", "app")] == 1024
+    assert len(usage) == 3
+
+
+def test_sharded_usage_keeps_healthy_shards_on_failure():
+    """Test a shard that keeps failing does not blank out the others"""
+    service = make_service(retries=0)
+
+    async def broken_stream(query, time=None):
+        if '"c"' in query:
+            raise RuntimeError("timeout")
+        yield "a", "pod", "app", "1"
+        yield "b", "pod", "app", "2"
+
+    service.stream_vector = broken_stream
+    usage = asyncio.run(service.get_pod_cpu_usage(namespaces=["a", "b", "c"]))
+
+    assert usage == {("a", "pod", "app"): 1.0, ("b", "pod", "app"): 2.0}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_stream_decoder_handles_any_chunking(chunk_size):
+    """Test series split across chunk boundaries are decoded intact"""
+    body = {
+        "status": "success",
+        "data": {
+            "resultType": "vector",
+            "result": [
+                {
+                    "metric": {"container": f"c{i}", "namespace": "ns", "pod": "p"},
+                    "value": [1700000000.123, str(i * 1.5)],
+                }
+                for i in range(20)
+            ],
+        },
+        "warnings": ["ignored"],
+    }
+    payload = json.dumps(body, indent=1).encode()
+
+    series = asyncio.run(collect(chunked(payload, chunk_size)))
+
+    assert len(series) == 20
+    assert series[3] == ("ns", "p", "c3", "4.5")
+
+
+def test_stream_decoder_reports_errors():
+    """Test an error body is raised instead of yielding nothing"""
+    payload = json.dumps(
+        {"status": "error", "errorType": "timeout", "error": "query timed out"}
+    ).encode()
+
+    with pytest.raises(PrometheusResponseError, match="query timed out"):
+        asyncio.run(collect(chunked(payload, 16)))
+
+
+def test_stream_decoder_rejects_truncated_body():
+    """Test a body cut off mid-array is not treated as a complete result"""
+    payload = b'{"status":"success","data":{"result":[{"metric":{},"value":[1,'
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect(chunked(payload, 8)))
+
+
+def test_peak_usage_uses_interval_subqueries():
+    """Test peaks are max/p95 subqueries over the collection interval"""
+    service = make_service(shard_size=0)
+    queries = []
+
+    async def fake_stream(query, time=None):
+        queries.append(query)
+        yield "a", "pod", "app", "2.5"
+
+    service.stream_vector = fake_stream
+    peaks = asyncio.run(service.get_pod_usage_peaks())
+
+    window = f"[{service.settings.collection_interval_minutes}m:"
+    assert sorted(peaks) == ["cpu_max", "cpu_p95", "memory_max", "memory_p95"]
+    assert all(window in query for query in queries)
+    assert sum(query.startswith("max_over_time(") for query in queries) == 2
+    assert sum(query.startswith("quantile_over_time(0.95,") for query in queries) == 2
+    assert peaks["cpu_max"] == {("a", "pod", "app"): 2.5}
+    assert peaks["memory_p95"] == {("a", "pod", "app"): 2}
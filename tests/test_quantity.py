@@ -0,0 +1,64 @@
+"""Kubernetes quantity parser tests"""
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+from kubernetes.utils.quantity import parse_quantity as reference_parse_quantity
+
+from app.services.quantity import parse_cpu, parse_memory, parse_quantity
+
+SUFFIXES = ["", "n", "u", "m", "k", "M", "G", "T", "P", "E"]
+SUFFIXES += ["Ki", "Mi", "Gi", "Ti", "Pi", "Ei"]
+
+numbers = st.one_of(
+    st.integers(min_value=0, max_value=10**6).map(str),
+    st.decimals(
+        min_value=0, max_value=10**6, places=3, allow_nan=False, allow_infinity=False
+    ).map(lambda d: format(d, "f")),
+)
+
+quantities = st.one_of(
+    st.tuples(numbers, st.sampled_from(SUFFIXES)).map("".join),
+    st.tuples(numbers, st.sampled_from("eE"), st.integers(-9, 9)).map(
+        lambda parts: f"{parts[0]}{parts[1]}{parts[2]}"
+    ),
+)
+
+
+@given(quantities)
+def test_matches_reference_parser(quantity):
+    """Test every grammar form against the official client parser"""
+    assert parse_quantity(quantity) == reference_parse_quantity(quantity)
+
+
+@given(quantities)
+def test_cpu_and_memory_conversions(quantity):
+    """Test cores and bytes are derived from the exact value"""
+    exact = reference_parse_quantity(quantity)
+    assert parse_cpu(quantity) == float(exact)
+    assert parse_memory(quantity) == int(exact)
+
+
+@pytest.mark.parametrize(
+    "quantity, cores",
+    [("0", 0.0), ("", 0.0), ("250m", 0.25), ("2", 2.0), ("500000n", 0.0005)],
+)
+def test_parse_cpu(quantity, cores):
+    """Test common CPU quantities"""
+    assert parse_cpu(quantity) == cores
+
+
+@pytest.mark.parametrize(
+    "quantity, size",
+    [("128Mi", 128 * 1024**2), ("1G", 10**9), ("1E", 10**18), ("1e3", 1000)],
+)
+def test_parse_memory(quantity, size):
+    """Test common memory quantities, including exponent vs exa suffix"""
+    assert parse_memory(quantity) == size
+
+
+@pytest.mark.parametrize("quantity", ["abc", "1Xi", "1.2.3", "Mi", "1 Gi"])
+def test_invalid_quantity(quantity):
+    """Test malformed quantities are rejected"""
+    with pytest.raises(ValueError):
+        parse_quantity(quantity)
@@ -0,0 +1,153 @@
+"""Response cache tests"""
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from app.core.response_cache import ResponseCache, ResponseCacheMiddleware
+from app.main import app as main_app
+
+
+def make_client(cache, origins=None):
+    app = FastAPI()
+    # Same order as the application: the cache inside CORS
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+    if origins:
+        app.add_middleware(CORSMiddleware, allow_origins=origins)
+    calls = []
+
+    @app.get("/api/items")
+    def items(page: int = 1, search: str = ""):
+        calls.append((page, search))
+        return {"page": page, "search": search, "padding": "x" * 100}
+
+    @app.get("/api/missing")
+    def missing():
+        calls.append("missing")
+        raise HTTPException(status_code=404)
+
+    @app.get("/api/link")
+    def link(request: Request):
+        calls.append("link")
+        return {"href": str(request.url_for("other"))}
+
+    @app.get("/other")
+    def other():
+        calls.append("other")
+        return {}
+
+    return TestClient(app), calls
+
+
+def test_cached_until_invalidated_with_etag_revalidation():
+    """Test repeated reads hit the cache and matching ETags get 304"""
+    cache = ResponseCache(max_entries=10, max_bytes=1024 * 1024)
+    client, calls = make_client(cache)
+
+    first = client.get("/api/items?search=web&page=2")
+    again = client.get("/api/items?page=2&search=web")
+    assert (
+        first.json()
+        == again.json()
+        == {
+            "page": 2,
+            "search": "web",
+            "padding": "x" * 100,
+        }
+    )
+    assert len(calls) == 1
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and again.headers["etag"] == etag
+    assert first.headers["cache-control"] == "no-cache"
+
+    unchanged = client.get(
+        "/api/items?page=2&search=web", headers={"If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == etag
+
+    # A new collection recomputes; the same payload keeps its ETag
+    cache.invalidate()
+    revalidated = client.get(
+        "/api/items?page=2&search=web", headers={"If-None-Match": f'W/{etag}, "x"'}
+    )
+    assert revalidated.status_code == 304
+    assert len(calls) == 2
+
+    # Errors and paths outside the cached prefixes always reach the app
+    for _ in range(2):
+        assert client.get("/api/missing").status_code == 404
+        assert client.get("/other").status_code == 200
+    assert calls.count("missing") == calls.count("other") == 2
+
+    assert cache.stats() == {
+        "version": 1,
+        "entries": 1,
+        "bytes": len(first.content),
+        "hits": 2,
+        "misses": 4,
+        "not_modified": 2,
+        "evictions": 0,
+    }
+
+
+def test_least_recently_used_evicted_past_either_bound():
+    """Test eviction by entry count and by total size"""
+    cache = ResponseCache(max_entries=2, max_bytes=1024 * 1024)
+    client, calls = make_client(cache)
+    for page in (1, 2, 1, 3):
+        client.get(f"/api/items?page={page}")
+    assert len(calls) == 3
+    assert cache.evictions == 1  # page 2, least recently used
+
+    client.get("/api/items?page=1")
+    client.get("/api/items?page=2")
+    assert len(calls) == 4
+
+    size = len(client.get("/api/items?page=2").content)
+    cache = ResponseCache(max_entries=10, max_bytes=size * 2)
+    client, calls = make_client(cache)
+    for page in (4, 5, 6):
+        client.get(f"/api/items?page={page}")
+    assert cache.stats()["entries"] == 2
+    assert cache.size <= size * 2
+
+
+def test_cors_headers_follow_each_origin_on_cached_responses():
+    """Test a cached response carries the CORS headers of each requester"""
+    assert [middleware.cls for middleware in main_app.user_middleware] == [
+        CORSMiddleware,
+        ResponseCacheMiddleware,
+    ]
+
+    cache = ResponseCache(max_entries=10, max_bytes=1024 * 1024)
+    origins = ["https://a.example", "https://b.example"]
+    client, calls = make_client(cache, origins)
+
+    plain = client.get("/api/items")
+    assert "access-control-allow-origin" not in plain.headers
+    for origin in origins:
+        response = client.get("/api/items", headers={"Origin": origin})
+        assert response.headers["access-control-allow-origin"] == origin
+    assert len(calls) == 1
+
+
+def test_each_host_and_scheme_gets_its_own_entry():
+    """Test absolute URLs built from Host and scheme are never served across them"""
+    cache = ResponseCache(max_entries=10, max_bytes=1024 * 1024)
+    client, calls = make_client(cache)
+    https = TestClient(client.app, base_url="https://monitor.example.com")
+
+    def href(client, host=None):
+        headers = {"Host": host} if host else {}
+        return client.get("/api/link", headers=headers).json()["href"]
+
+    assert href(client, "monitor.example.com") == "http://monitor.example.com/other"
+    assert href(client, "localhost:8080") == "http://localhost:8080/other"
+    assert href(https) == "https://monitor.example.com/other"
+    assert calls == ["link"] * 3
+
+    # Host names are case-insensitive
+    assert href(client, "Monitor.Example.com") == "http://monitor.example.com/other"
+    assert calls == ["link"] * 3
@@ -0,0 +1,148 @@
+"""Rollup tier tests"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import Settings
+from app.models.database import DailyRollup, HourlyRollup
+from app.services.metric_writer import MetricWriter
+from app.services.rollup_service import RollupService, select_tier
+
+from .conftest import metric_row
+
+START = datetime(2024, 3, 1, 0, 0)
+
+
+def make_row(timestamp, cpu, memory, cpu_request=0.5):
+    return metric_row(
+        timestamp,
+        cpu_request_cores=cpu_request,
+        cpu_usage_cores=cpu,
+        memory_usage_bytes=memory,
+        cpu_usage_max_cores=cpu * 2,
+    )
+
+
+def write_hour(db, writer, hour, cpu_request=0.5):
+    """Twenty samples in one hour, using 0.01..0.20 cores"""
+    start = START + timedelta(hours=hour)
+    writer.write(
+        db,
+        [
+            make_row(start + timedelta(minutes=3 * i), 0.01 * (i + 1), 100 * (i + 1))
+            for i in range(19)
+        ]
+        + [make_row(start + timedelta(minutes=57), 0.2, 2000, cpu_request)],
+    )
+    db.commit()
+
+
+def test_hourly_and_daily_rollups(db):
+    """Test buckets hold min, avg, p95, max and the last spec"""
+    writer = MetricWriter()
+    write_hour(db, writer, 0)
+    write_hour(db, writer, 1, cpu_request=1.0)
+
+    written = RollupService().run(db, now=START + timedelta(hours=2))
+    db.commit()
+
+    assert written == {"hourly": 2, "daily": 1}
+    first, second = db.query(HourlyRollup).order_by(HourlyRollup.bucket).all()
+    assert first.bucket == START
+    assert first.sample_count == 20
+    assert first.cpu_usage_min_cores == pytest.approx(0.01)
+    assert first.cpu_usage_avg_cores == pytest.approx(0.105)
+    assert first.cpu_usage_p95_cores == pytest.approx(0.19)
+    # Interval peaks count towards the maximum
+    assert first.cpu_usage_max_cores == 0.4
+    assert first.memory_usage_max_bytes == 2000
+    assert first.cpu_request_cores == 0.5
+    assert second.cpu_request_cores == 1.0
+
+    (day,) = db.query(DailyRollup).all()
+    assert day.bucket == START
+    assert day.sample_count == 40
+    assert day.cpu_usage_min_cores == pytest.approx(0.01)
+    assert day.cpu_usage_avg_cores == pytest.approx(0.105)
+    assert day.cpu_usage_max_cores == 0.4
+    assert day.cpu_request_cores == 1.0
+
+
+def test_rollups_resume_from_latest_bucket(db):
+    """Test a later run recomputes the newest bucket and adds the new ones"""
+    writer = MetricWriter()
+    write_hour(db, writer, 0)
+    service = RollupService()
+    service.run(db, now=START + timedelta(minutes=30))
+    db.commit()
+
+    write_hour(db, writer, 1)
+    written = service.run(db, now=START + timedelta(hours=1, minutes=30))
+    db.commit()
+
+    assert written == {"hourly": 2, "daily": 1}
+    assert db.query(HourlyRollup).count() == 2
+    assert db.query(DailyRollup).one().sample_count == 40
+
+
+def test_late_samples_update_buckets_in_place(db):
+    """Test recomputing from since upserts the buckets late samples fall in"""
+    writer = MetricWriter()
+    write_hour(db, writer, 0)
+    write_hour(db, writer, 1)
+    service = RollupService()
+    service.run(db, now=START + timedelta(hours=2))
+    db.commit()
+    first_id = db.query(HourlyRollup.id).filter(HourlyRollup.bucket == START).scalar()
+
+    # A backfilled sample without usage, counted as zero, and a new peak
+    late = make_row(START + timedelta(minutes=1), 0.0, 0)._replace(
+        cpu_usage_cores=None, memory_usage_bytes=None, cpu_usage_max_cores=0.9
+    )
+    writer.write(db, [late])
+    db.commit()
+    written = service.run(db, now=START + timedelta(hours=2), since=START)
+    db.commit()
+
+    assert written == {"hourly": 2, "daily": 1}
+    first = db.query(HourlyRollup).filter(HourlyRollup.bucket == START).one()
+    assert first.id == first_id
+    assert first.sample_count == 21
+    assert first.cpu_usage_min_cores == 0.0
+    assert first.memory_usage_avg_bytes == 1000
+    assert first.cpu_usage_max_cores == 0.9
+    assert db.query(DailyRollup).one().sample_count == 41
+
+
+def test_rollups_expire_by_tier(db):
+    """Test hourly buckets expire sooner than daily ones"""
+    write_hour(db, MetricWriter(), 0)
+    service = RollupService()
+    service.run(db, now=START + timedelta(hours=1))
+
+    service.run(db, now=START + service.hourly.retention + timedelta(hours=2))
+    db.commit()
+
+    assert db.query(HourlyRollup).count() == 0
+    assert db.query(DailyRollup).count() == 1
+
+
+def test_select_tier_prefers_coarsest_with_enough_points():
+    """Test ranges are served from the coarsest tier with enough points"""
+    settings = Settings(
+        retention_days=7,
+        rollup_hourly_retention_days=30,
+        rollup_daily_retention_days=365,
+        rollup_min_points=100,
+    )
+
+    assert select_tier(timedelta(hours=24), settings).name == "raw"
+    assert select_tier(timedelta(days=7), settings).name == "hourly"
+    assert select_tier(timedelta(days=30), settings).name == "hourly"
+    assert select_tier(timedelta(days=200), settings).name == "daily"
+    # Ranges past every tier's retention use the longest kept one
+    assert select_tier(timedelta(days=500), settings).name == "daily"
+
+    disabled = Settings(retention_days=7, rollup_enabled=False)
+    assert select_tier(timedelta(days=30), disabled).name == "raw"
@@ -0,0 +1,107 @@
+"""Collection summary tests"""
+
+from datetime import datetime
+
+import pytest
+
+from app.api.routes.dashboard import get_summary
+from app.core.config import Settings
+from app.models.database import CLUSTER_SUMMARY
+from app.services.metric_writer import MetricWriter
+from app.services.summary_service import SummaryAccumulator, aggregate_summary
+
+from .conftest import metric_row
+
+TIMESTAMP = datetime(2024, 3, 1, 12, 0)
+SETTINGS = Settings(excluded_namespaces="kube-system")
+
+
+def make_row(namespace, pod_name, container_name="app", phase="Running"):
+    return metric_row(
+        TIMESTAMP,
+        namespace=namespace,
+        pod_name=pod_name,
+        container_name=container_name,
+        pod_phase=phase,
+        memory_limit_bytes=4096,
+        cpu_usage_cores=0.25,
+    )
+
+
+ROWS = [
+    make_row("shop", "web", "app"),
+    make_row("shop", "web", "proxy"),
+    make_row("shop", "job", phase="Succeeded"),
+    make_row("data", "db"),
+    make_row("kube-system", "dns"),
+]
+
+
+def test_accumulator_totals_namespaces_and_cluster():
+    """Test totals cover active containers, and the cluster skips excluded ones"""
+    summaries = SummaryAccumulator(SETTINGS.excluded_namespaces_list)
+    summaries.add(ROWS[:2])
+    summaries.add(ROWS[2:])
+
+    rows = {row["namespace"]: row for row in summaries.rows(TIMESTAMP)}
+
+    assert set(rows) == {"shop", "data", "kube-system", CLUSTER_SUMMARY}
+    assert rows["shop"]["total_pods"] == 1
+    assert rows["shop"]["total_containers"] == 2
+    assert rows["shop"]["total_cpu_requests"] == 1.0
+    assert rows["shop"]["total_memory_limits"] == 8192
+    assert rows[CLUSTER_SUMMARY]["total_containers"] == 3
+    assert rows[CLUSTER_SUMMARY]["total_pods"] == 2
+    assert rows[CLUSTER_SUMMARY]["total_cpu_usage"] == 0.75
+    assert rows[CLUSTER_SUMMARY]["total_cpu_limits"] == 0
+
+
+def test_summary_reads_match_live_totals(db):
+    """Test precomputed summaries equal totals computed from the samples"""
+
+    # Before any summary is written the samples are totalled directly
+    MetricWriter().write(db, ROWS)
+    db.commit()
+    live = {
+        namespace: get_summary(db, SETTINGS, namespace=namespace)
+        for namespace in (None, "shop", "kube-system")
+    }
+
+    summaries = SummaryAccumulator(SETTINGS.excluded_namespaces_list)
+    summaries.add(ROWS)
+    summaries.write(db, TIMESTAMP)
+    db.commit()
+
+    for namespace, expected in live.items():
+        summary = get_summary(db, SETTINGS, namespace=namespace)
+        assert summary == pytest.approx(expected)
+    assert get_summary(db, SETTINGS)["total_containers"] == 3
+    assert get_summary(db, SETTINGS, namespace="missing")["total_containers"] == 0
+    # A pod name search is still answered from the samples
+    assert get_summary(db, SETTINGS, search="we")["total_containers"] == 2
+
+
+def test_aggregate_summary_matches_accumulator(db):
+    """Test SQL totals, also grouped by namespace, equal the accumulated ones"""
+    MetricWriter().write(db, ROWS)
+    db.commit()
+
+    summaries = SummaryAccumulator(SETTINGS.excluded_namespaces_list)
+    summaries.add(ROWS)
+    expected = {row.pop("namespace"): row for row in summaries.rows(TIMESTAMP)}
+    for row in expected.values():
+        del row["timestamp"]
+
+    excluded = SETTINGS.excluded_namespaces_list
+    cluster = aggregate_summary(db, TIMESTAMP, excluded)
+    assert cluster._asdict() == pytest.approx(expected[CLUSTER_SUMMARY])
+
+    by_namespace = aggregate_summary(db, TIMESTAMP, by_namespace=True)
+    assert set(by_namespace) == {"shop", "data", "kube-system"}
+    for namespace, totals in by_namespace.items():
+        assert totals._asdict() == pytest.approx(expected[namespace])
+
+    web = aggregate_summary(db, TIMESTAMP, excluded, search="we", namespace="shop")
+    assert (web.total_containers, web.total_pods) == (2, 1)
+    empty = aggregate_summary(db, TIMESTAMP, excluded, namespace="missing")
+    assert empty.total_containers == 0 and empty.total_cpu_requests == 0